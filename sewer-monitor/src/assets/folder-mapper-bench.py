@@ -0,0 +1,406 @@
+import os
+import gc
+import sys
+import json
+import random
+import shutil
+import argparse
+import datetime
+import tempfile
+import platform
+import subprocess
+import statistics
+import importlib.util
+import tracemalloc
+import time
+from contextlib import contextmanager
+
+# Ignored directories sprinkled into the synthetic tree to exercise pruning
+SYNTHETIC_IGNORED_DIRS = ['node_modules', '__pycache__', '.git', 'venv', 'dist', 'build']
+
+DEFAULT_EXTENSION_MIX = 'py=30,js=25,ts=10,css=10,html=5,md=10,json=10'
+
+def load_mapper():
+    """Load the foldermap library folder-mapper.py is built on, from next to this script"""
+    library_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'foldermap.py')
+    spec = importlib.util.spec_from_file_location('foldermap', library_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def parse_extension_mix(mix):
+    """Parse 'py=30,js=20' into a list of (extension, weight) pairs"""
+    pairs = []
+    for item in mix.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        ext, _, weight = item.partition('=')
+        ext = ext.strip().lstrip('.')
+        pairs.append(('.' + ext if ext else '', float(weight or 1)))
+    if not pairs:
+        raise ValueError(f"Empty extension mix: {mix!r}")
+    return pairs
+
+def make_file_content(ext, size, rng):
+    """Build plausible file content of roughly `size` bytes for an extension"""
+    chunks = []
+    total = 0
+    index = 0
+    while total < size:
+        name = f"item_{index}_{rng.randrange(10 ** 6)}"
+        if ext == '.py':
+            chunk = f"class {name.title()}:\n    def {name}(self, value):\n        return value * {index}\n\n"
+        elif ext in ['.js', '.jsx', '.ts', '.tsx']:
+            if index % 2:
+                chunk = f"function {name}(value) {{\n  return value * {index};\n}}\n\n"
+            else:
+                chunk = f"const {name} = (value) => value + {index};\n"
+        elif ext == '.css':
+            chunk = f".{name} {{\n  margin: {index}px;\n}}\n#{name}-id {{\n  color: red;\n}}\n"
+        elif ext in ['.html', '.htm']:
+            chunk = f"<div class=\"{name}\">\n  <p>{name}</p>\n</div>\n"
+        elif ext == '.json':
+            chunk = f"{{\"{name}\": {index}}}\n"
+        else:
+            chunk = f"{name} lorem ipsum dolor sit amet {index}\n"
+        chunks.append(chunk)
+        total += len(chunk)
+        index += 1
+    return ''.join(chunks)[:max(size, 0)]
+
+def generate_synthetic_tree(root, file_count=1000, depth=4, fanout=4, extension_mix=DEFAULT_EXTENSION_MIX,
+                            min_size=200, max_size=8000, ignored_ratio=0.2, seed=0):
+    """Create a deterministic synthetic source tree under root and return a description of it"""
+    rng = random.Random(seed)
+    mix = parse_extension_mix(extension_mix)
+    extensions = [ext for ext, _ in mix]
+    weights = [weight for _, weight in mix]
+
+    # Pre-build the directory skeleton so files spread across every level
+    directories = ['']
+    frontier = ['']
+    for level in range(depth):
+        next_frontier = []
+        for parent in frontier:
+            for i in range(fanout):
+                child = os.path.join(parent, f"dir{level}_{i}") if parent else f"dir{level}_{i}"
+                directories.append(child)
+                next_frontier.append(child)
+        frontier = next_frontier
+
+    stats = {'files': 0, 'ignored_files': 0, 'bytes': 0, 'directories': len(directories)}
+    for index in range(file_count):
+        folder = rng.choice(directories)
+        ignored = rng.random() < ignored_ratio
+        if ignored:
+            folder = os.path.join(folder, rng.choice(SYNTHETIC_IGNORED_DIRS))
+        ext = rng.choices(extensions, weights)[0]
+        size = rng.randint(min_size, max_size)
+        full_dir = os.path.join(root, folder)
+        os.makedirs(full_dir, exist_ok=True)
+        file_path = os.path.join(full_dir, f"file_{index}{ext}")
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write(make_file_content(ext, size, rng))
+        stats['files'] += 1
+        stats['bytes'] += size
+        if ignored:
+            stats['ignored_files'] += 1
+
+    # Backdate the folders so scan snapshots trust them, as they would an older checkout
+    settled = time.time() - 60
+    for dirpath, _, _ in os.walk(root):
+        os.utime(dirpath, (settled, settled))
+
+    stats.update({
+        'depth': depth,
+        'fanout': fanout,
+        'extension_mix': extension_mix,
+        'min_size': min_size,
+        'max_size': max_size,
+        'ignored_ratio': ignored_ratio,
+        'seed': seed
+    })
+    return stats
+
+def time_stage(func, repeat):
+    """Run func `repeat` times and return (timings, last result)"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return timings, result
+
+def summarize_timings(timings, items=None):
+    """Reduce raw timings to the statistics stored in the results file"""
+    summary = {
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'max': max(timings),
+        'runs': len(timings)
+    }
+    if items:
+        summary['items'] = items
+        summary['per_item_us'] = summary['median'] / items * 1e6
+    return summary
+
+def measure_record_memory(mapper, files):
+    """Bytes held per extracted file record, with and without the file contents themselves"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        details = [mapper.extract_file_details(f) for f in files]
+        traced, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    count = max(len(details), 1)
+    content_bytes = sum(sys.getsizeof(detail.content) for detail in details)
+    return {
+        'files': len(details),
+        'bytes_per_file': traced / count,
+        'overhead_per_file': (traced - content_bytes) / count
+    }
+
+@contextmanager
+def listing_latency(seconds):
+    """Delay every os.scandir call, as a network or overlay filesystem would"""
+    scandir = os.scandir
+    def slow_scandir(*args):
+        time.sleep(seconds)
+        return scandir(*args)
+    os.scandir = slow_scandir
+    try:
+        yield
+    finally:
+        os.scandir = scandir
+
+def run_benchmarks(mapper, root, repeat=3, walk_workers=16, latency_ms=1.0):
+    """Time each mapper stage against the tree at root"""
+    results = {}
+
+    # Walk: extension discovery and file collection
+    timings, extensions = time_stage(lambda: mapper.get_all_extensions(root), repeat)
+    results['walk_extensions'] = summarize_timings(timings)
+    timings, files = time_stage(lambda: mapper.collect_files(root, extensions), repeat)
+    results['walk_files'] = summarize_timings(timings, len(files))
+
+    # Rescan through a scan snapshot, read from disk each run like a fresh process would
+    snapshot_dir = tempfile.mkdtemp(prefix='mapper-bench-snapshot-')
+    snapshot_path = os.path.join(snapshot_dir, 'snapshot.json')
+    reuse = mapper.WalkOptions(reuse_listings=True)
+    def rescan():
+        mapper.ScanSnapshot.for_root(root, snapshot_path, reload=True)
+        return mapper.collect_files(root, extensions, walk_options=reuse)
+    try:
+        rescan()
+        timings, snapshot_files = time_stage(rescan, repeat)
+    finally:
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+    assert snapshot_files == files, "snapshot rescan returned different files"
+    results['walk_files_snapshot'] = summarize_timings(timings, len(files))
+
+    # Parallel listing against os.walk, on local disk and with each listing delayed
+    parallel = mapper.WalkOptions(walk_workers=walk_workers)
+    timings, parallel_files = time_stage(lambda: mapper.collect_files(root, extensions, walk_options=parallel),
+                                         repeat)
+    assert parallel_files == files, "parallel walk returned different files"
+    results['walk_files_parallel'] = summarize_timings(timings, len(files))
+    with listing_latency(latency_ms / 1000):
+        timings, _ = time_stage(lambda: mapper.collect_files(root, extensions), repeat)
+        results['walk_files_latency'] = summarize_timings(timings, len(files))
+        timings, parallel_files = time_stage(
+            lambda: mapper.collect_files(root, extensions, walk_options=parallel), repeat)
+        results['walk_files_parallel_latency'] = summarize_timings(timings, len(files))
+    assert parallel_files == files, "parallel walk returned different files"
+    for stage, baseline in [('walk_files_parallel', 'walk_files'),
+                            ('walk_files_parallel_latency', 'walk_files_latency')]:
+        results[stage]['speedup'] = results[baseline]['median'] / results[stage]['median']
+
+    # Ignore checks over every path, including the ones pruning would skip
+    all_paths = [os.path.join(dirpath, name)
+                 for dirpath, _, filenames in os.walk(root) for name in filenames]
+    timings, _ = time_stage(lambda: [mapper.should_ignore_path(p, root) for p in all_paths], repeat)
+    results['should_ignore_path'] = summarize_timings(timings, len(all_paths))
+
+    # Extraction, one stage per extractor
+    extractors = {
+        'extract_py_details': lambda f: f.endswith('.py'),
+        'extract_js_details': lambda f: os.path.splitext(f)[1] in ['.js', '.jsx', '.ts', '.tsx'],
+        'extract_css_details': lambda f: f.endswith('.css'),
+        'extract_html_details': lambda f: os.path.splitext(f)[1] in ['.html', '.htm'],
+    }
+    claimed = set()
+    for name, matches in extractors.items():
+        subset = [f for f in files if matches(f)]
+        claimed.update(subset)
+        if not subset:
+            continue
+        extract = getattr(mapper, name)
+        timings, _ = time_stage(lambda: [extract(f) for f in subset], repeat)
+        results[name] = summarize_timings(timings, len(subset))
+    others = [f for f in files if f not in claimed]
+    if others:
+        timings, _ = time_stage(lambda: [mapper.extract_other_files(f) for f in others], repeat)
+        results['extract_other_files'] = summarize_timings(timings, len(others))
+
+    # Rendering and writing
+    file_details = [mapper.extract_file_details(f) for f in files]
+    for format_type in ['text', 'markdown']:
+        timings, content = time_stage(
+            lambda: mapper.create_summary_text(file_details, root, format_type, redact=False), repeat)
+        results[f'create_summary_text_{format_type}'] = summarize_timings(timings, len(file_details))
+
+    # Secret redaction on its own, then as a share of a whole map run
+    redactor = mapper.Redactor()
+    timings, _ = time_stage(lambda: [redactor.redact(detail.content) for detail in file_details], repeat)
+    results['redact'] = summarize_timings(timings, len(file_details))
+    # Cold maps extract and redact every file; warm maps reuse a cache holding both, as the GUI,
+    # daemon and batch runs do after the first map
+    map_dir = tempfile.mkdtemp(prefix='mapper-bench-maps-')
+    try:
+        for stage, redact, warm in [('map', False, False), ('map_redacted', True, False),
+                                    ('map_warm', False, True), ('map_warm_redacted', True, True)]:
+            cache = mapper.ExtractionCache() if warm else None
+            def map_files():
+                write_redactor = mapper.Redactor() if redact else False
+                return mapper.write_summary(root, files, 'text', redact=write_redactor, cache=cache,
+                                            output_dir=map_dir)
+            if warm:
+                map_files()
+            timings, _ = time_stage(map_files, repeat)
+            results[stage] = summarize_timings(timings, len(files))
+        # Outline maps scan each file for its structure but write only signatures and docstrings;
+        # the outline is kept on the cached record, so warm runs don't scan again
+        for stage, warm in [('map_outline', False), ('map_outline_warm', True)]:
+            cache = mapper.ExtractionCache() if warm else None
+            def map_outline():
+                return mapper.write_summary(root, files, 'text', redact=False, cache=cache, output_dir=map_dir,
+                                            outline=True)
+            if warm:
+                map_outline()
+            timings, _ = time_stage(map_outline, repeat)
+            results[stage] = summarize_timings(timings, len(files))
+    finally:
+        shutil.rmtree(map_dir, ignore_errors=True)
+    full_size = len(mapper.create_summary_text(file_details, root, 'text', redact=False))
+    outline_size = len(mapper.create_summary_text(file_details, root, 'text', redact=False, outline=True))
+    results['map_outline']['shrink'] = full_size / outline_size
+    for plain, redacted in [('map', 'map_redacted'), ('map_warm', 'map_warm_redacted')]:
+        base = results[plain]['median']
+        results[redacted]['overhead_pct'] = (results[redacted]['median'] - base) / base * 100 if base else 0.0
+
+    output_dir = tempfile.mkdtemp(prefix='mapper-bench-out-')
+    try:
+        output_path = os.path.join(output_dir, 'map.txt')
+        def write():
+            with open(output_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+        timings, _ = time_stage(write, repeat)
+        results['write'] = summarize_timings(timings)
+        results['write']['bytes'] = len(content.encode('utf-8'))
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    return results, measure_record_memory(mapper, files)
+
+def get_git_commit():
+    """Return the current commit hash so results can be matched to a revision"""
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except Exception:
+        return None
+
+def compare_results(baseline, current):
+    """Print median deltas per stage between two result files"""
+    print(f"{'Stage':<30} {'Baseline':>12} {'Current':>12} {'Change':>10}")
+    for stage, data in current['stages'].items():
+        old = baseline.get('stages', {}).get(stage)
+        if not old:
+            print(f"{stage:<30} {'-':>12} {data['median'] * 1000:>10.2f}ms {'new':>10}")
+            continue
+        change = (data['median'] - old['median']) / old['median'] * 100 if old['median'] else 0.0
+        print(f"{stage:<30} {old['median'] * 1000:>10.2f}ms {data['median'] * 1000:>10.2f}ms {change:>+9.1f}%")
+    if baseline.get('memory') and current.get('memory'):
+        for key in ['bytes_per_file', 'overhead_per_file']:
+            old, new = baseline['memory'][key], current['memory'][key]
+            change = (new - old) / old * 100 if old else 0.0
+            print(f"{'memory ' + key:<30} {old:>11.0f}B {new:>11.0f}B {change:>+9.1f}%")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark folder-mapper stages on a synthetic tree")
+    parser.add_argument('--files', type=int, default=1000, help="Number of files to generate")
+    parser.add_argument('--depth', type=int, default=4, help="Directory depth")
+    parser.add_argument('--fanout', type=int, default=4, help="Subdirectories per directory")
+    parser.add_argument('--extensions', default=DEFAULT_EXTENSION_MIX, help="Extension mix, e.g. py=30,js=20")
+    parser.add_argument('--min-size', type=int, default=200, help="Minimum file size in bytes")
+    parser.add_argument('--max-size', type=int, default=8000, help="Maximum file size in bytes")
+    parser.add_argument('--ignored-ratio', type=float, default=0.2, help="Fraction of files under ignored dirs")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed for the generator")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per stage")
+    parser.add_argument('--walk-workers', type=int, default=16, help="Threads for the parallel walk stages")
+    parser.add_argument('--latency-ms', type=float, default=1.0,
+                        help="Delay added to each folder listing in the *_latency stages")
+    parser.add_argument('--tree', help="Benchmark an existing folder instead of generating one")
+    parser.add_argument('--keep-tree', action='store_true', help="Don't delete the generated tree")
+    parser.add_argument('--output', help="Write results JSON to this path")
+    parser.add_argument('--compare', help="Baseline results JSON to compare against")
+    args = parser.parse_args()
+
+    mapper = load_mapper()
+
+    generated_root = None
+    if args.tree:
+        root = os.path.abspath(args.tree)
+        tree_info = {'path': root}
+    else:
+        generated_root = tempfile.mkdtemp(prefix='mapper-bench-tree-')
+        root = generated_root
+        tree_info = generate_synthetic_tree(root, args.files, args.depth, args.fanout, args.extensions,
+                                            args.min_size, args.max_size, args.ignored_ratio, args.seed)
+        print(f"Generated {tree_info['files']} files ({tree_info['ignored_files']} ignored) in {root}")
+
+    try:
+        stages, memory = run_benchmarks(mapper, root, args.repeat, args.walk_workers, args.latency_ms)
+    finally:
+        if generated_root and not args.keep_tree:
+            shutil.rmtree(generated_root, ignore_errors=True)
+
+    results = {
+        'generated': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': get_git_commit(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'tree': tree_info,
+        'repeat': args.repeat,
+        'walk_workers': args.walk_workers,
+        'latency_ms': args.latency_ms,
+        'stages': stages,
+        'memory': memory
+    }
+
+    for stage, data in stages.items():
+        per_item = f" ({data['per_item_us']:.1f} us/item)" if 'per_item_us' in data else ""
+        print(f"{stage:<30} {data['median'] * 1000:>10.2f} ms{per_item}")
+    print(f"{'redaction overhead':<30} {stages['map_redacted']['overhead_pct']:>+10.1f} % of map time "
+          f"({stages['map_warm_redacted']['overhead_pct']:+.1f} % with a warm cache)")
+    print(f"{'outline shrink':<30} {stages['map_outline']['shrink']:>10.1f} x smaller than the full map")
+    print(f"{'parallel walk speedup':<30} {stages['walk_files_parallel']['speedup']:>10.2f} x over os.walk "
+          f"({stages['walk_files_parallel_latency']['speedup']:.2f} x with {args.latency_ms:g} ms per listing)")
+    print(f"{'record memory':<30} {memory['bytes_per_file']:>10.0f} B/file "
+          f"({memory['overhead_per_file']:.0f} B/file excluding contents)")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=4)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        compare_results(baseline, results)
+
+if __name__ == "__main__":
+    main()
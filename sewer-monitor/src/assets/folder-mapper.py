@@ -1,16 +1,27 @@
 import os
-import re
+import glob
+import sys
 import json
-import datetime
+import argparse
 import logging
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 from collections import defaultdict
-import subprocess
-import platform
-from pathlib import Path
+import threading
+import queue
 import time
 
+# Scanning, extraction and rendering live in the GUI-free foldermap module next to this script
+from foldermap import (ARCHIVE_MEMBER_MARKER, BYTES_PER_TOKEN, DEFAULT_PROFILE_NAME, PARALLEL_WALK_WORKERS,
+                       SCAN_BACKENDS, ExtractionCache, MapperClient, MapProfiler, Redactor, SelectionProfile,
+                       SummaryProgress, WalkOptions, add_to_recent_folders, apply_selection_profile, collect_files,
+                       compare_maps, format_file_size, get_file_modified_times, get_recent_folders, git_file_status,
+                       is_archive_path, iter_folder_extensions, iter_map_diff, iter_selected_files,
+                       load_batch_manifest, load_folder_preferences, load_preferences, parse_extension_list,
+                       parse_map_file, resolve_scan_backend, run_batch, run_daemon, save_file_modified_times,
+                       save_preferences, save_selection_profile, save_shared_profiles, select_relevant,
+                       to_profile_path, write_batch_index, write_summary)
+
 # Configure logging
 logging.basicConfig(
     filename='enhanced_file_mapper.log',
@@ -22,54 +33,14 @@ logging.basicConfig(
 CHECKED = "☑"
 UNCHECKED = "☐"
 
-# Common development folders and files to always ignore
-ALWAYS_IGNORE_DIRS = {
-    '.git', '__pycache__', 'node_modules', '.pytest_cache', 
-    'venv', 'env', '.env', '.venv', 'virtualenv', '.virtualenv',
-    '.tox', 'dist', 'build', '*.egg-info', '.eggs',
-    '.coverage', 'htmlcov', '.hypothesis', '.mypy_cache',
-    '.ruff_cache', '.sass-cache', 'bower_components',
-    '.next', '.nuxt', '.output', '.vercel', '.netlify'
-}
-
-ALWAYS_IGNORE_PATTERNS = {
-    '*.pyc', '*.pyo', '*.pyd', '__pycache__',
-    '*.so', '*.dylib', '*.dll', '*.class',
-    '.DS_Store', 'Thumbs.db', 'desktop.ini',
-    '*.swp', '*.swo', '*~', '*.bak', '*.tmp',
-    '*.log', '*.pid', '*.seed', '*.pid.lock'
-}
-
-def should_ignore_path(file_path, base_path):
-    """Check if a path should be ignored based on common development patterns"""
-    import fnmatch
-    
-    rel_path = os.path.relpath(file_path, base_path)
-    path_parts = rel_path.split(os.sep)
-    
-    # Check if any part of the path contains ignored directories
-    for part in path_parts:
-        if part in ALWAYS_IGNORE_DIRS:
-            return True
-        # Check for egg-info pattern
-        if part.endswith('.egg-info'):
-            return True
-    
-    # Check file patterns
-    file_name = os.path.basename(file_path)
-    for pattern in ALWAYS_IGNORE_PATTERNS:
-        if fnmatch.fnmatch(file_name, pattern):
-            return True
-    
-    return False
-
-def format_file_size(size_bytes):
-    """Format file size in human-readable format"""
-    for unit in ['B', 'KB', 'MB', 'GB']:
-        if size_bytes < 1024.0:
-            return f"{size_bytes:.1f} {unit}"
-        size_bytes /= 1024.0
-    return f"{size_bytes:.1f} TB"
+def show_message(level, title, message, interactive=True):
+    """Report a message through a messagebox, or to the console when running headless"""
+    if interactive:
+        {'info': messagebox.showinfo,
+         'warning': messagebox.showwarning,
+         'error': messagebox.showerror}[level](title, message)
+    else:
+        print(message, file=sys.stdout if level == 'info' else sys.stderr)
 
 def copy_to_clipboard(text):
     """Copy text to clipboard"""
@@ -81,405 +52,98 @@ def copy_to_clipboard(text):
     root.destroy()
     messagebox.showinfo("Copied", "Summary copied to clipboard!")
 
-def extract_py_details(file_path):
+def create_and_save_summary(folder_path, selected_files, output_format='text', copy_clipboard=False,
+                            profiler=None, interactive=True, cache=None, redact=None, outline=False, pinned=None):
+    profiler = profiler or MapProfiler()
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-            function_pattern = re.compile(r'def\s+(\w+)')
-            class_pattern = re.compile(r'class\s+(\w+)')
-            functions = re.findall(function_pattern, content)
-            classes = re.findall(class_pattern, content)
-        return {
-            'file': file_path,
-            'type': 'Python',
-            'functions': functions,
-            'classes': classes,
-            'content': content,
-            'lines': len(content.splitlines())
-        }
+        output_file_path, summary_content = write_summary(folder_path, selected_files, output_format,
+                                                          profiler, keep_content=copy_clipboard, cache=cache,
+                                                          redact=redact, outline=outline, pinned=pinned)
     except Exception as e:
-        logging.error(f"Error extracting Python details from {file_path}: {e}")
-        return {
-            'file': file_path,
-            'type': 'Python',
-            'functions': [],
-            'classes': [],
-            'content': "Error reading file content.",
-            'lines': 0
-        }
-
-def extract_js_details(file_path):
-    try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-            function_pattern = re.compile(r'function\s+(\w+)\s*\(')
-            arrow_function_pattern = re.compile(r'const\s+(\w+)\s*=\s*(?:\([^)]*\)|[^=])\s*=>')
-            class_pattern = re.compile(r'class\s+(\w+)\s*{')
-            functions = re.findall(function_pattern, content)
-            arrow_functions = re.findall(arrow_function_pattern, content)
-            functions.extend(arrow_functions)
-            classes = re.findall(class_pattern, content)
-        return {
-            'file': file_path,
-            'type': 'JavaScript',
-            'functions': functions,
-            'classes': classes,
-            'content': content,
-            'lines': len(content.splitlines())
-        }
-    except Exception as e:
-        logging.error(f"Error extracting JavaScript details from {file_path}: {e}")
-        return {
-            'file': file_path,
-            'type': 'JavaScript',
-            'functions': [],
-            'classes': [],
-            'content': "Error reading file content.",
-            'lines': 0
-        }
-
-def extract_css_details(file_path):
-    try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-            class_pattern = re.compile(r'\.([\w-]+)\s*{')
-            id_pattern = re.compile(r'#([\w-]+)\s*{')
-            classes = re.findall(class_pattern, content)
-            ids = re.findall(id_pattern, content)
-        return {
-            'file': file_path,
-            'type': 'CSS',
-            'classes': classes,
-            'ids': ids,
-            'content': content,
-            'lines': len(content.splitlines())
-        }
-    except Exception as e:
-        logging.error(f"Error extracting CSS details from {file_path}: {e}")
-        return {
-            'file': file_path,
-            'type': 'CSS',
-            'classes': [],
-            'ids': [],
-            'content': "Error reading file content.",
-            'lines': 0
-        }
-
-def extract_html_details(file_path):
-    try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-        return {
-            'file': file_path,
-            'type': 'HTML',
-            'content': content,
-            'lines': len(content.splitlines())
-        }
-    except Exception as e:
-        logging.error(f"Error extracting HTML details from {file_path}: {e}")
-        return {
-            'file': file_path,
-            'type': 'HTML',
-            'content': "Error reading file content.",
-            'lines': 0
-        }
-
-def extract_other_files(file_path):
-    try:
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as file:
-            content = file.read()
-            lines = len(content.splitlines())
-    except Exception as e:
-        logging.error(f"Error extracting details from {file_path}: {e}")
-        content = "Unable to read file content."
-        lines = 0
-    return {
-        'file': file_path,
-        'type': 'Other',
-        'content': content,
-        'lines': lines
-    }
-
-def create_summary_text(file_details, folder_path, format_type='text'):
-    """Create summary in specified format"""
-    output = []
-    
-    # Add statistics header
-    total_files = len(file_details)
-    total_lines = sum(d.get('lines', 0) for d in file_details)
-    file_type_counts = defaultdict(int)
-    for detail in file_details:
-        file_type_counts[detail['type']] += 1
-    
-    if format_type == 'markdown':
-        output.append("# File Summary Report")
-        output.append(f"\n**Generated:** {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        output.append(f"**Folder:** `{folder_path}`")
-        output.append(f"\n## Statistics")
-        output.append(f"- **Total Files:** {total_files}")
-        output.append(f"- **Total Lines:** {total_lines:,}")
-        output.append(f"\n### File Types")
-        for ftype, count in sorted(file_type_counts.items()):
-            output.append(f"- {ftype}: {count} files")
-        output.append("\n---\n")
-    else:
-        output.append("=" * 60)
-        output.append("FILE SUMMARY REPORT")
-        output.append("=" * 60)
-        output.append(f"Generated: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        output.append(f"Folder: {folder_path}")
-        output.append(f"\nStatistics:")
-        output.append(f"  Total Files: {total_files}")
-        output.append(f"  Total Lines: {total_lines:,}")
-        output.append(f"\nFile Types:")
-        for ftype, count in sorted(file_type_counts.items()):
-            output.append(f"  - {ftype}: {count} files")
-        output.append("\n" + "=" * 60 + "\n")
-    
-    # Group files by type
-    details_by_type = defaultdict(list)
-    for detail in file_details:
-        details_by_type[detail['type']].append(detail)
-    
-    # Add file details
-    for file_type, details in sorted(details_by_type.items()):
-        if format_type == 'markdown':
-            output.append(f"## {file_type} Files\n")
-        else:
-            output.append(f"=== {file_type} Files ===\n")
-        
-        for detail in details:
-            rel_path = os.path.relpath(detail['file'], folder_path)
-            
-            if format_type == 'markdown':
-                output.append(f"### `{rel_path}`")
-                output.append(f"*Lines: {detail.get('lines', 0)}*\n")
-                
-                if file_type in ['Python', 'JavaScript']:
-                    if detail['functions']:
-                        output.append(f"**Functions:** `{', '.join(detail['functions'])}`")
-                    if detail['classes']:
-                        output.append(f"**Classes:** `{', '.join(detail['classes'])}`")
-                elif file_type == 'CSS':
-                    if detail.get('classes'):
-                        output.append(f"**Classes:** `{', '.join(detail['classes'][:10])}`" + 
-                                    (" ..." if len(detail['classes']) > 10 else ""))
-                
-                output.append("\n```" + (file_type.lower() if file_type != 'Other' else ''))
-                output.append(detail['content'])
-                output.append("```\n")
-            else:
-                output.append("---")
-                output.append(f"File: {rel_path}")
-                output.append(f"Lines: {detail.get('lines', 0)}")
-                output.append("---")
-                
-                if file_type in ['Python', 'JavaScript']:
-                    output.append(f"Functions: {', '.join(detail['functions']) if detail['functions'] else 'None'}")
-                    output.append(f"Classes: {', '.join(detail['classes']) if detail['classes'] else 'None'}")
-                elif file_type == 'CSS':
-                    if detail.get('classes'):
-                        output.append(f"Classes: {', '.join(detail['classes'][:10])}" + 
-                                    (" ..." if len(detail['classes']) > 10 else ""))
-                
-                output.append("\nContents:")
-                output.append(detail['content'])
-                output.append("\n")
-    
-    return '\n'.join(output)
-
-def create_and_save_summary(folder_path, selected_files, output_format='text', copy_clipboard=False):
-    logging.info(f"Creating summary for folder: {folder_path}")
-    
-    # Categorize files by extension
-    categorized_files = defaultdict(list)
-    for file in selected_files:
-        ext = os.path.splitext(file)[1].lower()
-        categorized_files[ext].append(file)
-    
-    # Extract details based on file type
-    file_details = []
-    for ext, files in categorized_files.items():
-        for file in files:
-            if not os.path.exists(file):
-                logging.warning(f"File does not exist: {file}")
-                continue
-            if os.path.isdir(file):
-                logging.warning(f"Skipping directory: {file}")
-                continue
-            try:
-                if ext == '.py':
-                    detail = extract_py_details(file)
-                elif ext in ['.js', '.jsx', '.ts', '.tsx']:
-                    detail = extract_js_details(file)
-                elif ext == '.css':
-                    detail = extract_css_details(file)
-                elif ext in ['.html', '.htm']:
-                    detail = extract_html_details(file)
-                elif os.path.basename(file).lower() in ['dockerfile', 'docker-compose.yml', 'docker-compose.yaml', 'dockerfile.dev']:
-                    detail = extract_other_files(file)
-                    detail['type'] = 'Docker'
-                else:
-                    detail = extract_other_files(file)
-                file_details.append(detail)
-            except Exception as e:
-                logging.error(f"Error processing file {file}: {e}")
+        logging.error(f"Error writing summary for {folder_path}: {e}")
+        show_message('error', "Error", f"Failed to create summary file: {e}", interactive)
+        return None
     
-    if not file_details:
-        messagebox.showwarning("No Files to Process", "No valid files were selected to create a summary.")
-        logging.warning("No valid files found for summary creation.")
-        return
-    
-    # Generate summary content
-    summary_content = create_summary_text(file_details, folder_path, output_format)
+    if not output_file_path:
+        show_message('warning', "No Files to Process", "No valid files were selected to create a summary.",
+                     interactive)
+        return None
     
     # Copy to clipboard if requested
     if copy_clipboard:
         copy_to_clipboard(summary_content)
     
-    # Save to file
-    timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
-    extension = '.md' if output_format == 'markdown' else '.txt'
-    output_file_path = os.path.join(folder_path, f'map-{timestamp}{extension}')
-    
-    try:
-        with open(output_file_path, 'w', encoding='utf-8') as summary_file:
-            summary_file.write(summary_content)
-        logging.info(f"Summary file created at {output_file_path}")
-        messagebox.showinfo("Summary Created", f"Summary file created: {output_file_path}")
-    except Exception as e:
-        logging.error(f"Error writing summary file {output_file_path}: {e}")
-        messagebox.showerror("Error", f"Failed to create summary file: {e}")
-
-def load_preferences():
-    """Load preferences with backwards compatibility for old config files"""
-    # Try new preferences file first
-    new_pref_file = os.path.join(os.path.dirname(__file__), 'enhanced_folder_preferences.json')
-    old_pref_file = os.path.join(os.path.dirname(__file__), 'folder_preferences.json')
-    
-    # Check for new preferences file
-    if os.path.exists(new_pref_file):
-        try:
-            with open(new_pref_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception as e:
-            logging.warning(f"Error loading new preferences: {e}")
-    
-    # Fall back to old preferences file for backwards compatibility
-    if os.path.exists(old_pref_file):
-        try:
-            with open(old_pref_file, 'r', encoding='utf-8') as f:
-                old_prefs = json.load(f)
-                
-                # Migrate old preferences to new format if needed
-                if isinstance(old_prefs, dict):
-                    # Save to new file for future use
-                    save_preferences(old_prefs)
-                    logging.info("Migrated old preferences to new format")
-                    return old_prefs
-        except Exception as e:
-            logging.warning(f"Error loading old preferences: {e}")
-    
-    return {}
-
-def save_preferences(all_prefs):
-    pref_file = os.path.join(os.path.dirname(__file__), 'enhanced_folder_preferences.json')
-    try:
-        with open(pref_file, 'w', encoding='utf-8') as f:
-            json.dump(all_prefs, f, indent=4)
-        logging.info("Preferences saved")
-    except Exception as e:
-        logging.error(f"Error saving preferences: {e}")
+    show_message('info', "Summary Created",
+                 f"Summary file created: {output_file_path}\n\n{profiler.summary_line()}", interactive)
+    return output_file_path
 
-def load_folder_preferences(folder_path):
-    """Load preferences for a specific folder with backwards compatibility"""
-    prefs = load_preferences()
-    folder_prefs = prefs.get(folder_path, {})
+class ScanWorker(threading.Thread):
+    """Run a scan off the Tk thread and hand its results to the UI in batches.
     
-    # Ensure folder_prefs is a dict
-    if not isinstance(folder_prefs, dict):
-        logging.warning(f"Invalid preferences for folder {folder_path}, resetting")
-        folder_prefs = {}
+    `scan` is called with a cancel event and must return an iterable; items are
+    queued in batches and delivered on the Tk thread through `poll()`, which
+    reschedules itself with `after()` until the scan finishes.
+    """
     
-    # Extract saved extensions and files
-    saved_extensions = folder_prefs.get('extensions', [])
-    saved_files = folder_prefs.get('files', [])
+    def __init__(self, scan, batch_size=200, flush_interval=0.1):
+        super().__init__(daemon=True)
+        self.scan = scan
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.error = None
     
-    # Validate saved files exist
-    valid_saved_files = [f for f in saved_files if os.path.exists(f) and os.path.isfile(f)]
-    
-    if len(valid_saved_files) < len(saved_files):
-        logging.info(f"Some saved files no longer exist for {folder_path}")
-    
-    return saved_extensions, valid_saved_files
-
-def get_recent_folders(max_folders=10):
-    """Get list of recently used folders"""
-    prefs = load_preferences()
-    recent = prefs.get('_recent_folders', [])
-    return recent[:max_folders]
-
-def add_to_recent_folders(folder_path):
-    """Add folder to recent folders list"""
-    prefs = load_preferences()
-    recent = prefs.get('_recent_folders', [])
-    
-    # Remove if already exists
-    if folder_path in recent:
-        recent.remove(folder_path)
+    def run(self):
+        batch = []
+        last_flush = time.perf_counter()
+        try:
+            for item in self.scan(self.cancel_event):
+                batch.append(item)
+                now = time.perf_counter()
+                if len(batch) >= self.batch_size or now - last_flush >= self.flush_interval:
+                    self.queue.put(batch)
+                    batch = []
+                    last_flush = now
+        except Exception as e:
+            logging.error(f"Error during background scan: {e}")
+            self.error = e
+        finally:
+            if batch:
+                self.queue.put(batch)
+            self.queue.put(None)
     
-    # Add to front
-    recent.insert(0, folder_path)
+    def cancel(self):
+        self.cancel_event.set()
     
-    # Keep only last 10
-    recent = recent[:10]
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
     
-    prefs['_recent_folders'] = recent
-    save_preferences(prefs)
-
-def get_file_modified_times(folder_path):
-    """Get modification times for tracking new/changed files"""
-    prefs = load_preferences()
-    folder_prefs = prefs.get(folder_path, {})
-    return folder_prefs.get('file_times', {})
-
-def save_file_modified_times(folder_path, selected_files):
-    """Save modification times for selected files"""
-    prefs = load_preferences()
-    if folder_path not in prefs:
-        prefs[folder_path] = {}
-    
-    file_times = {}
-    for file in selected_files:
-        if os.path.exists(file):
-            file_times[file] = os.path.getmtime(file)
-    
-    prefs[folder_path]['file_times'] = file_times
-    save_preferences(prefs)
-
-def get_all_extensions(folder_path):
-    extensions = set()
-    for root, dirs, filenames in os.walk(folder_path):
-        # Filter out directories we should ignore (modifies dirs in place)
-        dirs[:] = [d for d in dirs if d not in ALWAYS_IGNORE_DIRS]
-        
-        for filename in filenames:
-            # Skip files that match ignore patterns
-            full_path = os.path.join(root, filename)
-            if should_ignore_path(full_path, folder_path):
-                continue
-            
-            ext = os.path.splitext(filename)[1].lower()
-            if ext:
-                extensions.add(ext)
-            else:
-                extensions.add('')
-    return sorted(extensions)
+    def poll(self, root, on_batch, on_done, interval=50, max_batches=20):
+        """Deliver queued batches to on_batch, then on_done once the scan has finished"""
+        for _ in range(max_batches):
+            try:
+                batch = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if batch is None:
+                on_done()
+                return
+            on_batch(batch)
+        try:
+            root.after(interval, self.poll, root, on_batch, on_done, interval, max_batches)
+        except tk.TclError:
+            # Window was destroyed; nobody is listening any more
+            self.cancel()
 
 class ExtensionSelector:
-    def __init__(self, folder_path, saved_extensions):
+    def __init__(self, folder_path, saved_extensions, profiler=None, backend='walk', walk_options=None):
         self.folder_path = folder_path
         self.saved_extensions = saved_extensions
+        self.profiler = profiler or MapProfiler()
+        self.backend = backend
+        self.walk_options = walk_options
         self.selected_extensions = []
         
         self.root = tk.Tk()
@@ -537,16 +201,21 @@ class ExtensionSelector:
         canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
-        # Get extensions and create checkboxes
-        extensions = get_all_extensions(self.folder_path)
+        # Checkboxes are added as the background scan discovers extensions
         self.ext_vars = {}
+        self.ext_checks = {}
+        self.files_scanned = 0
         
-        for ext in extensions:
-            var = tk.BooleanVar(value=(ext in self.saved_extensions) if self.saved_extensions else True)
-            self.ext_vars[ext] = var
-            display_ext = ext if ext else "[No Extension]"
-            chk = ttk.Checkbutton(self.scrollable_frame, text=display_ext, variable=var)
-            chk.pack(anchor=tk.W, pady=2)
+        # Scan progress frame
+        progress_frame = ttk.Frame(main_frame)
+        progress_frame.pack(fill=tk.X, pady=(10, 0))
+        
+        self.progress = ttk.Progressbar(progress_frame, mode='indeterminate', length=150)
+        self.progress.pack(side=tk.LEFT, padx=(0, 5))
+        self.progress_label = ttk.Label(progress_frame, text="Scanning...")
+        self.progress_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.cancel_button = ttk.Button(progress_frame, text="Stop Scan", command=self.cancel_scan)
+        self.cancel_button.pack(side=tk.RIGHT)
         
         # Button frame
         button_frame = ttk.Frame(main_frame)
@@ -558,6 +227,61 @@ class ExtensionSelector:
                   command=self.clear_all).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Confirm", 
                   command=self.confirm).pack(side=tk.RIGHT, padx=5)
+        
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.start_scan()
+    
+    def start_scan(self):
+        """Discover extensions on a worker thread, filling in the list as they appear"""
+        def scan(cancel_event):
+            with self.profiler.stage('walk_extensions'):
+                for ext in iter_folder_extensions(self.folder_path, self.profiler, cancel_event, self.backend,
+                                                  self.walk_options):
+                    yield ext
+        
+        self.progress.start(10)
+        self.worker = ScanWorker(scan)
+        self.worker.start()
+        self.worker.poll(self.root, self.on_scan_batch, self.on_scan_done)
+    
+    def on_scan_batch(self, batch):
+        self.files_scanned += len(batch)
+        for ext in batch:
+            if ext not in self.ext_vars:
+                self.add_extension(ext)
+        self.progress_label.config(
+            text=f"Scanning... {self.files_scanned} files, {len(self.ext_vars)} extensions")
+    
+    def add_extension(self, ext):
+        var = tk.BooleanVar(value=(ext in self.saved_extensions) if self.saved_extensions else True)
+        self.ext_vars[ext] = var
+        display_ext = ext if ext else "[No Extension]"
+        chk = ttk.Checkbutton(self.scrollable_frame, text=display_ext, variable=var)
+        chk.pack(anchor=tk.W, pady=2)
+        self.ext_checks[ext] = chk
+    
+    def on_scan_done(self):
+        self.progress.stop()
+        self.cancel_button.config(state=tk.DISABLED)
+        
+        # Re-pack checkboxes in sorted order now that the full list is known
+        for ext in sorted(self.ext_checks):
+            self.ext_checks[ext].pack_forget()
+            self.ext_checks[ext].pack(anchor=tk.W, pady=2)
+        
+        state = "Scan stopped" if self.worker.cancelled else "Scan complete"
+        if self.worker.error:
+            state = f"Scan failed: {self.worker.error}"
+        self.progress_label.config(
+            text=f"{state}: {self.files_scanned} files, {len(self.ext_vars)} extensions")
+    
+    def cancel_scan(self):
+        self.worker.cancel()
+    
+    def on_close(self):
+        self.worker.cancel()
+        self.root.quit()
+        self.root.destroy()
     
     def apply_preset(self, extensions):
         # First clear all
@@ -577,11 +301,12 @@ class ExtensionSelector:
             var.set(False)
     
     def confirm(self):
-        self.selected_extensions = [ext for ext, var in self.ext_vars.items() if var.get()]
+        self.selected_extensions = [ext for ext, var in sorted(self.ext_vars.items()) if var.get()]
         if not self.selected_extensions:
             if not messagebox.askyesno("No Extensions Selected", 
                                       "No extensions selected. Continue anyway?"):
                 return
+        self.worker.cancel()
         self.root.quit()
         self.root.destroy()
     
@@ -590,30 +315,49 @@ class ExtensionSelector:
         return self.selected_extensions
 
 class FileSelector:
-    def __init__(self, folder_path, selected_extensions, saved_selected_files):
+    def __init__(self, folder_path, selected_extensions, profiles, active_profile=DEFAULT_PROFILE_NAME,
+                 profiler=None, backend='walk', walk_options=None):
         self.folder_path = folder_path
         self.selected_extensions = selected_extensions
-        self.saved_selected_files = saved_selected_files
-        
-        # Get previous file times for highlighting
-        self.previous_file_times = get_file_modified_times(folder_path)
+        self.selection_profiles = profiles
+        self.selection_name = active_profile
+        self.selection = profiles.get(active_profile) or SelectionProfile()
+        self.profiler = profiler or MapProfiler()
+        self.backend = resolve_scan_backend(folder_path, backend)
+        self.walk_options = walk_options
+        
+        # Get previous file times for highlighting; in git checkouts the status
+        # comes from the index and HEAD instead (filled in by the scan worker)
+        self.previous_file_times = get_file_modified_times(folder_path) if self.backend == 'walk' else {}
+        self.git_status = None
         
         self.root = tk.Tk()
         self.root.title("Select Files")
-        self.root.geometry("900x700")
+        self.root.geometry("900x740")
         
         # Center window
         self.root.update_idletasks()
         width = 900
-        height = 700
+        height = 740
         x = (self.root.winfo_screenwidth() // 2) - (width // 2)
         y = (self.root.winfo_screenheight() // 2) - (height // 2)
         self.root.geometry(f'{width}x{height}+{x}+{y}')
         
         self.selected_files = []
         self.file_vars = {}
+        self.file_sizes = {}
+        self.file_rel_paths = {}
         self.item_to_file = {}
         self.all_items = []
+        self.folder_nodes = {}
+        self.folder_file_counts = defaultdict(int)
+        self.summary_thread = None
+        self.summary_progress = None
+        self.summary_profiler = None
+        # The last ranking's stages; ranking runs on its own thread so it can't share self.profiler with a scan
+        self.ranking_profiler = MapProfiler()
+        # Shared by relevance ranking and summary generation so files are read once
+        self.cache = ExtractionCache()
         
         self.setup_ui()
         self.populate_tree()
@@ -643,6 +387,42 @@ class FileSelector:
         ttk.Button(search_frame, text="Clear", 
                   command=lambda: self.search_var.set("")).pack(side=tk.LEFT, padx=5)
         
+        # Selection profile frame
+        profile_frame = ttk.LabelFrame(main_frame, text="Selection Profile")
+        profile_frame.pack(fill=tk.X, pady=(0, 5))
+        
+        self.selection_var = tk.StringVar(value=self.selection_name)
+        self.selection_combo = ttk.Combobox(profile_frame, textvariable=self.selection_var, 
+                                          values=sorted(self.selection_profiles), width=15)
+        self.selection_combo.pack(side=tk.LEFT, padx=5, pady=5)
+        self.selection_combo.bind('<<ComboboxSelected>>', self.on_profile_chosen)
+        
+        ttk.Label(profile_frame, text="Include:").pack(side=tk.LEFT)
+        self.include_var = tk.StringVar(value=", ".join(self.selection.include))
+        ttk.Entry(profile_frame, textvariable=self.include_var, width=20).pack(side=tk.LEFT, padx=5)
+        ttk.Label(profile_frame, text="Exclude:").pack(side=tk.LEFT)
+        self.exclude_var = tk.StringVar(value=", ".join(self.selection.exclude))
+        ttk.Entry(profile_frame, textvariable=self.exclude_var, width=20).pack(side=tk.LEFT, padx=5)
+        
+        ttk.Button(profile_frame, text="Apply Rules", 
+                  command=self.apply_rules).pack(side=tk.LEFT, padx=5)
+        ttk.Button(profile_frame, text="Share in Folder", 
+                  command=self.share_profiles).pack(side=tk.RIGHT, padx=5)
+        
+        # Relevance frame
+        relevance_frame = ttk.LabelFrame(main_frame, text="Relevant To")
+        relevance_frame.pack(fill=tk.X, pady=(0, 5))
+        
+        self.query_var = tk.StringVar()
+        ttk.Entry(relevance_frame, textvariable=self.query_var).pack(side=tk.LEFT, fill=tk.X, expand=True, 
+                                                                    padx=5, pady=5)
+        ttk.Label(relevance_frame, text="Budget (KB):").pack(side=tk.LEFT)
+        self.budget_var = tk.StringVar(value="200")
+        ttk.Entry(relevance_frame, textvariable=self.budget_var, width=8).pack(side=tk.LEFT, padx=5)
+        self.rank_button = ttk.Button(relevance_frame, text="Pre-check Top Files", 
+                                     command=self.check_relevant)
+        self.rank_button.pack(side=tk.LEFT, padx=5)
+        
         # Tree frame
         tree_frame = ttk.Frame(main_frame)
         tree_frame.pack(fill=tk.BOTH, expand=True)
@@ -702,11 +482,26 @@ class FileSelector:
         # Bind events
         self.tree.bind("<Button-1>", self.toggle_check)
         self.tree.bind('<space>', self.on_space)
+        self.tree.bind('<Button-3>', self.show_tree_menu)
+        
+        self.tree_menu = tk.Menu(self.root, tearoff=0)
+        self.tree_menu.add_command(label="Pin (keep in full in outlines)", command=self.pin_selected)
         
         # Status label
         self.status_label = ttk.Label(main_frame, text="")
         self.status_label.pack(fill=tk.X, pady=(5, 0))
         
+        # Scan progress frame
+        progress_frame = ttk.Frame(main_frame)
+        progress_frame.pack(fill=tk.X, pady=(5, 0))
+        
+        self.progress = ttk.Progressbar(progress_frame, mode='indeterminate', length=200)
+        self.progress.pack(side=tk.LEFT, padx=(0, 5))
+        self.progress_label = ttk.Label(progress_frame, text="Scanning...")
+        self.progress_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.cancel_button = ttk.Button(progress_frame, text="Stop Scan", command=self.cancel_scan)
+        self.cancel_button.pack(side=tk.RIGHT)
+        
         # Button frame
         button_frame = ttk.Frame(main_frame)
         button_frame.pack(fill=tk.X, pady=(10, 0))
@@ -734,83 +529,121 @@ class FileSelector:
         ttk.Checkbutton(output_frame, text="Copy to Clipboard", 
                        variable=self.clipboard_var).pack(side=tk.LEFT, padx=10)
         
-        ttk.Button(button_frame, text="Generate Summary", 
-                  command=self.generate_summary).pack(side=tk.RIGHT, padx=5)
-    
-    def populate_tree(self):
-        # Collect files
-        files = []
-        docker_files = ['dockerfile', 'docker-compose.yml', 'docker-compose.yaml', 'dockerfile.dev']
+        self.profile_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(output_frame, text="Detailed Profiling", 
+                       variable=self.profile_var).pack(side=tk.LEFT, padx=5)
         
-        for root_dir, dirs, filenames in os.walk(self.folder_path):
-            # Filter out directories we should ignore (modifies dirs in place)
-            dirs[:] = [d for d in dirs if d not in ALWAYS_IGNORE_DIRS]
-            
-            for filename in filenames:
-                ext = os.path.splitext(filename)[1].lower()
-                full_path = os.path.join(root_dir, filename)
-                
-                # Check if path should be ignored
-                if should_ignore_path(full_path, self.folder_path):
-                    continue
-                
-                if os.path.isfile(full_path):
-                    if ext in self.selected_extensions or (ext == '' and filename.lower() in docker_files):
-                        files.append(full_path)
-        
-        # Organize files by folder
-        folder_items = defaultdict(list)
-        for file in files:
-            rel_path = os.path.relpath(file, self.folder_path)
-            folder = os.path.dirname(rel_path)
-            folder_items[folder].append(file)
+        redaction = load_preferences().get('_redaction') or {}
+        self.redact_var = tk.BooleanVar(value=redaction.get('enabled', True))
+        ttk.Checkbutton(output_frame, text="Redact Secrets", 
+                       variable=self.redact_var).pack(side=tk.LEFT, padx=5)
         
-        # Create folder structure
-        folder_nodes = {}
-        for folder in sorted(folder_items.keys()):
-            if folder == '':
-                continue
-            parts = folder.split(os.sep)
-            current = ""
-            for part in parts:
-                parent = current
-                current = os.path.join(current, part) if current else part
-                if current not in folder_nodes:
-                    if parent == "":
-                        node = self.tree.insert("", "end", text=part, open=True, 
-                                              values=("", "", UNCHECKED), tags=('folder',))
-                        folder_nodes[current] = node
-                    else:
-                        parent_node = folder_nodes.get(parent)
-                        node = self.tree.insert(parent_node, "end", text=part, open=True, 
-                                              values=("", "", UNCHECKED), tags=('folder',))
-                        folder_nodes[current] = node
+        self.outline_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(output_frame, text="Outline Only", 
+                       variable=self.outline_var).pack(side=tk.LEFT, padx=5)
         
-        # Add files to folders
-        for folder, items in folder_items.items():
-            folder_node = folder_nodes.get(folder, "")
-            for idx, file in enumerate(sorted(items)):
-                self.add_file_to_tree(file, folder_node, idx % 2 == 0)
+        # Globs kept in full in an outline; "Pin" in the tree's right-click menu adds to them
+        ttk.Label(output_frame, text="Pinned:").pack(side=tk.LEFT)
+        self.pinned_var = tk.StringVar()
+        ttk.Entry(output_frame, textvariable=self.pinned_var, width=15).pack(side=tk.LEFT, padx=5)
+        
+        self.generate_button = ttk.Button(button_frame, text="Generate Summary", 
+                                         command=self.generate_summary, state=tk.DISABLED)
+        self.generate_button.pack(side=tk.RIGHT, padx=5)
+        
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+    
+    def populate_tree(self):
+        """Scan for matching files on a worker thread and add them to the tree in batches"""
+        def scan(cancel_event):
+            if self.backend == 'git':
+                with self.profiler.stage('git_status'):
+                    self.git_status = git_file_status(self.folder_path)
+            with self.profiler.stage('walk_files'):
+                for path, file_stat in iter_selected_files(self.folder_path, self.selected_extensions,
+                                                           self.profiler, cancel_event, self.backend,
+                                                           self.walk_options):
+                    yield path, file_stat.st_size, file_stat.st_mtime
+        
+        self.progress.start(10)
+        self.worker = ScanWorker(scan)
+        self.worker.start()
+        self.worker.poll(self.root, self.on_scan_batch, self.on_scan_done)
+    
+    def get_folder_node(self, folder):
+        """Return the tree node for a relative folder, creating it and its parents as needed"""
+        if folder == '':
+            return ""
+        node = self.folder_nodes.get(folder)
+        if node is None:
+            parent_node = self.get_folder_node(os.path.dirname(folder))
+            name = os.path.basename(folder)
+            if name.endswith(ARCHIVE_MEMBER_MARKER) and is_archive_path(name[:-1]):
+                # Archive members hang off a node for the archive itself
+                name = f"{name[:-1]} (archive)"
+            node = self.tree.insert(parent_node, "end", text=name, open=True, 
+                                    values=("", "", UNCHECKED), tags=('folder',))
+            self.folder_nodes[folder] = node
+        return node
+    
+    def on_scan_batch(self, batch):
+        for file_path, size, mtime in batch:
+            rel_path = os.path.relpath(file_path, self.folder_path)
+            folder = os.path.dirname(rel_path)
+            folder_node = self.get_folder_node(folder)
+            idx = self.folder_file_counts[folder]
+            self.folder_file_counts[folder] += 1
+            self.add_file_to_tree(file_path, folder_node, idx % 2 == 0, size, mtime, to_profile_path(rel_path))
+        self.progress_label.config(text=f"Scanning... {len(self.file_vars)} files found")
+    
+    def on_scan_done(self):
+        self.progress.stop()
+        self.cancel_button.config(state=tk.DISABLED)
+        self.generate_button.config(state=tk.NORMAL)
         
         # Update folder check states
-        for node in folder_nodes.values():
+        for node in self.folder_nodes.values():
             self.update_folder_check(node)
         
+        state = "Scan stopped" if self.worker.cancelled else "Scan complete"
+        if self.worker.error:
+            state = f"Scan failed: {self.worker.error}"
+        self.progress_label.config(text=f"{state}: {len(self.file_vars)} files found")
+        
         # Update status
         self.update_status()
     
-    def add_file_to_tree(self, file_path, parent_node, use_alternate=False):
+    def cancel_scan(self):
+        self.worker.cancel()
+    
+    def on_close(self):
+        self.worker.cancel()
+        # Let a running summary clean up its partial output before exiting
+        if self.summary_thread is not None and self.summary_thread.is_alive():
+            self.summary_progress.cancel()
+            self.summary_thread.join(timeout=5)
+        self.root.quit()
+        self.root.destroy()
+    
+    def add_file_to_tree(self, file_path, parent_node, use_alternate=False, file_size=None, current_mtime=None,
+                         rel_path=None):
         """Add a file to the tree with size and status info"""
         file_name = os.path.basename(file_path)
-        file_size = os.path.getsize(file_path)
+        if file_size is None:
+            file_size = os.path.getsize(file_path)
         size_str = format_file_size(file_size)
         
         # Check if file is new or modified
         status = ""
         tags = ['file']
-        current_mtime = os.path.getmtime(file_path)
-        
-        if file_path in self.previous_file_times:
+        if current_mtime is None:
+            current_mtime = os.path.getmtime(file_path)
+        
+        if self.git_status is not None:
+            status = self.git_status.get(file_path, "")
+            if status:
+                tags = ['new_file' if status == "New" else 'modified_file']
+        elif file_path in self.previous_file_times:
             if current_mtime > self.previous_file_times[file_path]:
                 status = "Modified"
                 tags = ['modified_file']  # Replace tags instead of append
@@ -822,8 +655,10 @@ class FileSelector:
         if use_alternate and tags == ['file']:
             tags.append('alternate')
         
-        # Check if file was previously selected
-        checked = file_path in self.saved_selected_files if self.saved_selected_files else True
+        # Resolve the selection from the active profile's rules
+        if rel_path is None:
+            rel_path = to_profile_path(os.path.relpath(file_path, self.folder_path))
+        checked = self.selection.is_selected(rel_path)
         checked_symbol = CHECKED if checked else UNCHECKED
         
         item_id = self.tree.insert(parent_node, "end", text=file_name, 
@@ -832,8 +667,100 @@ class FileSelector:
         
         self.item_to_file[item_id] = file_path
         self.file_vars[file_path] = tk.BooleanVar(value=checked)
+        self.file_sizes[file_path] = file_size
+        self.file_rel_paths[file_path] = rel_path
         self.all_items.append(item_id)
     
+    @staticmethod
+    def parse_globs(text):
+        return [pattern.strip() for pattern in text.split(',') if pattern.strip()]
+    
+    def apply_selection(self, profile):
+        """Re-check every file in the tree according to a profile"""
+        self.selection = profile
+        self.set_checked(lambda file_path: profile.is_selected(self.file_rel_paths[file_path]))
+    
+    def set_checked(self, is_checked):
+        """Set every file's check state from a predicate on its path"""
+        for item in self.all_items:
+            file_path = self.item_to_file[item]
+            checked = is_checked(file_path)
+            self.tree.set(item, "Select", CHECKED if checked else UNCHECKED)
+            self.file_vars[file_path].set(checked)
+        for node in self.folder_nodes.values():
+            self.update_folder_check(node)
+        self.update_status()
+    
+    def check_relevant(self):
+        """Rank the listed files against the query on a worker thread, then check the best that fit the budget"""
+        query = self.query_var.get().strip()
+        if not query:
+            messagebox.showwarning("No Query", "Type what the files should be relevant to.")
+            return
+        try:
+            budget = int(float(self.budget_var.get() or 0) * 1024) or None
+        except ValueError:
+            messagebox.showwarning("Invalid Budget", "Enter the budget in KB, e.g. 200, or leave it empty.")
+            return
+        
+        files = list(self.file_vars)
+        ranking = {'profiler': MapProfiler()}
+        
+        def run_ranking():
+            try:
+                ranking['files'] = select_relevant(self.folder_path, files, query, budget, cache=self.cache,
+                                                   profiler=ranking['profiler'])
+            except Exception as e:
+                logging.error(f"Error ranking files for {query!r}: {e}")
+                ranking['error'] = e
+        
+        self.rank_button.config(state=tk.DISABLED)
+        self.progress_label.config(text=f"Ranking {len(files)} files...")
+        thread = threading.Thread(target=run_ranking, daemon=True)
+        thread.start()
+        self.poll_ranking(thread, ranking, query)
+    
+    def poll_ranking(self, thread, ranking, query):
+        if thread.is_alive():
+            self.root.after(100, self.poll_ranking, thread, ranking, query)
+            return
+        self.rank_button.config(state=tk.NORMAL)
+        self.ranking_profiler = ranking['profiler']
+        if 'error' in ranking:
+            self.progress_label.config(text="Ranking failed")
+            messagebox.showerror("Error", f"Failed to rank files: {ranking['error']}")
+            return
+        chosen = set(ranking['files'])
+        self.set_checked(lambda file_path: file_path in chosen)
+        self.progress_label.config(text=f"Checked the {len(chosen)} files most relevant to {query!r}")
+    
+    def apply_rules(self):
+        """Apply the include/exclude globs as typed, dropping hand-toggled exceptions"""
+        self.apply_selection(SelectionProfile(self.parse_globs(self.include_var.get()),
+                                            self.parse_globs(self.exclude_var.get())))
+    
+    def on_profile_chosen(self, event):
+        self.selection_name = self.selection_var.get()
+        profile = self.selection_profiles[self.selection_name]
+        self.include_var.set(", ".join(profile.include))
+        self.exclude_var.set(", ".join(profile.exclude))
+        self.apply_selection(profile)
+    
+    def current_selection(self):
+        """Capture the tree's current check states as a profile on top of the typed rules"""
+        states = {self.file_rel_paths[f]: var.get() for f, var in self.file_vars.items()}
+        return SelectionProfile.from_selection(states, self.parse_globs(self.include_var.get()),
+                                               self.parse_globs(self.exclude_var.get()))
+    
+    def share_profiles(self):
+        name = self.selection_var.get().strip() or DEFAULT_PROFILE_NAME
+        self.selection_profiles[name] = self.current_selection()
+        try:
+            shared_file = save_shared_profiles(self.folder_path, self.selection_profiles)
+            messagebox.showinfo("Profiles Shared", f"Selection profiles written to {shared_file}")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to write shared profiles: {e}")
+    
     def filter_tree(self, *args):
         """Filter tree based on search text"""
         search_text = self.search_var.get().lower()
@@ -912,6 +839,29 @@ class FileSelector:
             self.update_folder_check(self.tree.parent(selected_item))
             self.update_status()
     
+    def show_tree_menu(self, event):
+        item = self.tree.identify_row(event.y)
+        if not item:
+            return
+        if item not in self.tree.selection():
+            self.tree.selection_set(item)
+        self.tree_menu.tk_popup(event.x_root, event.y_root)
+    
+    def pin_selected(self):
+        """Add the selected files, and everything under selected folders, to the pinned globs"""
+        folder_paths = {node: folder for folder, node in self.folder_nodes.items()}
+        pinned = self.parse_globs(self.pinned_var.get())
+        for item in self.tree.selection():
+            if item in self.item_to_file:
+                pattern = glob.escape(self.file_rel_paths[self.item_to_file[item]])
+            elif item in folder_paths:
+                pattern = glob.escape(to_profile_path(folder_paths[item])) + '/*'
+            else:
+                continue
+            if pattern not in pinned:
+                pinned.append(pattern)
+        self.pinned_var.set(", ".join(pinned))
+    
     def select_all(self):
         for item in self.tree.get_children():
             self.check_children(item, True)
@@ -941,7 +891,7 @@ class FileSelector:
     def update_status(self):
         """Update status label with selection info"""
         selected = [file for file, var in self.file_vars.items() if var.get()]
-        total_size = sum(os.path.getsize(f) for f in selected if os.path.exists(f))
+        total_size = sum(self.file_sizes.get(f, 0) for f in selected)
         self.status_label.config(text=f"{len(selected)} files selected ({format_file_size(total_size)} total)")
     
     def generate_summary(self):
@@ -950,48 +900,159 @@ class FileSelector:
             messagebox.showwarning("No Files Selected", "No files selected. Please select files to include.")
             return
         
-        # Save preferences
-        prefs = load_preferences()
-        if self.folder_path not in prefs:
-            prefs[self.folder_path] = {}
-        prefs[self.folder_path]['extensions'] = self.selected_extensions
-        prefs[self.folder_path]['files'] = selected
-        save_preferences(prefs)
+        # Save the selection as a rule-based profile rather than a list of paths
+        self.selection_name = self.selection_var.get().strip() or DEFAULT_PROFILE_NAME
+        self.selection = self.selection_profiles[self.selection_name] = self.current_selection()
+        save_selection_profile(self.folder_path, self.selection_name, self.selection, self.selected_extensions)
         
-        # Save file times
-        save_file_modified_times(self.folder_path, selected)
+        # Save file times (git checkouts take their status from the index instead)
+        if self.backend == 'walk':
+            save_file_modified_times(self.folder_path, selected)
         
         # Add to recent folders
         add_to_recent_folders(self.folder_path)
         
         self.selected_files = selected
-        self.root.quit()
-        self.root.destroy()
+        self.worker.cancel()
+        self.generate_button.config(state=tk.DISABLED)
+        
+        # Read Tk variables here; the worker thread must not touch them
+        output_format = self.format_var.get()
+        copy_clipboard = self.clipboard_var.get()
+        detailed_profiling = self.profile_var.get()
+        redact = self.redact_var.get()
+        outline = self.outline_var.get()
+        pinned = self.parse_globs(self.pinned_var.get())
+        
+        self.summary_progress = SummaryProgress(len(selected), sum(self.file_sizes.get(f, 0) for f in selected))
+        self.summary_result = {}
+        # Each attempt gets its own profiler so a retry after a cancel or failure reports only itself,
+        # starting from the walks that listed the files
+        profiler = self.summary_profiler = MapProfiler(detailed_profiling, detailed_profiling)
+        profiler.merge(self.profiler)
+        profiler.merge(self.ranking_profiler)
+        
+        def run_summary():
+            # cProfile only sees the thread it was enabled on, so start it here
+            profiler.start()
+            try:
+                self.summary_result['output'] = write_summary(self.folder_path, selected, output_format,
+                                                              profiler, self.summary_progress,
+                                                              keep_content=copy_clipboard, cache=self.cache,
+                                                              redact=redact, outline=outline, pinned=pinned)
+            except Exception as e:
+                logging.error(f"Error writing summary for {self.folder_path}: {e}")
+                self.summary_result['error'] = e
+            finally:
+                profiler.stop()
+        
+        self.summary_thread = threading.Thread(target=run_summary, daemon=True)
+        self.progress_dialog = SummaryProgressDialog(self.root, self.summary_progress)
+        self.summary_thread.start()
+        self.poll_summary(copy_clipboard)
+    
+    def poll_summary(self, copy_clipboard):
+        """Refresh the progress dialog until the summary worker finishes, then report the result"""
+        if self.summary_thread.is_alive():
+            self.progress_dialog.refresh()
+            self.root.after(100, self.poll_summary, copy_clipboard)
+            return
         
-        # Create summary with selected options
-        create_and_save_summary(self.folder_path, selected, 
-                              self.format_var.get(), 
-                              self.clipboard_var.get())
+        self.progress_dialog.close()
+        output_file_path, summary_content = self.summary_result.get('output', (None, None))
+        
+        if 'error' in self.summary_result:
+            messagebox.showerror("Error", f"Failed to create summary file: {self.summary_result['error']}")
+        elif self.summary_progress.cancelled:
+            messagebox.showinfo("Summary Cancelled", "Summary generation was cancelled and partial output removed.")
+        elif not output_file_path:
+            messagebox.showwarning("No Files to Process", "No valid files were selected to create a summary.")
+        else:
+            if copy_clipboard:
+                self.root.clipboard_clear()
+                self.root.clipboard_append(summary_content)
+                self.root.update()
+            messagebox.showinfo("Summary Created",
+                                f"Summary file created: {output_file_path}\n\n{self.summary_profiler.summary_line()}")
+            self.root.quit()
+            self.root.destroy()
+            return
+        
+        self.generate_button.config(state=tk.NORMAL)
     
     def run(self):
         self.root.mainloop()
         return self.selected_files
 
+class SummaryProgressDialog:
+    """Modal dialog showing summary progress, throughput and ETA with a cancel button"""
+    
+    def __init__(self, parent, progress):
+        self.progress = progress
+        self.window = tk.Toplevel(parent)
+        self.window.title("Generating Summary")
+        self.window.resizable(False, False)
+        self.window.transient(parent)
+        
+        frame = ttk.Frame(self.window)
+        frame.pack(fill=tk.BOTH, expand=True, padx=15, pady=15)
+        
+        self.phase_label = ttk.Label(frame, text="Starting...")
+        self.phase_label.pack(anchor=tk.W)
+        self.bar = ttk.Progressbar(frame, mode='determinate', maximum=100, length=350)
+        self.bar.pack(fill=tk.X, pady=8)
+        self.bytes_label = ttk.Label(frame, text="")
+        self.bytes_label.pack(anchor=tk.W)
+        self.rate_label = ttk.Label(frame, text="")
+        self.rate_label.pack(anchor=tk.W)
+        
+        self.cancel_button = ttk.Button(frame, text="Cancel", command=self.cancel)
+        self.cancel_button.pack(anchor=tk.E, pady=(10, 0))
+        
+        self.window.protocol("WM_DELETE_WINDOW", self.cancel)
+        self.window.grab_set()
+    
+    def refresh(self):
+        progress = self.progress
+        if progress.cancelled:
+            self.phase_label.config(text="Cancelling...")
+        elif progress.phase == 'extract':
+            self.phase_label.config(text=f"Extracting files: {progress.files_done}/{progress.total_files}")
+        else:
+            self.phase_label.config(text="Writing map...")
+        self.bar['value'] = progress.fraction * 100
+        self.bytes_label.config(text=f"Read {format_file_size(progress.bytes_read)}, "
+                                     f"written {format_file_size(progress.bytes_written)}")
+        eta = progress.eta
+        self.rate_label.config(text=f"Throughput: {format_file_size(progress.throughput)}/s"
+                                    + (f", ETA {eta:.0f}s" if eta is not None else ""))
+    
+    def cancel(self):
+        self.progress.cancel()
+        self.cancel_button.config(state=tk.DISABLED)
+        self.refresh()
+    
+    def close(self):
+        self.window.grab_release()
+        self.window.destroy()
+
 class FolderSelector:
     def __init__(self):
         self.root = tk.Tk()
         self.root.title("Select Folder")
-        self.root.geometry("500x200")
+        self.root.geometry("500x355")
         
         # Center window
         self.root.update_idletasks()
         width = 500
-        height = 200
+        height = 355
         x = (self.root.winfo_screenwidth() // 2) - (width // 2)
         y = (self.root.winfo_screenheight() // 2) - (height // 2)
         self.root.geometry(f'{width}x{height}+{x}+{y}')
         
         self.folder_path = None
+        self.scan_backend = 'walk'
+        self.walk_options = WalkOptions()
         
         self.setup_ui()
     
@@ -1009,6 +1070,34 @@ class FolderSelector:
         ttk.Button(main_frame, text="Browse Folder...", 
                   command=self.browse_folder, width=20).pack(pady=5)
         
+        # Git index backend
+        self.use_git_var = tk.BooleanVar(value=load_preferences().get('_use_git_index', False))
+        ttk.Checkbutton(main_frame, text="Use git index in git checkouts (faster, skips ignored files)", 
+                       variable=self.use_git_var).pack(pady=5)
+        
+        # Link and mount handling
+        saved_walk_options = WalkOptions.from_dict(load_preferences().get('_walk_options'))
+        walk_frame = ttk.Frame(main_frame)
+        walk_frame.pack()
+        self.follow_symlinks_var = tk.BooleanVar(value=saved_walk_options.follow_symlinks)
+        self.one_filesystem_var = tk.BooleanVar(value=saved_walk_options.one_filesystem)
+        self.dedupe_inodes_var = tk.BooleanVar(value=saved_walk_options.dedupe_inodes)
+        ttk.Checkbutton(walk_frame, text="Follow symlinks", 
+                       variable=self.follow_symlinks_var).pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(walk_frame, text="Stay on one filesystem", 
+                       variable=self.one_filesystem_var).pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(walk_frame, text="Skip duplicate links", 
+                       variable=self.dedupe_inodes_var).pack(side=tk.LEFT, padx=5)
+        self.expand_archives_var = tk.BooleanVar(value=saved_walk_options.expand_archives)
+        ttk.Checkbutton(main_frame, text="List archive contents (zip, wheel, tar) as files", 
+                       variable=self.expand_archives_var).pack(pady=5)
+        self.reuse_listings_var = tk.BooleanVar(value=saved_walk_options.reuse_listings)
+        ttk.Checkbutton(main_frame, text="Reuse folder listings from the last scan (faster rescans)", 
+                       variable=self.reuse_listings_var).pack(pady=5)
+        self.parallel_walk_var = tk.BooleanVar(value=saved_walk_options.walk_workers > 0)
+        ttk.Checkbutton(main_frame, text="List folders in parallel (faster on network drives)", 
+                       variable=self.parallel_walk_var).pack(pady=5)
+        
         # Recent folders
         recent_folders = get_recent_folders()
         if recent_folders:
@@ -1025,19 +1114,35 @@ class FolderSelector:
         folder_path = filedialog.askdirectory(initialdir=initial_dir)
         if folder_path:
             self.folder_path = folder_path
+            self.save_scan_options()
             self.root.quit()
             self.root.destroy()
     
     def on_recent_selected(self, event):
         self.folder_path = self.recent_var.get()
+        self.save_scan_options()
         self.root.quit()
         self.root.destroy()
     
+    def save_scan_options(self):
+        """Remember the chosen backend and walk options for this and later runs"""
+        self.scan_backend = 'git' if self.use_git_var.get() else 'walk'
+        self.walk_options = WalkOptions(self.follow_symlinks_var.get(), self.one_filesystem_var.get(),
+                                        self.dedupe_inodes_var.get(), self.expand_archives_var.get(),
+                                        self.reuse_listings_var.get(),
+                                        PARALLEL_WALK_WORKERS if self.parallel_walk_var.get() else 0)
+        prefs = load_preferences()
+        prefs['_use_git_index'] = self.use_git_var.get()
+        prefs['_walk_options'] = self.walk_options.to_dict()
+        save_preferences(prefs)
+    
     def run(self):
         self.root.mainloop()
         return self.folder_path
 
-def main():
+def run_gui():
+    profiler = MapProfiler()
+    
     # Select folder with options
     folder_selector = FolderSelector()
     folder_path = folder_selector.run()
@@ -1050,13 +1155,12 @@ def main():
     logging.info(f"Folder selected: {folder_path}")
     
     # Load preferences for this folder with backwards compatibility
-    saved_extensions, saved_files = load_folder_preferences(folder_path)
-    
-    # Select extensions
-    if not saved_extensions:
-        saved_extensions = get_all_extensions(folder_path)
+    saved_extensions, profiles, active_profile = load_folder_preferences(folder_path)
     
-    ext_selector = ExtensionSelector(folder_path, saved_extensions)
+    # Select extensions (all discovered extensions start checked when none were saved)
+    backend = folder_selector.scan_backend
+    walk_options = folder_selector.walk_options
+    ext_selector = ExtensionSelector(folder_path, saved_extensions, profiler, backend, walk_options)
     selected_extensions = ext_selector.run()
     
     if not selected_extensions:
@@ -1065,12 +1169,324 @@ def main():
         return
     
     # Select files (removed respect_gitignore parameter)
-    file_selector = FileSelector(folder_path, selected_extensions, saved_files)
+    file_selector = FileSelector(folder_path, selected_extensions, profiles, active_profile, profiler, backend,
+                                 walk_options)
     file_selector.run()
 
-if __name__ == "__main__":
+def walk_options_from_args(args):
+    return WalkOptions(args.follow_symlinks, args.one_filesystem, args.dedupe_inodes, args.archives,
+                       args.reuse_listings, args.walk_workers)
+
+def add_walk_arguments(parser):
+    """Add the link and mount handling flags shared by the commands that scan"""
+    parser.add_argument('--follow-symlinks', action='store_true',
+                        help="Descend into symlinked folders (loops are detected and skipped)")
+    parser.add_argument('--one-filesystem', action='store_true',
+                        help="Don't cross into other filesystems or mounts")
+    parser.add_argument('--dedupe-inodes', action='store_true',
+                        help="Map hardlinked or symlinked copies of a file only once")
+    parser.add_argument('--archives', action='store_true',
+                        help="Map the members of zip and tar archives instead of the archives themselves")
+    parser.add_argument('--reuse-listings', action='store_true',
+                        help="Keep a snapshot of folder listings and only re-read folders that changed")
+    parser.add_argument('--walk-workers', type=int, default=0, metavar='N',
+                        help="List N folders at once, for network or overlay filesystems (default: 0, one at a time)")
+
+def add_redaction_arguments(parser):
+    """Add the flags controlling secret redaction in map contents"""
+    redaction = parser.add_mutually_exclusive_group()
+    redaction.add_argument('--redact', action='store_true',
+                           help="Replace secrets in file contents (default: the saved preference, normally on)")
+    redaction.add_argument('--no-redact', action='store_true', help="Leave secrets in file contents as they are")
+    parser.add_argument('--redaction-rules', metavar='FILE', type=load_redaction_rules,
+                        help='JSON file of {"rules": {name: regex or null}, "entropy_threshold": bits} '
+                             'merged over the default rules')
+
+def load_redaction_rules(path):
+    """Read a --redaction-rules file, checking that its rules compile"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            settings = json.load(f)
+        Redactor.from_dict(settings)
+    except (OSError, ValueError) as e:
+        raise argparse.ArgumentTypeError(f"can't use {path}: {e}")
+    return settings
+
+def redaction_from_args(args):
+    """The redact argument for write_summary: False, True, the rules file's settings, or None for the saved preference"""
+    if args.no_redact:
+        return False
+    if args.redaction_rules:
+        return args.redaction_rules
+    return True if args.redact else None
+
+def add_outline_arguments(parser):
+    """Add the flags for outline maps"""
+    parser.add_argument('--outline', action='store_true',
+                        help="Write signatures, docstrings and line spans instead of full file contents. "
+                             "Files are scanned for their structure, so a cold map of source code takes several "
+                             "times longer than a full one, and shrinks most where bodies are long; files declaring "
+                             "something every few lines are kept in full, as their outline would be as long. "
+                             "Cached runs (client, batch) reuse the outlines")
+    parser.add_argument('--pin', action='append', metavar='GLOB',
+                        help="With --outline, keep files matching this glob (relative, '/'-separated) in full; "
+                             "may be repeated")
+
+def parse_byte_size(value):
+    """Parse a size such as '200000', '200k' or '1.5m' into bytes"""
+    value = value.strip().lower()
+    multiplier = {'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3}.get(value[-1:], 1)
+    if multiplier != 1:
+        value = value[:-1]
+    return int(float(value) * multiplier)
+
+def add_relevance_arguments(parser):
+    """Add the query and budget flags for picking files by relevance"""
+    parser.add_argument('--relevant-to', metavar='QUERY',
+                        help="Map only the files most relevant to this query (BM25 over paths, symbols and content)")
+    parser.add_argument('--budget', type=parse_byte_size,
+                        help="Byte budget for --relevant-to, e.g. 200k")
+    parser.add_argument('--token-budget', type=int,
+                        help=f"Token budget for --relevant-to (about {BYTES_PER_TOKEN} bytes per token)")
+    parser.add_argument('--top', type=int, help="At most this many files for --relevant-to")
+
+def run_map_command(args):
+    """Map a folder without any dialogs"""
+    folder_path = os.path.abspath(args.folder)
+    if not os.path.isdir(folder_path):
+        print(f"Not a folder: {folder_path}", file=sys.stderr)
+        return 1
+    
+    profiler = MapProfiler(use_cprofile=args.profile, use_tracemalloc=args.tracemalloc)
+    profiler.start()
+    
+    extensions = parse_extension_list(args.extensions) if args.extensions else None
+    files = collect_files(folder_path, extensions, profiler, args.backend, walk_options_from_args(args))
+    if args.selection:
+        files = apply_selection_profile(folder_path, files, args.selection)
+        if files is None:
+            print(f"No selection profile named {args.selection!r} for {folder_path}", file=sys.stderr)
+            return 1
+    
+    # Share one cache so ranking and mapping read each file only once
+    cache = ExtractionCache()
+    if args.relevant_to:
+        files = select_relevant(folder_path, files, args.relevant_to, args.budget, args.token_budget, args.top,
+                                cache, profiler)
+        print(f"{len(files)} files relevant to {args.relevant_to!r}:", file=sys.stderr)
+        for file_path in files:
+            print(f"  {to_profile_path(os.path.relpath(file_path, folder_path))}", file=sys.stderr)
+    
+    output_path = create_and_save_summary(folder_path, files, args.format, profiler=profiler, interactive=False,
+                                          cache=cache, redact=redaction_from_args(args), outline=args.outline,
+                                          pinned=args.pin)
+    return 0 if output_path else 1
+
+def run_batch_command(args):
+    """Map many roots in one run and write a combined index"""
+    roots = [{'path': os.path.abspath(path)} for path in args.roots]
+    if args.manifest:
+        roots.extend(load_batch_manifest(args.manifest))
+    if not roots:
+        print("No roots given; pass folders or --manifest", file=sys.stderr)
+        return 1
+    
+    extensions = parse_extension_list(args.extensions) if args.extensions else None
+    output_dir = os.path.abspath(args.output_dir) if args.output_dir else None
+    def report_entry(entry):
+        if entry['error']:
+            print(f"[failed] {entry['path']}: {entry['error']}", file=sys.stderr)
+        else:
+            print(f"[mapped] {entry['path']}: {entry['summary']}")
+    
+    entries = run_batch(roots, args.workers, output_dir, args.format, extensions, backend=args.backend,
+                        walk_options=walk_options_from_args(args), redact=redaction_from_args(args),
+                        outline=args.outline, pinned=args.pin, on_entry=report_entry)
+    
+    index_dir = output_dir or os.getcwd()
+    os.makedirs(index_dir, exist_ok=True)
+    index_path = write_batch_index(entries, index_dir)
+    failed = sum(1 for e in entries if e['error'])
+    print(f"Mapped {len(entries) - failed}/{len(entries)} roots; index written to {index_path}")
+    return 1 if failed else 0
+
+def run_compare_command(args):
+    """Print what changed between two generated maps; like diff, exits 1 when they differ"""
+    try:
+        old_entries = parse_map_file(args.old)
+        new_entries = parse_map_file(args.new)
+    except OSError as e:
+        print(f"Unable to read map: {e}", file=sys.stderr)
+        return 1
+    changes = compare_maps(old_entries, new_entries)
+    
+    if args.json:
+        if not args.no_diff:
+            changes['diff'] = list(iter_map_diff(old_entries, new_entries, changes, args.context))
+        print(json.dumps(changes, indent=4))
+    else:
+        print(f"Comparing {args.old} -> {args.new}")
+        print(f"{len(changes['added'])} added, {len(changes['removed'])} removed, "
+              f"{len(changes['changed'])} changed, {changes['unchanged']} unchanged")
+        for path in changes['added']:
+            print(f"  + {path}")
+        for path in changes['removed']:
+            print(f"  - {path}")
+        for change in changes['changed']:
+            old_lines, new_lines = change['lines']
+            print(f"  ~ {change['file']} ({old_lines} -> {new_lines} lines)")
+            for kind, label in [('functions', 'function'), ('classes', 'class')]:
+                for name in change[kind]['added']:
+                    print(f"      + {label} {name}")
+                for name in change[kind]['removed']:
+                    print(f"      - {label} {name}")
+        if not args.no_diff:
+            for line in iter_map_diff(old_entries, new_entries, changes, args.context):
+                print(line)
+    
+    return 1 if changes['added'] or changes['removed'] or changes['changed'] else 0
+
+def run_client_command(args):
+    """Send one request to the mapper daemon and print the result"""
+    client = MapperClient(args.socket)
+    options = {'backend': args.backend, 'walk_options': walk_options_from_args(args).to_dict(),
+               'redact': redaction_from_args(args)}
+    if args.op in ('map', 'delta', 'search') and not args.root:
+        print(f"'{args.op}' needs a root folder", file=sys.stderr)
+        return 1
+    
+    try:
+        if args.op == 'map':
+            if args.extensions:
+                options['extensions'] = parse_extension_list(args.extensions)
+            if args.selection:
+                options['selection'] = args.selection
+            if args.relevant_to:
+                options.update(query=args.relevant_to, budget=args.budget, token_budget=args.token_budget,
+                               top=args.top)
+            if args.outline:
+                options.update(outline=True, pinned=args.pin)
+            response = client.map(os.path.abspath(args.root), format=args.format, write=not args.stdout, **options)
+        elif args.op == 'delta':
+            response = client.delta(os.path.abspath(args.root), **options)
+        elif args.op == 'search':
+            if not args.query:
+                print("'search' needs a query", file=sys.stderr)
+                return 1
+            response = client.search(os.path.abspath(args.root), args.query, **options)
+        elif args.op == 'status':
+            response = client.status()
+        else:
+            response = client.shutdown()
+    except OSError as e:
+        print(f"Could not reach the mapper daemon at {client.socket_path}: {e}", file=sys.stderr)
+        return 1
+    
+    if not response.get('ok'):
+        print(f"Daemon error: {response.get('error')}", file=sys.stderr)
+        return 1
+    if args.op == 'map' and args.stdout:
+        sys.stdout.write(response['content'])
+        print(response['summary'], file=sys.stderr)
+    elif args.op == 'map':
+        print(f"Summary file created: {response['path']}\n{response['summary']}")
+    elif args.op == 'search':
+        for match in response['matches']:
+            where = f"{match['file']}:{match['line']}" if 'line' in match else match['file']
+            print(f"{where}\t{match['kind']}\t{match.get('name', match.get('text', ''))}")
+    else:
+        response.pop('ok')
+        print(json.dumps(response, indent=4))
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Map a folder's source files into a single summary file. "
+                                                 "Runs the GUI when no command is given.")
+    subparsers = parser.add_subparsers(dest='command')
+    
+    map_parser = subparsers.add_parser('map', help="Map a folder without the GUI")
+    map_parser.add_argument('folder', help="Folder to map")
+    map_parser.add_argument('--extensions', help="Comma-separated extensions to include (default: all)")
+    map_parser.add_argument('--format', choices=['text', 'markdown'], default='text', help="Output format")
+    map_parser.add_argument('--profile', action='store_true', help="Include a cProfile capture in the report")
+    map_parser.add_argument('--tracemalloc', action='store_true', help="Include tracemalloc memory stats in the report")
+    map_parser.add_argument('--backend', choices=SCAN_BACKENDS, default='walk',
+                            help="File enumeration: os.walk or the git index (falls back to os.walk)")
+    map_parser.add_argument('--selection', help="Only map files chosen by this saved or shared selection profile")
+    add_walk_arguments(map_parser)
+    add_relevance_arguments(map_parser)
+    add_redaction_arguments(map_parser)
+    add_outline_arguments(map_parser)
+    
+    batch_parser = subparsers.add_parser('batch', help="Map several folders concurrently")
+    batch_parser.add_argument('roots', nargs='*', help="Folders to map")
+    batch_parser.add_argument('--manifest', help="JSON manifest or text file listing folders to map")
+    batch_parser.add_argument('--workers', type=int, default=4, help="Folders mapped at the same time")
+    batch_parser.add_argument('--extensions', help="Comma-separated extensions to include (default: all)")
+    batch_parser.add_argument('--format', choices=['text', 'markdown'], default='text', help="Output format")
+    batch_parser.add_argument('--output-dir', help="Write maps and the index here instead of into each folder")
+    batch_parser.add_argument('--backend', choices=SCAN_BACKENDS, default='walk',
+                              help="File enumeration: os.walk or the git index (falls back to os.walk)")
+    add_walk_arguments(batch_parser)
+    add_redaction_arguments(batch_parser)
+    add_outline_arguments(batch_parser)
+    
+    compare_parser = subparsers.add_parser('compare', help="Show what changed between two generated maps")
+    compare_parser.add_argument('old', help="Earlier map file")
+    compare_parser.add_argument('new', help="Later map file")
+    compare_parser.add_argument('--no-diff', action='store_true', help="List changed files without content diffs")
+    compare_parser.add_argument('--context', type=int, default=3, help="Context lines around each diff hunk")
+    compare_parser.add_argument('--json', action='store_true', help="Print the comparison as JSON")
+    
+    daemon_parser = subparsers.add_parser('daemon', help="Run a resident mapper that keeps scans and extractions warm")
+    daemon_parser.add_argument('--socket', help="Unix socket path (default: per-user socket in the temp folder)")
+    daemon_parser.add_argument('--idle-timeout', type=float, default=900,
+                               help="Seconds before an unused root is evicted")
+    daemon_parser.add_argument('--exit-after-idle', type=float, default=0,
+                               help="Exit after this many seconds without requests (0 = never)")
+    
+    client_parser = subparsers.add_parser('client', help="Send a request to a running mapper daemon")
+    client_parser.add_argument('op', choices=['map', 'delta', 'search', 'status', 'shutdown'])
+    client_parser.add_argument('root', nargs='?', help="Folder to map, diff or search")
+    client_parser.add_argument('query', nargs='?', help="Search text")
+    client_parser.add_argument('--socket', help="Unix socket path (default: per-user socket in the temp folder)")
+    client_parser.add_argument('--extensions', help="Comma-separated extensions to include (default: all)")
+    client_parser.add_argument('--format', choices=['text', 'markdown'], default='text', help="Output format")
+    client_parser.add_argument('--selection', help="Selection profile to apply")
+    client_parser.add_argument('--backend', choices=SCAN_BACKENDS, default='walk',
+                               help="File enumeration: os.walk or the git index (falls back to os.walk)")
+    client_parser.add_argument('--stdout', action='store_true', help="Print the map instead of writing a file")
+    add_walk_arguments(client_parser)
+    add_relevance_arguments(client_parser)
+    add_redaction_arguments(client_parser)
+    add_outline_arguments(client_parser)
+    
+    args = parser.parse_args(argv)
+    if args.command is None:
+        try:
+            run_gui()
+        except Exception as e:
+            logging.critical(f"Unhandled exception: {e}", exc_info=True)
+            messagebox.showerror("Fatal Error", f"An unexpected error occurred: {e}")
+            return 1
+        return 0
+    
+    # Commands run headless, so unexpected errors go to stderr rather than a Tk dialog
     try:
-        main()
+        if args.command == 'daemon':
+            return run_daemon(args.socket, args.idle_timeout, args.exit_after_idle,
+                              on_ready=lambda path: print(f"Mapper daemon listening on {path}", flush=True))
+        if args.command == 'client':
+            return run_client_command(args)
+        if args.command == 'map':
+            return run_map_command(args)
+        if args.command == 'batch':
+            return run_batch_command(args)
+        return run_compare_command(args)
     except Exception as e:
-        logging.critical(f"Unhandled exception: {e}", exc_info=True)
-        messagebox.showerror("Fatal Error", f"An unexpected error occurred: {e}")
\ No newline at end of file
+        logging.critical(f"Unhandled exception in {args.command}: {e}", exc_info=True)
+        print(f"{args.command} failed: {e}", file=sys.stderr)
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,3557 @@
+"""GUI-free core of the folder mapper.
+
+Scanning, extraction, rendering, selection profiles, batch mapping, map
+comparison and the daemon service live here so other programs can map folders
+in-process without Tk; folder-mapper.py adds the GUI and command line on top.
+"""
+import os
+import re
+import io
+import sys
+import json
+import fnmatch
+import functools
+import glob
+import bisect
+import hashlib
+import heapq
+import difflib
+import posixpath
+import datetime
+import logging
+import math
+import cProfile
+import pstats
+import tempfile
+import tracemalloc
+import tarfile
+import zipfile
+from contextlib import contextmanager
+from collections import defaultdict, Counter
+from array import array
+import socket
+import socketserver
+import subprocess
+import stat
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
+
+# The public API, and what folder-mapper.py gets from `from foldermap import *`
+__all__ = [
+    # Scanning
+    'ALWAYS_IGNORE_DIRS', 'ALWAYS_IGNORE_PATTERNS', 'SCAN_BACKENDS', 'PARALLEL_WALK_WORKERS',
+    'should_ignore_path', 'find_git_root', 'resolve_scan_backend', 'git_file_status', 'WalkOptions',
+    'ScanSnapshot', 'ParallelWalker', 'iter_folder_files', 'iter_selected_files', 'iter_folder_extensions',
+    'get_all_extensions', 'collect_files', 'parse_extension_list',
+    # Archives
+    'ARCHIVE_MEMBER_MARKER', 'is_archive_path', 'split_archive_path',
+    # Extraction and rendering
+    'FileRecord', 'count_lines', 'extract_py_details', 'extract_js_details', 'extract_css_details',
+    'extract_html_details', 'extract_other_files', 'extract_archive_details', 'extract_file_details',
+    'build_outline', 'outline_detail', 'outline_worthwhile', 'DEFAULT_REDACTION_RULES', 'REDACTION_MARKER', 'Redactor',
+    'load_redaction_settings', 'resolve_redactor', 'iter_summary_lines', 'create_summary_text', 'ExtractionCache',
+    'SummaryProgress', 'write_summary', 'MapProfiler', 'format_file_size',
+    # Preferences and selection profiles
+    'load_preferences', 'save_preferences', 'SHARED_PROFILES_FILE', 'DEFAULT_PROFILE_NAME', 'to_profile_path',
+    'SelectionProfile', 'load_shared_profiles', 'save_shared_profiles', 'load_folder_preferences',
+    'save_selection_profile', 'get_recent_folders', 'add_to_recent_folders', 'get_file_modified_times',
+    'save_file_modified_times', 'apply_selection_profile',
+    # Relevance
+    'BYTES_PER_TOKEN', 'RelevanceIndex', 'rank_files', 'select_relevant',
+    # Embedding, batch runs and map comparison
+    'FolderMap', 'load_batch_manifest', 'map_root', 'run_batch', 'write_batch_index', 'parse_map_file',
+    'compare_maps', 'iter_map_diff',
+    # Daemon
+    'default_socket_path', 'check_socket_owner', 'MapperService', 'MapperClient', 'LocalMapperClient', 'run_daemon',
+]
+
+# Common development folders and files to always ignore
+ALWAYS_IGNORE_DIRS = {
+    '.git', '__pycache__', 'node_modules', '.pytest_cache', 
+    'venv', 'env', '.env', '.venv', 'virtualenv', '.virtualenv',
+    '.tox', 'dist', 'build', '*.egg-info', '.eggs',
+    '.coverage', 'htmlcov', '.hypothesis', '.mypy_cache',
+    '.ruff_cache', '.sass-cache', 'bower_components',
+    '.next', '.nuxt', '.output', '.vercel', '.netlify'
+}
+
+ALWAYS_IGNORE_PATTERNS = {
+    '*.pyc', '*.pyo', '*.pyd', '__pycache__',
+    '*.so', '*.dylib', '*.dll', '*.class',
+    '.DS_Store', 'Thumbs.db', 'desktop.ini',
+    '*.swp', '*.swo', '*~', '*.bak', '*.tmp',
+    '*.log', '*.pid', '*.seed', '*.pid.lock',
+    'map-*.profile.json', '.folder-mapper-profiles.json'
+}
+
+# Extension-less files that are still worth mapping
+DOCKER_FILES = ['dockerfile', 'docker-compose.yml', 'docker-compose.yaml', 'dockerfile.dev']
+
+# File enumeration backends: os.walk, or the git index (falling back to os.walk outside checkouts)
+SCAN_BACKENDS = ['walk', 'git']
+
+def compile_ignore_patterns(patterns):
+    """Compile glob patterns into one regex matching the same names as fnmatch.fnmatch"""
+    return re.compile('|'.join(fnmatch.translate(os.path.normcase(p)) for p in sorted(patterns)))
+
+# Compiled once and shared by every scan in the process
+IGNORE_PATTERN_RE = compile_ignore_patterns(ALWAYS_IGNORE_PATTERNS)
+
+def should_ignore_path(file_path, base_path):
+    """Check if a path should be ignored based on common development patterns"""
+    rel_path = os.path.relpath(file_path, base_path)
+    return should_ignore_parts(rel_path.split(os.sep))
+
+def should_ignore_parts(path_parts):
+    """Check a relative path, already split into its parts, against the ignore rules"""
+    # Check if any part of the path contains ignored directories
+    for part in path_parts:
+        if part in ALWAYS_IGNORE_DIRS:
+            return True
+        # Check for egg-info pattern
+        if part.endswith('.egg-info'):
+            return True
+    
+    # Check file patterns
+    file_name = path_parts[-1]
+    return IGNORE_PATTERN_RE.match(os.path.normcase(file_name)) is not None
+
+def format_file_size(size_bytes):
+    """Format file size in human-readable format"""
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size_bytes < 1024.0:
+            return f"{size_bytes:.1f} {unit}"
+        size_bytes /= 1024.0
+    return f"{size_bytes:.1f} TB"
+
+class MapProfiler:
+    """Collect per-stage timings and counters for a single map run"""
+    
+    def __init__(self, use_cprofile=False, use_tracemalloc=False):
+        self.stages = {}
+        self.counters = defaultdict(int)
+        self.use_cprofile = use_cprofile
+        self.use_tracemalloc = use_tracemalloc
+        self._profile = None
+        self._started_tracemalloc = False
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+        self.cprofile_stats = None
+        self.memory = None
+    
+    @contextmanager
+    def stage(self, name):
+        """Time a block, accumulating wall and CPU time under the stage name"""
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        try:
+            yield self
+        finally:
+            entry = self.stages.setdefault(name, {'wall': 0.0, 'cpu': 0.0, 'calls': 0})
+            entry['wall'] += time.perf_counter() - start_wall
+            entry['cpu'] += time.process_time() - start_cpu
+            entry['calls'] += 1
+    
+    def count(self, name, amount=1):
+        self.counters[name] += amount
+    
+    def merge(self, other):
+        """Add another profiler's stage timings and counters to this one's"""
+        for name, entry in list(other.stages.items()):
+            totals = self.stages.setdefault(name, {'wall': 0.0, 'cpu': 0.0, 'calls': 0})
+            for key in totals:
+                totals[key] += entry[key]
+        for name, amount in list(other.counters.items()):
+            self.counters[name] += amount
+    
+    def start(self):
+        """Start the optional cProfile/tracemalloc captures"""
+        if self.use_cprofile and self._profile is None:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        if self.use_tracemalloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+    
+    def stop(self, top=25):
+        """Stop the optional captures and keep their results for the report"""
+        if self._profile is not None:
+            self._profile.disable()
+            stream = io.StringIO()
+            pstats.Stats(self._profile, stream=stream).sort_stats('cumulative').print_stats(top)
+            self.cprofile_stats = stream.getvalue()
+            self._profile = None
+        if self._started_tracemalloc:
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            self.memory = {
+                'current_bytes': current,
+                'peak_bytes': peak,
+                'top_allocations': [str(stat) for stat in snapshot.statistics('lineno')[:top]]
+            }
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+    
+    def report(self):
+        """Return a JSON-serialisable report of the run"""
+        report = {
+            'generated': datetime.datetime.now().isoformat(timespec='seconds'),
+            'total_wall': time.perf_counter() - self._start_wall,
+            'total_cpu': time.process_time() - self._start_cpu,
+            'stages': self.stages,
+            'counters': dict(self.counters)
+        }
+        if self.cprofile_stats:
+            report['cprofile'] = self.cprofile_stats
+        if self.memory:
+            report['memory'] = self.memory
+        return report
+    
+    def summary_line(self):
+        """One-line human-readable summary of the run"""
+        counters = self.counters
+        stage_text = ", ".join(f"{name} {entry['wall']:.2f}s" for name, entry in self.stages.items())
+        return (f"{counters['extracted']} files mapped "
+                f"({format_file_size(counters['bytes_read'])} read, "
+                f"{format_file_size(counters['bytes_written'])} written) "
+                f"in {time.perf_counter() - self._start_wall:.2f}s"
+                + (f" [{stage_text}]" if stage_text else ""))
+    
+    def write_report(self, path):
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(self.report(), f, indent=4)
+            logging.info(f"Profile report written to {path}")
+        except Exception as e:
+            logging.error(f"Error writing profile report {path}: {e}")
+
+# Archives whose members can be mapped as virtual entries
+ZIP_EXTENSIONS = ('.zip', '.whl', '.jar', '.egg')
+TAR_EXTENSIONS = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+ARCHIVE_EXTENSIONS = ZIP_EXTENSIONS + TAR_EXTENSIONS
+
+# Separates an archive from a member in virtual paths, e.g. fixtures/data.zip!/pkg/mod.py
+ARCHIVE_MEMBER_MARKER = '!'
+
+# Members are read at most this far, so a huge or malicious member can't exhaust memory
+ARCHIVE_MEMBER_MAX_BYTES = 4 * 1024 * 1024
+
+def is_archive_path(file_path):
+    return file_path.lower().endswith(ARCHIVE_EXTENSIONS)
+
+def archive_member_path(archive_path, member_name):
+    """Virtual path of an archive member"""
+    return archive_path + ARCHIVE_MEMBER_MARKER + os.sep + member_name.replace('/', os.sep)
+
+def split_archive_path(file_path):
+    """Split a path into (archive_path, member_name); member_name is None for ordinary files"""
+    marker = ARCHIVE_MEMBER_MARKER + os.sep
+    index = file_path.find(marker)
+    while index != -1:
+        if is_archive_path(file_path[:index]):
+            return file_path[:index], file_path[index + len(marker):].replace(os.sep, '/')
+        index = file_path.find(marker, index + 1)
+    return file_path, None
+
+def iter_archive_members(archive_path):
+    """Yield (member_name, size) for the regular files in a zip or tar archive, in archive order"""
+    if archive_path.lower().endswith(ZIP_EXTENSIONS):
+        with zipfile.ZipFile(archive_path) as archive:
+            for info in archive.infolist():
+                if not info.is_dir():
+                    yield info.filename, info.file_size
+    else:
+        # Stream mode reads the archive once, front to back, without seeking
+        with tarfile.open(archive_path, 'r|*') as archive:
+            for info in archive:
+                if info.isfile():
+                    yield info.name, info.size
+
+@functools.lru_cache(maxsize=32)
+def _archive_member_sizes(archive_path, size, mtime_ns):
+    # Keyed on the archive's size and mtime so a rewritten archive is listed again
+    return dict(iter_archive_members(archive_path))
+
+def list_archive_members(archive_path, archive_stat=None):
+    """Return {member_name: size} for an archive, reusing the listing while it's unchanged"""
+    archive_stat = archive_stat or os.stat(archive_path)
+    return _archive_member_sizes(archive_path, archive_stat.st_size, archive_stat.st_mtime_ns)
+
+def iter_archive_contents(archive_path, member_names):
+    """Yield (member_name, data, truncated) for the chosen members of an archive.
+    
+    Members are streamed straight from the archive, never extracted to disk, and a
+    tar is read in a single pass however many members are chosen.
+    """
+    wanted = set(member_names)
+    if archive_path.lower().endswith(ZIP_EXTENSIONS):
+        with zipfile.ZipFile(archive_path) as archive:
+            for name in member_names:
+                with archive.open(name) as member:
+                    data = member.read(ARCHIVE_MEMBER_MAX_BYTES + 1)
+                yield name, data[:ARCHIVE_MEMBER_MAX_BYTES], len(data) > ARCHIVE_MEMBER_MAX_BYTES
+        return
+    with tarfile.open(archive_path, 'r|*') as archive:
+        for info in archive:
+            if info.name not in wanted or not info.isfile():
+                continue
+            data = archive.extractfile(info).read(ARCHIVE_MEMBER_MAX_BYTES + 1)
+            yield info.name, data[:ARCHIVE_MEMBER_MAX_BYTES], len(data) > ARCHIVE_MEMBER_MAX_BYTES
+            wanted.discard(info.name)
+            if not wanted:
+                break
+
+class ArchiveMemberStat:
+    """The parts of a stat result the mapper uses, for an archive member.
+    
+    Times come from the archive itself, so rewriting the archive invalidates every
+    cached member.
+    """
+    __slots__ = ('st_mode', 'st_size', 'st_mtime', 'st_mtime_ns')
+    
+    def __init__(self, size, archive_stat):
+        self.st_mode = stat.S_IFREG | 0o444
+        self.st_size = size
+        self.st_mtime = archive_stat.st_mtime
+        self.st_mtime_ns = archive_stat.st_mtime_ns
+
+def stat_path(file_path):
+    """os.stat that also understands archive member paths"""
+    archive_path, member_name = split_archive_path(file_path)
+    if member_name is None:
+        return os.stat(file_path)
+    archive_stat = os.stat(archive_path)
+    try:
+        members = list_archive_members(archive_path, archive_stat)
+    except (zipfile.BadZipFile, tarfile.TarError) as e:
+        raise OSError(f"Unable to read archive {archive_path}: {e}")
+    if member_name not in members:
+        raise FileNotFoundError(f"No member {member_name} in {archive_path}")
+    return ArchiveMemberStat(members[member_name], archive_stat)
+
+def decode_text(data, errors='strict'):
+    """Decode bytes the way text-mode open() would, including newline translation"""
+    return io.TextIOWrapper(io.BytesIO(data), encoding='utf-8', errors=errors).read()
+
+def decode_member(data, truncated, errors='strict'):
+    text = decode_text(data, errors)
+    if truncated:
+        text += f"\n[Truncated at {format_file_size(ARCHIVE_MEMBER_MAX_BYTES)}]"
+    return text
+
+def read_text_file(file_path, errors='strict'):
+    """Read a file, or an archive member, as UTF-8 text"""
+    archive_path, member_name = split_archive_path(file_path)
+    if member_name is None:
+        with open(file_path, 'r', encoding='utf-8', errors=errors) as file:
+            return file.read()
+    for _, data, truncated in iter_archive_contents(archive_path, [member_name]):
+        return decode_member(data, truncated, errors)
+    raise FileNotFoundError(f"No member {member_name} in {archive_path}")
+
+def count_lines(content):
+    """Lines in content as a map file reads back: only \\n, \\r\\n and \\r end a line.
+    
+    str.splitlines also breaks at form feeds and other separators, which would
+    make parse_map_file skip past the end of a section.
+    """
+    if not content:
+        return 0
+    breaks = content.count('\n') + content.count('\r') - content.count('\r\n')
+    return breaks + (content[-1] not in '\r\n')
+
+# Records keep a small code for their type; FileRecord.type turns it back into the name
+FILE_TYPES = ('Python', 'JavaScript', 'CSS', 'HTML', 'Archive', 'Docker', 'Other')
+FILE_TYPE_CODES = {file_type: code for code, file_type in enumerate(FILE_TYPES)}
+
+class FileRecord:
+    """Extracted details of one file.
+    
+    Slotted rather than a dict to keep per-file overhead down on very large trees.
+    The path is kept as its folder, interned so every file in a folder shares one
+    copy, and its name; file joins them back when the full path is needed. The
+    type is a FILE_TYPES code. Each kind of symbol is packed into one
+    newline-separated string rather than a tuple of small strings, which
+    otherwise cost more than the rest of the record; functions, classes and ids
+    unpack them into tuples.
+    """
+    __slots__ = ('folder', 'name', 'type_code', 'content', 'lines', 'packed_functions', 'packed_classes',
+                 'packed_ids', 'redacted', 'outline')
+    
+    def __init__(self, file_path, file_type, content, lines, functions=(), classes=(), ids=()):
+        folder, self.name = os.path.split(file_path)
+        self.folder = sys.intern(folder)
+        self.type_code = FILE_TYPE_CODES[file_type]
+        self.content = content
+        self.lines = lines
+        self.packed_functions = '\n'.join(functions)
+        self.packed_classes = '\n'.join(classes)
+        self.packed_ids = '\n'.join(ids)
+        # (redactor key, redacted content or None when unchanged, redactions), see Redactor.redact_detail
+        self.redacted = None
+        # Outline of the content, built on first use by outline_detail
+        self.outline = None
+    
+    @property
+    def file(self):
+        return os.path.join(self.folder, self.name)
+    
+    @property
+    def type(self):
+        return FILE_TYPES[self.type_code]
+    
+    @property
+    def functions(self):
+        return tuple(self.packed_functions.split('\n')) if self.packed_functions else ()
+    
+    @property
+    def classes(self):
+        return tuple(self.packed_classes.split('\n')) if self.packed_classes else ()
+    
+    @property
+    def ids(self):
+        return tuple(self.packed_ids.split('\n')) if self.packed_ids else ()
+    
+    def without_content(self):
+        """A copy of the record with its content and redacted content dropped, for when only its outline is needed"""
+        record = FileRecord.__new__(FileRecord)
+        for name in FileRecord.__slots__:
+            setattr(record, name, getattr(self, name))
+        record.content = record.redacted = None
+        return record
+    
+    def __repr__(self):
+        return f"FileRecord({self.file!r}, {self.type!r}, lines={self.lines})"
+
+# Compiled once rather than per extracted file
+PY_FUNCTION_RE = re.compile(r'def\s+(\w+)')
+PY_CLASS_RE = re.compile(r'class\s+(\w+)')
+JS_FUNCTION_RE = re.compile(r'function\s+(\w+)\s*\(')
+JS_ARROW_FUNCTION_RE = re.compile(r'const\s+(\w+)\s*=\s*(?:\([^)]*\)|[^=])\s*=>')
+JS_CLASS_RE = re.compile(r'class\s+(\w+)\s*{')
+CSS_CLASS_RE = re.compile(r'\.([\w-]+)\s*{')
+CSS_ID_RE = re.compile(r'#([\w-]+)\s*{')
+
+def extract_py_details(file_path, content=None):
+    try:
+        if content is None:
+            content = read_text_file(file_path)
+        return FileRecord(file_path, 'Python', content, count_lines(content),
+                          functions=PY_FUNCTION_RE.findall(content), classes=PY_CLASS_RE.findall(content))
+    except Exception as e:
+        logging.error(f"Error extracting Python details from {file_path}: {e}")
+        return FileRecord(file_path, 'Python', "Error reading file content.", 0)
+
+def extract_js_details(file_path, content=None):
+    try:
+        if content is None:
+            content = read_text_file(file_path)
+        functions = JS_FUNCTION_RE.findall(content)
+        functions.extend(JS_ARROW_FUNCTION_RE.findall(content))
+        return FileRecord(file_path, 'JavaScript', content, count_lines(content),
+                          functions=functions, classes=JS_CLASS_RE.findall(content))
+    except Exception as e:
+        logging.error(f"Error extracting JavaScript details from {file_path}: {e}")
+        return FileRecord(file_path, 'JavaScript', "Error reading file content.", 0)
+
+def extract_css_details(file_path, content=None):
+    try:
+        if content is None:
+            content = read_text_file(file_path)
+        return FileRecord(file_path, 'CSS', content, count_lines(content),
+                          classes=CSS_CLASS_RE.findall(content), ids=CSS_ID_RE.findall(content))
+    except Exception as e:
+        logging.error(f"Error extracting CSS details from {file_path}: {e}")
+        return FileRecord(file_path, 'CSS', "Error reading file content.", 0)
+
+def extract_html_details(file_path, content=None):
+    try:
+        if content is None:
+            content = read_text_file(file_path)
+        return FileRecord(file_path, 'HTML', content, count_lines(content))
+    except Exception as e:
+        logging.error(f"Error extracting HTML details from {file_path}: {e}")
+        return FileRecord(file_path, 'HTML', "Error reading file content.", 0)
+
+def extract_other_files(file_path, content=None, file_type='Other'):
+    try:
+        if content is None:
+            content = read_text_file(file_path, errors='ignore')
+        lines = count_lines(content)
+    except Exception as e:
+        logging.error(f"Error extracting details from {file_path}: {e}")
+        content = "Unable to read file content."
+        lines = 0
+    return FileRecord(file_path, file_type, content, lines)
+
+def extract_archive_details(file_path):
+    """List an archive's members instead of decoding its compressed bytes"""
+    if split_archive_path(file_path)[1] is not None:
+        content = "Nested archive, contents not listed."
+        members = {}
+    else:
+        try:
+            members = list_archive_members(file_path)
+            content = '\n'.join(f"{name} ({format_file_size(size)})" for name, size in members.items())
+        except Exception as e:
+            logging.error(f"Error listing archive {file_path}: {e}")
+            content = "Unable to read archive contents."
+            members = {}
+    return FileRecord(file_path, 'Archive', content, len(members))
+
+# Lines kept from files an outline has no structure for
+OUTLINE_EXCERPT_LINES = 5
+# Signatures spread over many lines are cut at this length
+OUTLINE_SIGNATURE_MAX = 200
+# Files declaring a function, class or selector more often than this are kept in full by outlines,
+# which would come out about as long as the file and cost more to build than copying it
+OUTLINE_MIN_LINES_PER_SYMBOL = 4
+
+MARKDOWN_EXTENSIONS = ('.md', '.markdown')
+
+# Comments and strings are matched whole so the braces, parentheses and semicolons inside them aren't counted
+JS_TOKEN_RE = re.compile(r'//[^\n]*|/\*.*?\*/|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|`(?:\\.|[^`\\])*`|[{}();]',
+                         re.S)
+CSS_TOKEN_RE = re.compile(r'/\*.*?\*/|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|[{}();]', re.S)
+CSS_COMMENT_RE = re.compile(r'/\*.*?\*/', re.S)
+
+# Top-level JavaScript and TypeScript declarations, at the start of a line
+JS_DECLARATION_RE = re.compile(
+    r'(?:export\s+(?:default\s+)?)?(?:declare\s+)?(?:abstract\s+)?(?:async\s+)?'
+    r'(?:function\b|class\b|interface\b|enum\b|namespace\b|type\s+[\w$]+'
+    r'|(?:const|let|var)\s+[\w$]+\s*(?::[^=\n]+)?=\s*(?:async\s+)?(?:function\b|\([^)\n]*\)[^=\n]*=>|[\w$]+\s*=>))')
+JS_DECLARATION_LINE_RE = re.compile(r'^[ \t]*(?:' + JS_DECLARATION_RE.pattern + ')', re.M)
+# Methods, accessors, constructors and arrow-function fields directly inside a class body
+JS_MEMBER_RE = re.compile(
+    r'(?:(?:public|private|protected|static|readonly|abstract|override|async|get|set)\s+)*\*?([#\w$]+)\s*'
+    r'(?:<[^>\n]*>\s*)?(?:\(|=\s*(?:async\s+)?(?:\([^)\n]*\)|[\w$]+)\s*=>)')
+JS_NOT_MEMBERS = {'if', 'for', 'while', 'switch', 'catch', 'return', 'function', 'with', 'super', 'this'}
+
+# Strings and comments in Python source; an unterminated string runs to the end of its line or the file
+PY_TOKEN_RE = re.compile(r'#[^\n]*'
+                         r'|"""[^"\\]*(?:(?:\\[\s\S]|"(?!""))[^"\\]*)*(?:"""|\Z)'
+                         r"|'''[^'\\]*(?:(?:\\[\s\S]|'(?!''))[^'\\]*)*(?:'''|\Z)"
+                         r'|"[^"\\\n]*(?:\\[\s\S][^"\\\n]*)*"?'
+                         r"|'[^'\\\n]*(?:\\[\s\S][^'\\\n]*)*'?")
+# def and class keywords, found with a literal prefix re can skip ahead to; each is checked to start a statement
+PY_DEF_RE = re.compile(r'def[ \t]+\w')
+PY_CLASS_DEF_RE = re.compile(r'class[ \t]+\w')
+PY_STATEMENT_PREFIX_RE = re.compile(r'[ \t]*(?:async[ \t]+)?')
+PY_HEADER_TOKEN_RE = re.compile(r'[()\[\]{}:#"\']')
+# Characters that rule out reading a header as one line up to its first colon
+PY_HEADER_SPECIAL_RE = re.compile(r'[\n\[\]{}#"\']')
+PY_NEXT_LINE_RE = re.compile(r'\n[ \t]*[^ \t\n]')
+PY_LEADING_SPACE_RE = re.compile(r'(?:[ \t]*(?:#[^\n]*)?\n)*[ \t]*')
+PY_WORD_RE = re.compile(r'\w+')
+# A line starting with one of these words, or after a line ending in one of these characters,
+# may be continuing an expression rather than starting a statement
+PY_CONTINUATION_WORDS = {'for', 'if', 'else', 'and', 'or', 'not', 'in', 'is', 'async', 'lambda'}
+PY_OPEN_LINE_ENDS = set('([{,\\+-*/%=<>|&^~:.@')
+
+# Comment markers stripped from comment lines before they're summarised
+COMMENT_DECORATION_RE = re.compile(r'^(?:/\*+|\*+/?|//+|#+)|\*+/$')
+# A blank line, ending a paragraph of a docstring or comment
+PARAGRAPH_BREAK_RE = re.compile(r'\n[ \t]*\n')
+MARKDOWN_HEADING_RE = re.compile(r'(#{1,6})\s+\S')
+
+def first_paragraph(text):
+    """The first paragraph of a docstring or comment on one line"""
+    return ' '.join(PARAGRAPH_BREAK_RE.split(text.strip(), 1)[0].split())
+
+def comment_summary(comment_lines):
+    """First paragraph of a block of comment lines, stopping at JSDoc tags"""
+    paragraph = []
+    for line in comment_lines:
+        text = COMMENT_DECORATION_RE.sub('', line.strip()).strip()
+        if text.startswith('@') or (not text and paragraph):
+            break
+        if text:
+            paragraph.append(text)
+    return ' '.join(paragraph)
+
+def outline_excerpt(content, keep=OUTLINE_EXCERPT_LINES):
+    """The first lines of a file, noting how many were left out"""
+    lines = content.splitlines()
+    if len(lines) <= keep + 1:
+        return content
+    return '\n'.join(lines[:keep] + [f"... ({len(lines) - keep} more lines)"])
+
+@functools.lru_cache(maxsize=None)
+def _python_dedent_re(indent):
+    """The start of the next line holding anything indented no more than indent"""
+    return re.compile(r'\n[ \t]{0,%d}[^ \t\n]' % indent)
+
+def _python_bracket_depth(text):
+    """Brackets opened less brackets closed in Python source, not counting those in strings and comments"""
+    if '#' in text or '"' in text or "'" in text:
+        text = PY_TOKEN_RE.sub('', text)
+    return (text.count('(') + text.count('[') + text.count('{')
+            - text.count(')') - text.count(']') - text.count('}'))
+
+def _python_strings(content):
+    """(start, end) offsets of the triple-quoted strings in Python source.
+    
+    Quotes are found with str.find, and only the line leading up to each is
+    tokenized, to tell a string opening from quotes inside a comment or a
+    one-line string.
+    """
+    strings = []
+    offset = 0
+    double = content.find('"""')
+    single = content.find("'''")
+    while True:
+        if 0 <= double < offset:
+            double = content.find('"""', offset)
+        if 0 <= single < offset:
+            single = content.find("'''", offset)
+        if double < 0 and single < 0:
+            return strings
+        start = single if double < 0 or 0 <= single < double else double
+        line_start = content.rfind('\n', 0, start) + 1
+        while content[line_start - 2:line_start - 1] == '\\':
+            line_start = content.rfind('\n', 0, line_start - 1) + 1
+        last = None
+        for last in PY_TOKEN_RE.finditer(content, max(line_start, offset), start):
+            pass
+        if last is not None and last.end() == start:
+            enclosing = PY_TOKEN_RE.match(content, last.start()).end()
+            if enclosing > start:
+                offset = enclosing
+                continue
+        offset = PY_TOKEN_RE.match(content, start).end()
+        strings.append((start, offset))
+
+def _python_statement_text(content, start, end):
+    """Source of a (possibly multi-line) statement without its comments, whitespace collapsed"""
+    text = content[start:end]
+    if '#' in text:
+        text = PY_TOKEN_RE.sub(lambda match: '' if match.group().startswith('#') else match.group(), text)
+    text = ' '.join(text.replace('\\\n', ' ').split())
+    if len(text) > OUTLINE_SIGNATURE_MAX:
+        text = text[:OUTLINE_SIGNATURE_MAX].rstrip() + ' ...'
+    return text
+
+def _python_docstring(literal):
+    """First paragraph of a string literal's text, or None if the literal is never closed"""
+    quote = literal[:3] if literal.startswith(('"""', "'''")) else literal[:1]
+    end = len(literal) - len(quote)
+    # A closing quote after an odd number of backslashes is escaped
+    if end < len(quote) or not literal.endswith(quote) or (end - len(literal[:end].rstrip('\\'))) % 2:
+        return None
+    return first_paragraph(literal[len(quote):end])
+
+def outline_python(content):
+    """Decorators, signatures and docstring summaries of a module's classes and functions, with line spans.
+    
+    Rather than parsing the module or tokenizing all of it, def and class
+    keywords are found with literal searches and each block runs to the next
+    line indented no deeper than its header, outside triple-quoted strings and
+    brackets. Only the text around each header is tokenized, so the cost
+    follows the number of declarations more than the size of the file, and
+    files that don't parse still get an outline.
+    """
+    size = len(content)
+    strings = _python_strings(content)
+    string_starts = [start for start, _ in strings]
+    
+    def string_around(offset):
+        """End of the triple-quoted string offset is inside of, or None"""
+        index = bisect.bisect_left(string_starts, offset) - 1
+        if index >= 0 and offset < strings[index][1]:
+            return strings[index][1]
+        return None
+    
+    def line_start(offset):
+        return content.rfind('\n', 0, offset) + 1
+    
+    def header_end(offset):
+        """Offset of the colon ending a def or class header"""
+        colon = content.find(':', offset)
+        header = content[offset:colon]
+        if colon >= 0 and not PY_HEADER_SPECIAL_RE.search(header) and header.count('(') == header.count(')'):
+            return colon
+        depth = 0
+        while True:
+            match = PY_HEADER_TOKEN_RE.search(content, offset)
+            if match is None:
+                return size
+            token = match.group()
+            offset = match.end()
+            if token == ':':
+                if not depth:
+                    return match.start()
+            elif token in '([{':
+                depth += 1
+            elif token in ')]}':
+                depth -= 1
+            else:
+                offset = PY_TOKEN_RE.match(content, match.start()).end()
+    
+    def continues_expression(newline, code):
+        """Whether the line starting at code might continue an expression from the line before"""
+        # A line starting with @ is taken for a decorator unless the line before leaves an expression open
+        if content[code] != '@':
+            word = PY_WORD_RE.match(content, code)
+            if word is None or word.group() in PY_CONTINUATION_WORDS:
+                return True
+        previous = content[line_start(newline):newline].rstrip()
+        return previous[-1:] in PY_OPEN_LINE_ENDS or '#' in previous
+    
+    def block_end(colon, indent):
+        """Offset of the first line after the block whose header ends at colon"""
+        pattern = _python_dedent_re(indent)
+        offset = checked = colon
+        depth = 0
+        while True:
+            match = pattern.search(content, offset)
+            if match is None:
+                return size + 1
+            newline = match.start()
+            code = offset = match.end() - 1
+            inside = string_around(code)
+            if inside is not None:
+                offset = inside
+                continue
+            if content[code] in '#)]}' or content[newline - 1:newline] == '\\':
+                continue
+            # A line indented no deeper than the header can still be inside brackets left open in the
+            # block; counting them means tokenizing the block, so it's only done where the line might be
+            if continues_expression(newline, code):
+                depth += _python_bracket_depth(content[checked:newline])
+                checked = newline
+                if depth > 0:
+                    continue
+            return newline + 1
+    
+    def last_code_line_end(before):
+        """End of the last line before offset holding more than a comment"""
+        end = before - 1
+        while end > 0:
+            start = line_start(end)
+            code = content[start:end].strip()
+            if code and (code[0] != '#' or string_around(start) is not None):
+                return end
+            end = start - 1
+        return 0
+    
+    def docstring_at(start):
+        """Docstring summary of the statement at start if it's a lone string literal, else None"""
+        if content[start:start + 1] not in ('"', "'") and content[start:start + 2].lower() not in ('r"', "r'", 'u"', "u'"):
+            return None
+        token = PY_TOKEN_RE.match(content, start + (content[start] not in '"\''))
+        line_end = content.find('\n', token.end())
+        rest = content[token.end():size if line_end < 0 else line_end].strip()
+        if rest and rest[0] != '#':
+            return None
+        return _python_docstring(token.group())
+    
+    outline = []
+    docstring = docstring_at(PY_LEADING_SPACE_RE.match(content).end())
+    if docstring:
+        outline.append(f'"""{docstring}"""')
+    elif docstring is None:
+        comments = []
+        for line in content.split('\n'):
+            if not line.startswith('#'):
+                break
+            if not line.startswith(('#!', '# -*-')):
+                comments.append(line)
+        summary = comment_summary(comments)
+        if summary:
+            outline.append(f"# {summary}")
+    
+    keywords = sorted([match.start() for match in PY_DEF_RE.finditer(content)]
+                      + [match.start() for match in PY_CLASS_DEF_RE.finditer(content)])
+    # Enclosing classes and functions as (is class, end offset)
+    blocks = []
+    line = counted = 0
+    for keyword in keywords:
+        start = line_start(keyword)
+        if PY_STATEMENT_PREFIX_RE.match(content, start).end() != keyword or string_around(keyword) is not None:
+            continue
+        while blocks and blocks[-1][1] <= start:
+            blocks.pop()
+        # Methods and nested classes are part of a class's shape; a function's inner helpers aren't
+        if blocks and not blocks[-1][0]:
+            continue
+        line += content.count('\n', counted, start)
+        counted = start
+        indent = len(content[start:keyword]) - len(content[start:keyword].lstrip())
+        colon = header_end(keyword)
+        end = block_end(colon, indent)
+        last = line + content.count('\n', start, last_code_line_end(end))
+        
+        # Decorators are the lines above starting with @, taking in any lines their brackets span
+        decorators = []
+        opening = previous = pending = start
+        depth = 0
+        while previous > 0:
+            text_start = line_start(previous - 1)
+            text = content[text_start:previous - 1]
+            previous = text_start
+            code = text.strip()
+            if (not code or code[0] == '#' or string_around(text_start) is not None
+                    or content[text_start - 2:text_start - 1] == '\\'):
+                continue
+            segment = content[text_start:pending]
+            pending = text_start
+            if code[0] != '@' and not depth and not (')' in segment or ']' in segment or '}' in segment):
+                break
+            depth += _python_bracket_depth(segment)
+            if depth < 0:
+                continue
+            if depth > 0 or code[0] != '@':
+                break
+            decorators.append(_python_statement_text(content, text_start + len(text) - len(text.lstrip()),
+                                                     opening - 1))
+            opening = text_start
+        
+        prefix = '    ' * len(blocks)
+        outline.extend(f"{prefix}{decorator}" for decorator in reversed(decorators))
+        first = line - content.count('\n', opening, start)
+        outline.append(f"{prefix}{_python_statement_text(content, start + indent, colon)}:"
+                       f"  # lines {first + 1}-{last + 1}")
+        # The docstring is the block's first statement, on the header's line or the next one holding code
+        line_end = content.find('\n', colon)
+        if line_end < 0:
+            line_end = size
+        rest = content[colon + 1:line_end].strip()
+        body = None
+        if rest and rest[0] != '#':
+            body = content.index(rest[0], colon + 1)
+        else:
+            match = PY_NEXT_LINE_RE.search(content, line_end)
+            while match is not None and content[match.end() - 1] == '#':
+                match = PY_NEXT_LINE_RE.search(content, match.end())
+            if match is not None and match.end() - match.start() - 2 > indent:
+                body = match.end() - 1
+        if body is not None:
+            docstring = docstring_at(body)
+            if docstring:
+                outline.append(f'{prefix}    """{docstring}"""')
+        blocks.append((content.startswith('class', keyword), end))
+    return '\n'.join(outline)
+
+class BraceScan:
+    """Brace blocks and statement ends of a C-like file, for finding where declarations end.
+    
+    blocks holds [open offset, close offset, depth, inside parentheses] in the
+    order the blocks open; stops holds (offset, depth) for semicolons outside
+    parentheses. depth_at gives the brace depth at any offset. Braces inside comments and strings are skipped; regex literals aren't
+    recognised, so a brace in one can shift the depths after it.
+    """
+    
+    def __init__(self, content, token_re):
+        self.content = content
+        self.line_starts = [0] + [match.end() for match in re.finditer('\n', content)]
+        self.blocks = []
+        self.stops = []
+        # The offset just past the last brace or semicolon, where a CSS rule's selector starts
+        self.preludes = []
+        # Offsets of the braces and the depth just after each, for depth_at
+        self._brace_offsets = []
+        self._brace_depths = []
+        open_blocks = []
+        depth = parens = prelude = 0
+        for match in token_re.finditer(content):
+            token = match.group()
+            if len(token) > 1:
+                continue
+            pos = match.start()
+            if token == '(':
+                parens += 1
+            elif token == ')':
+                parens = max(parens - 1, 0)
+            elif token == '{':
+                block = [pos, len(content), depth, parens > 0]
+                self.blocks.append(block)
+                self.preludes.append(prelude)
+                open_blocks.append(block)
+                depth += 1
+                self._brace_offsets.append(pos)
+                self._brace_depths.append(depth)
+                prelude = pos + 1
+            elif token == '}':
+                if open_blocks:
+                    open_blocks.pop()[1] = pos
+                    depth -= 1
+                    self._brace_offsets.append(pos)
+                    self._brace_depths.append(depth)
+                prelude = pos + 1
+            else:
+                if not parens:
+                    self.stops.append((pos, depth))
+                prelude = pos + 1
+        self._block_offsets = [block[0] for block in self.blocks]
+        self._stop_offsets = [stop[0] for stop in self.stops]
+    
+    def depth_at(self, offset):
+        """Brace depth just before offset"""
+        index = bisect.bisect_left(self._brace_offsets, offset)
+        return self._brace_depths[index - 1] if index else 0
+    
+    def line_of(self, offset):
+        """1-based line number of an offset"""
+        return bisect.bisect_right(self.line_starts, offset)
+    
+    def declaration_end(self, offset, depth):
+        """(body open offset or None, end offset) of the declaration starting at offset.
+        
+        The declaration runs to the close of the first block opened at its own
+        depth outside parentheses, unless a semicolon at that depth ends it first.
+        """
+        body = None
+        for index in range(bisect.bisect_left(self._block_offsets, offset), len(self.blocks)):
+            block_open, block_close, block_depth, in_parens = self.blocks[index]
+            if block_depth < depth:
+                break
+            if block_depth == depth and not in_parens:
+                body = (block_open, block_close)
+                break
+        limit = body[0] if body is not None else len(self.content)
+        for index in range(bisect.bisect_left(self._stop_offsets, offset), len(self.stops)):
+            stop, stop_depth = self.stops[index]
+            if stop > limit or stop_depth < depth:
+                break
+            if stop_depth == depth:
+                return None, stop
+        return body if body is not None else (None, offset)
+
+def _js_comment_above(lines, index):
+    """The // or /* */ comment lines ending just above lines[index]"""
+    end = index - 1
+    if end < 0:
+        return []
+    last = lines[end].strip()
+    start = end
+    if last.endswith('*/'):
+        while start > 0 and '/*' not in lines[start] and end - start < 50:
+            start -= 1
+        if '/*' not in lines[start]:
+            return []
+    elif last.startswith('//'):
+        while start > 0 and lines[start - 1].strip().startswith('//'):
+            start -= 1
+    else:
+        return []
+    return lines[start:end + 1]
+
+def _js_signature(scan, start, body_open, end):
+    """Declaration text up to its body (or its end), whitespace collapsed and trimmed to a readable length"""
+    signature = ' '.join(scan.content[start:body_open if body_open is not None else end].split()).rstrip(';')
+    if len(signature) > OUTLINE_SIGNATURE_MAX:
+        signature = signature[:OUTLINE_SIGNATURE_MAX].rstrip() + ' ...'
+    return signature
+
+def outline_js(content):
+    """Top-level declarations and class members of JavaScript or TypeScript, with JSDoc summaries and line spans"""
+    scan = BraceScan(content, JS_TOKEN_RE)
+    lines = content.split('\n')
+    outline = []
+    
+    def add(index, indent, depth):
+        start = scan.line_starts[index] + len(lines[index]) - len(lines[index].lstrip())
+        body_open, end = scan.declaration_end(start, depth)
+        summary = comment_summary(_js_comment_above(lines, index))
+        if summary:
+            outline.append(f"{indent}/** {summary} */")
+        outline.append(f"{indent}{_js_signature(scan, start, body_open, end)}  "
+                       f"// lines {index + 1}-{scan.line_of(end)}")
+        return body_open, end
+    
+    declared = [scan.line_of(match.start()) - 1 for match in JS_DECLARATION_LINE_RE.finditer(content)
+                if scan.depth_at(match.start()) == 0]
+    # A comment at the top that doesn't belong to the first declaration describes the file
+    first = next((index for index, line in enumerate(lines) if line.strip()), None)
+    if first is not None and lines[first].lstrip().startswith(('/*', '//')):
+        end = first
+        if lines[first].lstrip().startswith('/*'):
+            while end + 1 < len(lines) and '*/' not in lines[end]:
+                end += 1
+        else:
+            while end + 1 < len(lines) and lines[end + 1].lstrip().startswith('//'):
+                end += 1
+        if end + 1 not in declared:
+            summary = comment_summary(lines[first:end + 1])
+            if summary:
+                outline.append(f"/** {summary} */")
+    
+    for index in declared:
+        body_open, end = add(index, '', 0)
+        if body_open is None or not re.search(r'\bclass\b', lines[index]):
+            continue
+        for member in range(scan.line_of(body_open), scan.line_of(end) - 1):
+            member_match = JS_MEMBER_RE.match(lines[member].lstrip())
+            if (member_match is not None and member_match.group(1) not in JS_NOT_MEMBERS
+                    and scan.depth_at(scan.line_starts[member]) == 1):
+                add(member, '  ', 1)
+    return '\n'.join(outline)
+
+def outline_css(content):
+    """Selectors of top-level rules, and of rules inside @media and similar blocks, with line spans"""
+    scan = BraceScan(content, CSS_TOKEN_RE)
+    outline = []
+    in_at_rule = False
+    for index, (block_open, block_close, depth, _) in enumerate(scan.blocks):
+        if depth > 1 or depth == 1 and not in_at_rule:
+            continue
+        selector = ' '.join(CSS_COMMENT_RE.sub('', content[scan.preludes[index]:block_open]).split())
+        if depth == 0:
+            # Blocks open in order, so the rules nested in an @ rule follow it until the next top-level rule
+            in_at_rule = selector.startswith('@')
+        span = f"lines {scan.line_of(block_open)}-{scan.line_of(block_close)}"
+        outline.append(f"{'  ' * depth}{selector}  /* {span} */")
+    return '\n'.join(outline)
+
+def outline_markdown(content):
+    """Headings outside code fences, each with the span of its section"""
+    lines = content.split('\n')
+    headings = []
+    in_fence = False
+    for index, line in enumerate(lines):
+        if line.lstrip().startswith(('```', '~~~')):
+            in_fence = not in_fence
+        elif not in_fence:
+            match = MARKDOWN_HEADING_RE.match(line)
+            if match:
+                headings.append((index, len(match.group(1)), line.strip()))
+    outline = []
+    for position, (index, level, text) in enumerate(headings):
+        end = next((later - 1 for later, later_level, _ in headings[position + 1:] if later_level <= level),
+                   len(lines) - 1)
+        outline.append(f"{text}  (lines {index + 1}-{end + 1})")
+    return '\n'.join(outline)
+
+def build_outline(detail):
+    """A file's structure and documentation without its bodies, falling back to its first lines"""
+    if detail.lines == 0 or detail.type in ['Archive', 'Docker']:
+        return detail.content
+    outline = ''
+    try:
+        if detail.type == 'Python':
+            outline = outline_python(detail.content)
+        elif detail.type == 'JavaScript':
+            outline = outline_js(detail.content)
+        elif detail.type == 'CSS':
+            outline = outline_css(detail.content)
+        elif os.path.splitext(detail.name)[1].lower() in MARKDOWN_EXTENSIONS:
+            outline = outline_markdown(detail.content)
+    except Exception as e:
+        logging.error(f"Error outlining {detail.file}: {e}")
+    return outline or outline_excerpt(detail.content)
+
+def outline_detail(detail):
+    """A FileRecord's outline, built once and kept on the record"""
+    if detail.outline is None:
+        detail.outline = build_outline(detail)
+    return detail.outline
+
+def outline_worthwhile(detail):
+    """Whether an outline of a FileRecord would be much shorter than its content"""
+    symbols = sum(packed.count('\n') + 1 for packed in [detail.packed_functions, detail.packed_classes, detail.packed_ids]
+                  if packed)
+    return detail.lines >= OUTLINE_MIN_LINES_PER_SYMBOL * symbols
+
+def pinned_matcher(pinned):
+    """A SelectionProfile matching the files an outline keeps in full, from their globs"""
+    return SelectionProfile(list(pinned or []))
+
+# Words that mark the value assigned to a key as a secret, matched anywhere in the key name
+SECRET_KEY_WORDS = ['secret', 'passw(?:or)?d', 'passphrase', 'api[_-]?key', 'access[_-]?key', 'private[_-]?key',
+                    'auth[_-]?token', 'access[_-]?token', 'refresh[_-]?token', 'credentials?']
+
+# Every secret key word contains one of these
+SECRET_KEY_HINTS = (b'secret', b'pass', b'key', b'token', b'credential')
+
+def secret_key_pattern(value_pattern):
+    """Match a key containing a secret word, then value_pattern.
+    
+    Each word becomes a branch starting with its first letter in both cases and
+    the rest case-insensitive, so re can skip to the characters a match can
+    start with.
+    """
+    by_letter = defaultdict(list)
+    for word in SECRET_KEY_WORDS:
+        by_letter[word[0]].append(word[1:])
+    return '|'.join(f"{letter}(?i:{'|'.join(rests)})[\\w.-]*{value_pattern}"
+                    for first, rests in by_letter.items() for letter in (first, first.upper()))
+
+# Rule name -> regex. When a rule has groups only the text captured by its group named secret, or else
+# by the first group to take part, is redacted.
+DEFAULT_REDACTION_RULES = {
+    'private_key': r'-----BEGIN[A-Z ]*PRIVATE KEY-----[\s\S]*?-----END[A-Z ]*PRIVATE KEY-----',
+    'aws_access_key': r'A(?:KIA|SIA|GPA|IDA|ROA)[0-9A-Z]{16}\b',
+    'github_token': r'gh[pousr]_[A-Za-z0-9]{36,255}|github_pat_[A-Za-z0-9_]{22,255}',
+    'gitlab_token': r'glpat-[A-Za-z0-9_-]{20,}',
+    'slack_token': r'xox[abposr]-[A-Za-z0-9-]{15,}',
+    'slack_webhook': r'https://hooks\.slack\.com/services/[A-Za-z0-9/]{20,}',
+    'stripe_key': r'sk_(?:live|test)_[A-Za-z0-9]{16,}|rk_(?:live|test)_[A-Za-z0-9]{16,}',
+    'google_api_key': r'AIza[0-9A-Za-z_-]{35}',
+    'npm_token': r'npm_[A-Za-z0-9]{36}\b',
+    'sk_api_key': r'sk-(?:ant-|proj-)?[A-Za-z0-9_-]{20,}',
+    'jwt': r'eyJ[A-Za-z0-9_-]{10,}\.eyJ[A-Za-z0-9_-]{10,}\.[A-Za-z0-9_-]{20,}',
+    'url_credentials': r'://[^\s/:@]+:([^\s/@]+)@',
+    # password = "...", "apiKey": "...", API_KEY: '...'
+    'quoted_secret': secret_key_pattern(r"""["']?[ \t]*[:=][ \t]*["']([^"'\s]{6,})["']"""),
+    # DB_PASSWORD=... in env and ini files, password: ... in YAML, running to the end of the line
+    'secret_setting': secret_key_pattern(r"""(?:=|:[ \t]+)([^\s"'#,;()\[\]{}<>]{6,})(?=[ \t]*(?:#[^\n]*)?(?:\n|\Z))"""),
+    # Candidates only, kept unless Redactor.entropy_check passes
+    'high_entropy': r""""([A-Za-z0-9+/_-]{32,}=*)"|'([A-Za-z0-9+/_-]{32,}=*)'|=([A-Za-z0-9+/_-]{32,}=*)""",
+}
+
+REDACTION_MARKER = '[REDACTED:{}]'
+
+# Token, base64 and hex characters; the slack, webhook and jwt rules ask for enough of them
+# that every default token rule matches a run of at least REDACTION_RUN_LENGTH
+REDACTION_RUN_LENGTH = 20
+TOKEN_RUN_TABLE = bytes(97 if chr(byte).isascii() and (chr(byte).isalnum() or chr(byte) in '+/_-') else 32
+                        for byte in range(256))
+
+# The only characters besides ASCII letters that re's IGNORECASE matches to ASCII letters
+IGNORECASE_ASCII = {'\u0130': 'i', '\u0131': 'i', '\u017f': 's', '\u212a': 'k'}
+
+def redaction_bytes(text):
+    """text with one byte per character, for the redaction gates to search.
+    
+    Characters past latin-1 become '?', except those a case-insensitive rule
+    would take for an ASCII letter.
+    """
+    data = text.encode('latin-1', 'replace')
+    if text.isascii():
+        return data
+    data = bytearray(data)
+    for char, letter in IGNORECASE_ASCII.items():
+        index = text.find(char)
+        while index != -1:
+            data[index] = ord(letter)
+            index = text.find(char, index + 1)
+    return bytes(data)
+
+def line_span(text, index):
+    """(start, end) of the line of text holding index, end including its newline"""
+    return text.rfind('\n', 0, index) + 1, text.find('\n', index) + 1 or len(text)
+
+def merge_spans(spans):
+    """Sorted (start, end) spans with overlapping ones joined"""
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def token_run_lines(text, data):
+    """Spans of the lines holding REDACTION_RUN_LENGTH token characters in a row"""
+    runs = data.translate(TOKEN_RUN_TABLE)
+    needle = b'a' * REDACTION_RUN_LENGTH
+    spans = []
+    index = runs.find(needle)
+    while index != -1:
+        span = line_span(text, index)
+        spans.append(span)
+        index = runs.find(needle, span[1])
+    return merge_spans(spans)
+
+def key_word_lines(text, data):
+    """Spans of the lines holding one of SECRET_KEY_HINTS in any case"""
+    lowered = data.lower()
+    spans = []
+    for hint in SECRET_KEY_HINTS:
+        index = lowered.find(hint)
+        while index != -1:
+            span = line_span(text, index)
+            spans.append(span)
+            index = lowered.find(hint, span[1])
+    return merge_spans(spans)
+
+def url_credential_lines(text, data):
+    """Spans of the lines holding both @ and ://"""
+    spans = []
+    index = data.find(b'://') if b'@' in data else -1
+    while index != -1:
+        start, end = line_span(text, index)
+        if data.find(b'@', start, end) != -1:
+            spans.append((start, end))
+        index = data.find(b'://', end)
+    return spans
+
+# Default rule -> the function finding the only spans of text (and its redaction_bytes) it
+# can match in. They take a few passes over the text that are far cheaper than the rules' own.
+REDACTION_RULE_GATES = {
+    'aws_access_key': token_run_lines,
+    'github_token': token_run_lines,
+    'gitlab_token': token_run_lines,
+    'slack_token': token_run_lines,
+    'slack_webhook': token_run_lines,
+    'stripe_key': token_run_lines,
+    'google_api_key': token_run_lines,
+    'npm_token': token_run_lines,
+    'sk_api_key': token_run_lines,
+    'jwt': token_run_lines,
+    'high_entropy': token_run_lines,
+    'url_credentials': url_credential_lines,
+    'quoted_secret': key_word_lines,
+    'secret_setting': key_word_lines,
+}
+
+# Capitalised or lowercase words; long camelCase and snake_case names are mostly made of these
+WORDLIKE_RE = re.compile(r'[A-Z]?[a-z]{3,}')
+
+# Subresource integrity hashes in lockfiles look random but aren't secrets
+INTEGRITY_PREFIXES = ('sha1-', 'sha256-', 'sha384-', 'sha512-')
+
+def compile_redaction_rule(name, pattern):
+    """Compile one redaction rule, raising ValueError naming the rule if it can't be used"""
+    if not isinstance(pattern, str):
+        raise ValueError(f"redaction rule {name!r} must be a regex string or null, not {type(pattern).__name__}")
+    try:
+        compiled = re.compile(pattern)
+    except re.error as e:
+        raise ValueError(f"redaction rule {name!r} is not a valid regex: {e}") from None
+    if compiled.match(''):
+        raise ValueError(f"redaction rule {name!r} matches empty text")
+    return compiled
+
+class Redactor:
+    """Replace secrets in map contents.
+    
+    rules are merged over DEFAULT_REDACTION_RULES, where None turns a default
+    rule off, and each rule is compiled on its own; a bad one raises ValueError.
+    Default rules left as they are only scan the spans their
+    REDACTION_RULE_GATES entry finds, other rules scan the whole text. Where
+    matches overlap the first to start wins, then the earlier rule.
+    high_entropy matches are only redacted when they mix letters and digits,
+    aren't mostly words, and their Shannon entropy reaches entropy_threshold
+    bits per character. Redacted spans keep their newlines so line counts
+    still hold. count tallies the redactions made.
+    """
+    
+    def __init__(self, rules=None, entropy_threshold=4.3):
+        if not isinstance(rules, (dict, type(None))):
+            raise ValueError(f"redaction rules must be an object of name: regex, not {type(rules).__name__}")
+        if isinstance(entropy_threshold, bool) or not isinstance(entropy_threshold, (int, float)):
+            raise ValueError(f"entropy_threshold must be a number, not {entropy_threshold!r}")
+        merged = dict(DEFAULT_REDACTION_RULES)
+        merged.update(rules or {})
+        self.rules = [(name, pattern) for name, pattern in merged.items() if pattern]
+        self.entropy_threshold = entropy_threshold
+        self.count = 0
+        # gate -> [(rule order, name, compiled rule)], gate None for the rules scanning everything
+        self._scans = defaultdict(list)
+        for order, (name, pattern) in enumerate(self.rules):
+            gate = REDACTION_RULE_GATES.get(name) if pattern == DEFAULT_REDACTION_RULES.get(name) else None
+            self._scans[gate].append((order, name, compile_redaction_rule(name, pattern)))
+        # Redactions cached on a FileRecord are reused by any redactor with the same key
+        self.key = (tuple(self.rules), entropy_threshold)
+    
+    @classmethod
+    def from_dict(cls, data):
+        """Build a redactor from {"rules": {...}, "entropy_threshold": ...}, as stored in preferences"""
+        data = data or {}
+        if not isinstance(data, dict):
+            raise ValueError(f"redaction settings must be an object, not {type(data).__name__}")
+        return cls(data.get('rules'), data.get('entropy_threshold', 4.3))
+    
+    def redact(self, text):
+        if not text:
+            return text
+        matches = self._matches(text)
+        if not matches:
+            return text
+        parts = []
+        end = 0
+        for name, match in matches:
+            parts.append(text[end:match.start()])
+            parts.append(self._replace(name, match))
+            end = match.end()
+        parts.append(text[end:])
+        return ''.join(parts)
+    
+    def redact_detail(self, detail):
+        """A FileRecord's content with secrets replaced, worked out once per record and rule set"""
+        cached = detail.redacted
+        if cached is None or (cached[0] is not self.key and cached[0] != self.key):
+            before = self.count
+            text = self.redact(detail.content)
+            # Files without secrets keep sharing the original string
+            cached = detail.redacted = (self.key, None if text is detail.content else text, self.count - before)
+        else:
+            self.count += cached[2]
+        return detail.content if cached[1] is None else cached[1]
+    
+    def _matches(self, text):
+        """(rule name, match) for each secret in text, in order and without overlaps"""
+        found = []
+        data = None
+        for gate, rules in self._scans.items():
+            if gate is None:
+                spans = [(0, len(text))]
+            else:
+                # The gates share one byte copy of the text
+                data = data or redaction_bytes(text)
+                spans = gate(text, data)
+            for start, end in spans:
+                for order, name, pattern in rules:
+                    found.extend((match.start(), order, name, match) for match in pattern.finditer(text, start, end))
+        if not found:
+            return found
+        found.sort(key=lambda item: item[:2])
+        matches = []
+        end = 0
+        for start, _, name, match in found:
+            if start >= end:
+                matches.append((name, match))
+                end = match.end()
+        return matches
+    
+    def _replace(self, name, match):
+        start, end = match.span()
+        # The rule's secret group, else the first of its groups that took part, if any
+        groups = [match.re.groupindex['secret']] if 'secret' in match.re.groupindex else range(1, match.re.groups + 1)
+        for group in groups:
+            if match.start(group) != -1:
+                start, end = match.span(group)
+                break
+        secret = match.string[start:end]
+        if name == 'high_entropy' and not self.entropy_check(secret):
+            # Not random enough, but a token format may still start inside the candidate
+            return match.group()[0] + self.redact(match.group()[1:])
+        self.count += 1
+        original, offset = match.group(), match.start()
+        return (original[:start - offset] + REDACTION_MARKER.format(name) + '\n' * secret.count('\n')
+                + original[end - offset:])
+    
+    def entropy_check(self, candidate):
+        """True when a token looks random enough to be a key rather than a word or identifier"""
+        if candidate.startswith(INTEGRITY_PREFIXES):
+            return False
+        if not (any(c.isdigit() for c in candidate) and any(c.islower() for c in candidate)
+                and any(c.isupper() for c in candidate)):
+            return False
+        length = len(candidate)
+        if sum(len(word) for word in WORDLIKE_RE.findall(candidate)) * 2 >= length:
+            return False
+        entropy = -sum(count / length * math.log2(count / length) for count in Counter(candidate).values())
+        return entropy >= self.entropy_threshold
+
+def load_redaction_settings():
+    """The redaction settings saved under '_redaction' in preferences, checked.
+    
+    Raises ValueError saying what's wrong when the saved rules can't be used, rather
+    than mapping without them.
+    """
+    settings = load_preferences().get('_redaction') or {}
+    try:
+        Redactor.from_dict(settings)
+    except ValueError as e:
+        raise ValueError(f"'_redaction' preferences: {e}") from None
+    return settings
+
+def resolve_redactor(redact):
+    """Return the Redactor for a redact argument.
+    
+    redact is a Redactor, a settings dict for Redactor.from_dict, True for the
+    rules saved under '_redaction' in preferences, False for no redaction, or
+    None to follow the saved '_redaction' "enabled" flag, which defaults to on.
+    """
+    if isinstance(redact, Redactor):
+        return redact
+    if isinstance(redact, dict):
+        return Redactor.from_dict(redact)
+    if redact is False:
+        return None
+    settings = load_redaction_settings()
+    if redact is None and not settings.get('enabled', True):
+        return None
+    return Redactor.from_dict(settings)
+
+def iter_summary_lines(file_details, folder_path, format_type='text', redactor=None, outline=False, pinned=None):
+    """Yield the summary line by line in the specified format, passing contents through redactor if given.
+    
+    With outline set, files show their outline_detail instead of their contents,
+    except those matching the pinned globs and those not outline_worthwhile,
+    which are kept in full.
+    """
+    pins = pinned_matcher(pinned)
+    # Add statistics header
+    total_files = len(file_details)
+    total_lines = 0
+    file_type_counts = defaultdict(int)
+    for detail in file_details:
+        total_lines += detail.lines
+        file_type_counts[detail.type] += 1
+    
+    if format_type == 'markdown':
+        yield "# File Summary Report"
+        yield f"\n**Generated:** {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+        yield f"**Folder:** `{folder_path}`"
+        yield f"\n## Statistics"
+        yield f"- **Total Files:** {total_files}"
+        yield f"- **Total Lines:** {total_lines:,}"
+        if outline:
+            yield f"- **Contents:** outlines{', pinned files in full' if pinned else ''}"
+        yield f"\n### File Types"
+        for ftype, count in sorted(file_type_counts.items()):
+            yield f"- {ftype}: {count} files"
+        yield "\n---\n"
+    else:
+        yield "=" * 60
+        yield "FILE SUMMARY REPORT"
+        yield "=" * 60
+        yield f"Generated: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+        yield f"Folder: {folder_path}"
+        yield f"\nStatistics:"
+        yield f"  Total Files: {total_files}"
+        yield f"  Total Lines: {total_lines:,}"
+        if outline:
+            yield f"  Contents: outlines{', pinned files in full' if pinned else ''}"
+        yield f"\nFile Types:"
+        for ftype, count in sorted(file_type_counts.items()):
+            yield f"  - {ftype}: {count} files"
+        yield "\n" + "=" * 60 + "\n"
+    
+    # Relative folders are worked out once per folder rather than once per file
+    rel_folders = {}
+    
+    # Add file details, one pass per type instead of copying the records into per-type lists
+    for file_type in sorted(file_type_counts):
+        if format_type == 'markdown':
+            yield f"## {file_type} Files\n"
+        else:
+            yield f"=== {file_type} Files ===\n"
+        
+        type_code = FILE_TYPE_CODES[file_type]
+        for detail in file_details:
+            if detail.type_code != type_code:
+                continue
+            rel_folder = rel_folders.get(detail.folder)
+            if rel_folder is None:
+                rel_folder = rel_folders[detail.folder] = os.path.relpath(detail.folder, folder_path)
+            rel_path = detail.name if rel_folder == '.' else os.path.join(rel_folder, detail.name)
+            outlined = (outline and not (pinned and pins.matches_rules(to_profile_path(rel_path)))
+                        and outline_worthwhile(detail))
+            if outlined:
+                body = outline_detail(detail)
+                body = redactor.redact(body) if redactor is not None else body
+            else:
+                body = redactor.redact_detail(detail) if redactor is not None else detail.content
+            # Listed straight from the packed symbol strings, without unpacking them
+            functions = detail.packed_functions.replace('\n', ', ')
+            classes = detail.packed_classes.replace('\n', ', ')
+            
+            if format_type == 'markdown':
+                yield f"### `{rel_path}`"
+                yield f"*Lines: {detail.lines}*\n"
+                
+                if file_type in ['Python', 'JavaScript']:
+                    if functions:
+                        yield f"**Functions:** `{functions}`"
+                    if classes:
+                        yield f"**Classes:** `{classes}`"
+                elif file_type == 'CSS':
+                    if detail.classes:
+                        yield (f"**Classes:** `{', '.join(detail.classes[:10])}`" +
+                               (" ..." if len(detail.classes) > 10 else ""))
+                
+                if outlined:
+                    yield "*Outline*"
+                yield "\n```" + (file_type.lower() if file_type not in ['Other', 'Archive'] else '')
+                yield body
+                yield "```\n"
+            else:
+                yield "---"
+                yield f"File: {rel_path}"
+                yield f"Lines: {detail.lines}"
+                yield "---"
+                
+                if file_type in ['Python', 'JavaScript']:
+                    yield f"Functions: {functions or 'None'}"
+                    yield f"Classes: {classes or 'None'}"
+                elif file_type == 'CSS':
+                    if detail.classes:
+                        yield (f"Classes: {', '.join(detail.classes[:10])}" +
+                               (" ..." if len(detail.classes) > 10 else ""))
+                
+                yield "\nOutline:" if outlined else "\nContents:"
+                yield body
+                yield "\n"
+
+def create_summary_text(file_details, folder_path, format_type='text', redact=None, outline=False, pinned=None):
+    """Create summary in specified format"""
+    return '\n'.join(iter_summary_lines(file_details, folder_path, format_type, resolve_redactor(redact),
+                                         outline, pinned))
+
+def extract_archive_members(archive_path, member_names):
+    """Yield (virtual_path, detail) for chosen archive members, reading the archive once"""
+    for name, data, truncated in iter_archive_contents(archive_path, member_names):
+        try:
+            content = decode_member(data, truncated)
+        except UnicodeDecodeError:
+            content = decode_member(data, truncated, errors='ignore')
+        virtual_path = archive_member_path(archive_path, name)
+        yield virtual_path, extract_file_details(virtual_path, content)
+
+def extract_file_details(file_path, content=None):
+    """Dispatch a file to the matching extractor based on its extension.
+    
+    content, when given, is used instead of reading the file (archive members are
+    read ahead of extraction).
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == '.py':
+        return extract_py_details(file_path, content)
+    elif ext in ['.js', '.jsx', '.ts', '.tsx']:
+        return extract_js_details(file_path, content)
+    elif ext == '.css':
+        return extract_css_details(file_path, content)
+    elif ext in ['.html', '.htm']:
+        return extract_html_details(file_path, content)
+    elif is_archive_path(file_path):
+        return extract_archive_details(file_path)
+    elif os.path.basename(file_path).lower() in DOCKER_FILES:
+        return extract_other_files(file_path, content, 'Docker')
+    return extract_other_files(file_path, content)
+
+class ExtractionCache:
+    """Thread-safe in-memory cache of extracted file details.
+    
+    Entries are keyed by path and invalidated when the file's size or mtime changes,
+    so one cache can be shared by every root mapped in the same process.
+    """
+    
+    def __init__(self):
+        self._entries = {}
+        self._terms = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def extract(self, file_path, file_stat, outline_only=False):
+        """Return (detail, was_cached) for a file, extracting it on a miss"""
+        detail = self.lookup(file_path, file_stat, outline_only)
+        if detail is not None:
+            return detail, True
+        detail = extract_file_details(file_path)
+        self.store(file_path, file_stat, detail)
+        return detail, False
+    
+    def lookup(self, file_path, file_stat, outline_only=False):
+        """Return the cached detail if the file is unchanged, else None (counted as a miss).
+        
+        Outlined maps cache records without their content; those only count unless outline_only is set.
+        """
+        signature = (file_stat.st_size, file_stat.st_mtime_ns)
+        with self._lock:
+            entry = self._entries.get(file_path)
+            if entry is not None and entry[0] == signature and (outline_only or entry[1].content is not None):
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        return None
+    
+    def store(self, file_path, file_stat, detail):
+        with self._lock:
+            self._entries[file_path] = ((file_stat.st_size, file_stat.st_mtime_ns), detail)
+    
+    def replace(self, file_path, detail, replacement):
+        """Swap a cached detail for replacement, unless it has been replaced or invalidated since"""
+        with self._lock:
+            entry = self._entries.get(file_path)
+            if entry is not None and entry[1] is detail:
+                self._entries[file_path] = (entry[0], replacement)
+    
+    def terms(self, file_path, file_stat):
+        """Return a file's (terms, counts) for relevance ranking, cached next to its details"""
+        signature = (file_stat.st_size, file_stat.st_mtime_ns)
+        with self._lock:
+            entry = self._terms.get(file_path)
+            if entry is not None and entry[0] == signature:
+                return entry[1]
+        detail, _ = self.extract(file_path, file_stat)
+        indexed = count_terms(detail)
+        with self._lock:
+            self._terms[file_path] = (signature, indexed)
+        return indexed
+    
+    def discard_under(self, folder_path):
+        """Drop cached entries for every file under a folder"""
+        prefix = os.path.join(folder_path, '')
+        with self._lock:
+            for entries in [self._entries, self._terms]:
+                for file_path in [p for p in entries if p.startswith(prefix)]:
+                    del entries[file_path]
+    
+    def __len__(self):
+        return len(self._entries)
+
+class SummaryProgress:
+    """Progress counters shared between a summary worker thread and the UI.
+    
+    The worker only assigns plain attributes, so the UI can read them from the Tk
+    thread without locking.
+    """
+    
+    def __init__(self, total_files=0, total_bytes=0):
+        self.phase = 'extract'
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.files_done = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.start_time = time.perf_counter()
+        self.cancel_event = threading.Event()
+    
+    def cancel(self):
+        self.cancel_event.set()
+    
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+    
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.start_time
+    
+    @property
+    def throughput(self):
+        """Bytes read and written per second"""
+        elapsed = self.elapsed
+        return (self.bytes_read + self.bytes_written) / elapsed if elapsed > 0 else 0.0
+    
+    @property
+    def fraction(self):
+        """Rough completion estimate: reading and writing each count for half the work"""
+        if not self.total_bytes:
+            return self.files_done / self.total_files if self.total_files else 0.0
+        return min((self.bytes_read + self.bytes_written) / (2 * self.total_bytes), 1.0)
+    
+    @property
+    def eta(self):
+        fraction = self.fraction
+        if fraction <= 0:
+            return None
+        return self.elapsed * (1 - fraction) / fraction
+
+def write_summary(folder_path, selected_files, output_format='text', profiler=None, progress=None,
+                  keep_content=False, cache=None, output_dir=None, redact=None, outline=False, pinned=None):
+    """Extract, render and write a map without any dialogs.
+    
+    The map is written to a temporary file and only moved into place once complete,
+    so a cancelled or failed run leaves nothing behind. Returns (output_file_path,
+    summary_content); the path is None when nothing was written and the content is
+    only kept when keep_content is set. The map goes into folder_path unless
+    output_dir is given. File contents are redacted as resolve_redactor(redact)
+    says, by default unless turned off in preferences. outline and pinned
+    work as in iter_summary_lines; outlines are built as files are extracted
+    and the bodies are dropped right after, cache entries included, so a later
+    outline of the same files is served from the cache without their contents.
+    """
+    logging.info(f"Creating summary for folder: {folder_path}")
+    profiler = profiler or MapProfiler()
+    progress = progress or SummaryProgress(len(selected_files))
+    
+    # Categorize files by extension
+    categorized_files = defaultdict(list)
+    for file in selected_files:
+        ext = os.path.splitext(file)[1].lower()
+        categorized_files[ext].append(file)
+    
+    # Extract details based on file type
+    file_details = []
+    pins = pinned_matcher(pinned)
+    
+    def outline_only(file):
+        """Whether only a file's outline can end up in the map, unless it turns out not outline_worthwhile"""
+        return outline and not (pinned and pins.matches_rules(to_profile_path(os.path.relpath(file, folder_path))))
+    
+    def add_detail(file, detail):
+        if outline_only(file) and detail.content is not None and outline_worthwhile(detail):
+            outline_detail(detail)
+            # Records are shared through the cache, so the body is dropped from a copy rather than in place
+            outlined = detail.without_content()
+            if cache is not None:
+                cache.replace(file, detail, outlined)
+            detail = outlined
+        file_details.append(detail)
+        profiler.count('extracted')
+    
+    with profiler.stage('extract'):
+        # Archive members are read up front, one pass per archive, so a compressed tar
+        # isn't decompressed again for every member
+        member_details = _extract_selected_members(selected_files, cache, profiler, progress, outline_only)
+        for ext, files in categorized_files.items():
+            for file in files:
+                if progress.cancelled:
+                    logging.info("Summary creation cancelled during extraction")
+                    return None, None
+                progress.files_done += 1
+                if file in member_details:
+                    add_detail(file, member_details[file])
+                    continue
+                if split_archive_path(file)[1] is not None:
+                    logging.warning(f"Archive member could not be read: {file}")
+                    continue
+                try:
+                    file_stat = os.stat(file)
+                except OSError:
+                    logging.warning(f"File does not exist: {file}")
+                    continue
+                if stat.S_ISDIR(file_stat.st_mode):
+                    logging.warning(f"Skipping directory: {file}")
+                    continue
+                try:
+                    if cache is not None:
+                        detail, cached = cache.extract(file, file_stat, outline_only(file))
+                        if cached:
+                            profiler.count('cache_hits')
+                    else:
+                        detail = extract_file_details(file)
+                    add_detail(file, detail)
+                    profiler.count('bytes_read', file_stat.st_size)
+                    progress.bytes_read += file_stat.st_size
+                except Exception as e:
+                    logging.error(f"Error processing file {file}: {e}")
+    
+    if not file_details:
+        logging.warning("No valid files found for summary creation.")
+        return None, None
+    
+    # Render and write in chunks so progress and cancellation stay responsive
+    progress.phase = 'write'
+    timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
+    extension = '.md' if output_format == 'markdown' else '.txt'
+    output_dir = output_dir or folder_path
+    output_file_path = os.path.join(output_dir, f'map-{timestamp}{extension}')
+    partial_path = output_file_path + '.partial'
+    content_parts = [] if keep_content else None
+    redactor = resolve_redactor(redact)
+    
+    try:
+        with profiler.stage('render_write'):
+            with open(partial_path, 'wb') as summary_file:
+                chunk = []
+                first = True
+                for line in iter_summary_lines(file_details, folder_path, output_format, redactor, outline, pinned):
+                    chunk.append(line)
+                    if len(chunk) >= 256:
+                        if progress.cancelled:
+                            break
+                        _write_summary_chunk(summary_file, chunk, first, content_parts, profiler, progress)
+                        chunk = []
+                        first = False
+                if chunk and not progress.cancelled:
+                    _write_summary_chunk(summary_file, chunk, first, content_parts, profiler, progress)
+            if progress.cancelled:
+                os.remove(partial_path)
+                logging.info("Summary creation cancelled, partial output removed")
+                return None, None
+            os.replace(partial_path, output_file_path)
+        logging.info(f"Summary file created at {output_file_path}")
+    except Exception:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+    if redactor is not None:
+        profiler.count('secrets_redacted', redactor.count)
+    
+    # Write the machine-readable report alongside the map
+    profiler.stop()
+    profiler.write_report(os.path.join(output_dir, f'map-{timestamp}.profile.json'))
+    logging.info(profiler.summary_line())
+    return output_file_path, ('\n'.join(content_parts) if keep_content else None)
+
+def _extract_selected_members(selected_files, cache, profiler, progress, outline_only=None):
+    """Return {virtual_path: detail} for the selected archive members, reading each archive at most once.
+    
+    outline_only, if given, says for a member path whether a cached record without its content will do.
+    """
+    members_by_archive = defaultdict(list)
+    for file in selected_files:
+        archive_path, member_name = split_archive_path(file)
+        if member_name is not None:
+            members_by_archive[archive_path].append(member_name)
+    
+    details = {}
+    for archive_path, member_names in members_by_archive.items():
+        if progress.cancelled:
+            break
+        try:
+            archive_stat = os.stat(archive_path)
+            sizes = list_archive_members(archive_path, archive_stat)
+            member_stats = {archive_member_path(archive_path, name): ArchiveMemberStat(sizes[name], archive_stat)
+                            for name in member_names if name in sizes}
+            to_read = []
+            for name in member_names:
+                member_path = archive_member_path(archive_path, name)
+                if member_path not in member_stats:
+                    continue
+                detail = None
+                if cache is not None:
+                    detail = cache.lookup(member_path, member_stats[member_path],
+                                          outline_only is not None and outline_only(member_path))
+                if detail is None:
+                    to_read.append(name)
+                else:
+                    details[member_path] = detail
+                    profiler.count('cache_hits')
+            for member_path, detail in extract_archive_members(archive_path, to_read):
+                if cache is not None:
+                    cache.store(member_path, member_stats[member_path], detail)
+                details[member_path] = detail
+                profiler.count('archive_members_read')
+                profiler.count('bytes_read', member_stats[member_path].st_size)
+                progress.bytes_read += member_stats[member_path].st_size
+                if progress.cancelled:
+                    break
+        except (OSError, zipfile.BadZipFile, tarfile.TarError) as e:
+            logging.error(f"Error reading archive {archive_path}: {e}")
+    return details
+
+def _write_summary_chunk(summary_file, lines, first, content_parts, profiler, progress):
+    """Write a batch of summary lines, translating newlines the way text mode would"""
+    body = '\n'.join(lines)
+    if content_parts is not None:
+        content_parts.append(body)
+    text = body if first else '\n' + body
+    if os.linesep != '\n':
+        text = text.replace('\n', os.linesep)
+    data = text.encode('utf-8')
+    summary_file.write(data)
+    profiler.count('bytes_written', len(data))
+    progress.bytes_written += len(data)
+
+def load_preferences():
+    """Load preferences with backwards compatibility for old config files"""
+    # Try new preferences file first
+    new_pref_file = os.path.join(os.path.dirname(__file__), 'enhanced_folder_preferences.json')
+    old_pref_file = os.path.join(os.path.dirname(__file__), 'folder_preferences.json')
+    
+    # Check for new preferences file
+    if os.path.exists(new_pref_file):
+        try:
+            with open(new_pref_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logging.warning(f"Error loading new preferences: {e}")
+    
+    # Fall back to old preferences file for backwards compatibility
+    if os.path.exists(old_pref_file):
+        try:
+            with open(old_pref_file, 'r', encoding='utf-8') as f:
+                old_prefs = json.load(f)
+                
+                # Migrate old preferences to new format if needed
+                if isinstance(old_prefs, dict):
+                    # Save to new file for future use
+                    save_preferences(old_prefs)
+                    logging.info("Migrated old preferences to new format")
+                    return old_prefs
+        except Exception as e:
+            logging.warning(f"Error loading old preferences: {e}")
+    
+    return {}
+
+def save_preferences(all_prefs):
+    pref_file = os.path.join(os.path.dirname(__file__), 'enhanced_folder_preferences.json')
+    try:
+        with open(pref_file, 'w', encoding='utf-8') as f:
+            json.dump(all_prefs, f, indent=4)
+        logging.info("Preferences saved")
+    except Exception as e:
+        logging.error(f"Error saving preferences: {e}")
+
+# Profiles saved here in a mapped folder can be committed and shared between machines
+SHARED_PROFILES_FILE = '.folder-mapper-profiles.json'
+
+DEFAULT_PROFILE_NAME = 'default'
+
+def to_profile_path(rel_path):
+    """Normalise a root-relative path to the '/'-separated form stored in profiles"""
+    return rel_path.replace(os.sep, '/')
+
+class SelectionProfile:
+    """A named file selection stored as glob rules relative to the mapped folder.
+    
+    A file is selected when it matches an include glob and no exclude glob, unless
+    it was toggled by hand, in which case it's listed in `checked` or `unchecked`.
+    Globs use fnmatch syntax on '/'-separated paths; '*' also matches across
+    folders, so 'src/*' covers everything under src.
+    """
+    
+    def __init__(self, include=None, exclude=None, checked=None, unchecked=None):
+        self.include = list(include if include is not None else ['*'])
+        self.exclude = list(exclude or [])
+        self.checked = set(checked or [])
+        self.unchecked = set(unchecked or [])
+        self._include_re = self._compile(self.include)
+        self._exclude_re = self._compile(self.exclude)
+    
+    @staticmethod
+    def _compile(patterns):
+        return re.compile('|'.join(fnmatch.translate(p) for p in patterns)) if patterns else None
+    
+    def matches_rules(self, rel_path):
+        """Whether the include/exclude globs alone select a profile path"""
+        if self._include_re is None or not self._include_re.match(rel_path):
+            return False
+        return self._exclude_re is None or not self._exclude_re.match(rel_path)
+    
+    def is_selected(self, rel_path):
+        if rel_path in self.unchecked:
+            return False
+        if rel_path in self.checked:
+            return True
+        return self.matches_rules(rel_path)
+    
+    @classmethod
+    def from_selection(cls, states, include=None, exclude=None):
+        """Build a profile reproducing `states` ({profile path: checked}) with as few exceptions as possible.
+        
+        Folders whose files were all unchecked become exclude globs, so files added
+        to them later stay unselected, and folders whose files were all checked
+        become include globs, so files added to them later are picked up; anything
+        else that disagrees with the rules is kept as a hand-toggled exception.
+        Files are counted per folder in one pass, so this stays linear in the
+        number of files however many folders there are.
+        """
+        rules = cls(include, exclude)
+        include = list(rules.include)
+        exclude = list(rules.exclude)
+        
+        # Files grouped by their folder, then per folder and its ancestors:
+        # [files under it, checked ones, ones the include globs match, ones the rules select]
+        include_re, exclude_re = rules._include_re, rules._exclude_re
+        folder_files = defaultdict(list)
+        for rel_path, state in states.items():
+            included = include_re is not None and include_re.match(rel_path) is not None
+            matched = included and (exclude_re is None or exclude_re.match(rel_path) is None)
+            folder_files[posixpath.dirname(rel_path)].append((rel_path, state, included, matched))
+        counts = defaultdict(lambda: [0, 0, 0, 0])
+        for folder, files in folder_files.items():
+            sums = [len(files)] + [sum(column) for column in list(zip(*files))[1:]]
+            while folder:
+                entry = counts[folder]
+                for index, amount in enumerate(sums):
+                    entry[index] += amount
+                folder = posixpath.dirname(folder)
+        
+        # Only the topmost fully-checked or fully-unchecked folders that the rules get wrong need a glob
+        globbed = {}
+        for folder in sorted(counts):
+            total, checked, included, matched = counts[folder]
+            if checked == total and included < total:
+                patterns = include
+            elif not checked and matched:
+                patterns = exclude
+            else:
+                continue
+            parent = posixpath.dirname(folder)
+            while parent and parent not in globbed:
+                parent = posixpath.dirname(parent)
+            if parent:
+                continue
+            globbed[folder] = patterns is include
+            patterns.append(glob.escape(folder) + '/*')
+        
+        # A file's rule state only changes under a globbed folder: included unless the excludes say otherwise, or excluded
+        profile = cls(include, exclude)
+        for folder, files in folder_files.items():
+            ancestor = folder
+            while ancestor and ancestor not in globbed:
+                ancestor = posixpath.dirname(ancestor)
+            for rel_path, state, _, matched in files:
+                if ancestor:
+                    matched = globbed[ancestor] and (exclude_re is None or exclude_re.match(rel_path) is None)
+                if state != matched:
+                    (profile.checked if state else profile.unchecked).add(rel_path)
+        return profile
+    
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get('include'), data.get('exclude'), data.get('checked'), data.get('unchecked'))
+    
+    def to_dict(self):
+        return {
+            'include': self.include,
+            'exclude': self.exclude,
+            'checked': sorted(self.checked),
+            'unchecked': sorted(self.unchecked)
+        }
+
+def load_shared_profiles(folder_path):
+    """Load profiles from the shared profiles file in a folder, if there is one"""
+    shared_file = os.path.join(folder_path, SHARED_PROFILES_FILE)
+    if not os.path.exists(shared_file):
+        return {}
+    try:
+        with open(shared_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return {name: SelectionProfile.from_dict(profile) for name, profile in data.get('profiles', {}).items()}
+    except Exception as e:
+        logging.warning(f"Error loading shared profiles from {shared_file}: {e}")
+        return {}
+
+def save_shared_profiles(folder_path, profiles):
+    """Write profiles to the folder's shared profiles file and return its path"""
+    shared_file = os.path.join(folder_path, SHARED_PROFILES_FILE)
+    with open(shared_file, 'w', encoding='utf-8') as f:
+        json.dump({'profiles': {name: p.to_dict() for name, p in sorted(profiles.items())}}, f, indent=4)
+    logging.info(f"Shared profiles written to {shared_file}")
+    return shared_file
+
+def load_folder_preferences(folder_path):
+    """Load saved extensions and selection profiles for a folder with backwards compatibility.
+    
+    Returns (saved_extensions, profiles, active_profile_name). Profiles saved locally
+    take precedence over ones from the folder's shared profiles file. Older
+    preferences that stored absolute file paths are converted to a profile without
+    touching the filesystem: the listed files are checked and nothing else is, so
+    files added since stay unselected until the selection is next saved, when
+    from_selection turns folders whose files are all checked into include globs.
+    """
+    prefs = load_preferences()
+    folder_prefs = prefs.get(folder_path, {})
+    
+    # Ensure folder_prefs is a dict
+    if not isinstance(folder_prefs, dict):
+        logging.warning(f"Invalid preferences for folder {folder_path}, resetting")
+        folder_prefs = {}
+    
+    saved_extensions = folder_prefs.get('extensions', [])
+    
+    profiles = load_shared_profiles(folder_path)
+    for name, data in folder_prefs.get('profiles', {}).items():
+        profiles[name] = SelectionProfile.from_dict(data)
+    
+    # Migrate the old absolute file list: exactly those files stay selected
+    saved_files = folder_prefs.get('files', [])
+    if saved_files and DEFAULT_PROFILE_NAME not in profiles:
+        checked = [to_profile_path(os.path.relpath(f, folder_path)) for f in saved_files]
+        profiles[DEFAULT_PROFILE_NAME] = SelectionProfile(include=[], checked=checked)
+        logging.info(f"Converted {len(saved_files)} saved files for {folder_path} to a selection profile")
+    
+    active_profile = folder_prefs.get('active_profile', DEFAULT_PROFILE_NAME)
+    if active_profile not in profiles:
+        profiles[active_profile] = SelectionProfile()
+    
+    return saved_extensions, profiles, active_profile
+
+def save_selection_profile(folder_path, name, profile, extensions):
+    """Save a folder's extensions and a named selection profile, making it the active one"""
+    prefs = load_preferences()
+    folder_prefs = prefs.setdefault(folder_path, {})
+    folder_prefs['extensions'] = extensions
+    folder_prefs.setdefault('profiles', {})[name] = profile.to_dict()
+    folder_prefs['active_profile'] = name
+    folder_prefs.pop('files', None)
+    save_preferences(prefs)
+
+def get_recent_folders(max_folders=10):
+    """Get list of recently used folders"""
+    prefs = load_preferences()
+    recent = prefs.get('_recent_folders', [])
+    return recent[:max_folders]
+
+def add_to_recent_folders(folder_path):
+    """Add folder to recent folders list"""
+    prefs = load_preferences()
+    recent = prefs.get('_recent_folders', [])
+    
+    # Remove if already exists
+    if folder_path in recent:
+        recent.remove(folder_path)
+    
+    # Add to front
+    recent.insert(0, folder_path)
+    
+    # Keep only last 10
+    recent = recent[:10]
+    
+    prefs['_recent_folders'] = recent
+    save_preferences(prefs)
+
+def get_file_modified_times(folder_path):
+    """Get modification times for tracking new/changed files"""
+    prefs = load_preferences()
+    folder_prefs = prefs.get(folder_path, {})
+    return folder_prefs.get('file_times', {})
+
+def save_file_modified_times(folder_path, selected_files):
+    """Save modification times for selected files"""
+    prefs = load_preferences()
+    if folder_path not in prefs:
+        prefs[folder_path] = {}
+    
+    file_times = {}
+    for file in selected_files:
+        try:
+            file_times[file] = stat_path(file).st_mtime
+        except OSError:
+            continue
+    
+    prefs[folder_path]['file_times'] = file_times
+    save_preferences(prefs)
+
+def find_git_root(folder_path):
+    """Return the top-level folder of the git checkout containing folder_path, or None"""
+    try:
+        result = subprocess.run(['git', '-C', folder_path, 'rev-parse', '--show-toplevel'],
+                                capture_output=True, text=True)
+    except OSError:
+        return None
+    if result.returncode != 0:
+        return None
+    return os.path.normpath(result.stdout.strip())
+
+def resolve_scan_backend(folder_path, backend):
+    """Resolve a requested backend to the one that will actually be used"""
+    if backend == 'git':
+        if find_git_root(folder_path):
+            return 'git'
+        logging.info(f"{folder_path} is not in a git checkout, falling back to the filesystem walk")
+    return 'walk'
+
+def _walk_order_key(rel_path):
+    """Sort key putting '/'-separated relative paths in the order the filesystem walk yields them"""
+    *folders, name = rel_path.split('/')
+    return folders, name
+
+def iter_git_files(folder_path, profiler=None, cancel_event=None):
+    """Yield (full_path, filename, ext) for tracked and untracked-but-not-ignored files from the git index"""
+    profiler = profiler or MapProfiler()
+    result = subprocess.run(['git', '-C', folder_path, 'ls-files', '-z', '--cached', '--others', '--exclude-standard'],
+                            capture_output=True, check=True)
+    # Unmerged files are listed once per stage, so dedupe before sorting. git lists paths in
+    # plain byte order; sorting on (folder parts, name) matches the walk, which yields each
+    # folder's files before descending into its subfolders, so maps from either backend diff cleanly
+    rel_paths = sorted({os.fsdecode(p) for p in result.stdout.split(b'\0') if p}, key=_walk_order_key)
+    for rel_path in rel_paths:
+        if cancel_event is not None and cancel_event.is_set():
+            return
+        profiler.count('files_walked')
+        full_path = os.path.join(folder_path, os.path.normpath(rel_path))
+        if should_ignore_path(full_path, folder_path):
+            profiler.count('files_ignored')
+            continue
+        filename = os.path.basename(full_path)
+        yield full_path, filename, os.path.splitext(filename)[1].lower()
+
+def git_file_status(folder_path):
+    """Map absolute paths under folder_path to 'New' or 'Modified' relative to HEAD and the index"""
+    git_root = find_git_root(folder_path)
+    if not git_root:
+        return {}
+    result = subprocess.run(['git', '-C', folder_path, 'status', '--porcelain=v1', '-z', '--untracked-files=all',
+                             '--', '.'], capture_output=True, check=True)
+    
+    # Porcelain paths are relative to the repository root; map them back onto folder_path
+    real_folder = os.path.realpath(folder_path)
+    statuses = {}
+    entries = iter(os.fsdecode(result.stdout).split('\0'))
+    for entry in entries:
+        if len(entry) < 4:
+            continue
+        code, rel_path = entry[:2], entry[3:]
+        if code[0] in 'RC':
+            next(entries, None)  # Renames and copies are followed by the original path
+        if 'D' in code:
+            continue
+        if code == '??' or code[0] in 'ARC':
+            status = "New"
+        else:
+            status = "Modified"
+        full_path = os.path.join(git_root, os.path.normpath(rel_path))
+        statuses[os.path.join(folder_path, os.path.relpath(full_path, real_folder))] = status
+    return statuses
+
+class WalkOptions:
+    """How a scan treats symlinks, mount points and files sharing an inode.
+    
+    follow_symlinks descends into symlinked folders, skipping any folder already
+    visited so link loops terminate. one_filesystem stays on the device the root
+    lives on. dedupe_inodes emits each (device, inode) only once, so hardlinked or
+    symlinked copies of a file are read a single time. expand_archives replaces
+    zip and tar archives with their members, as virtual archive!/member paths.
+    reuse_listings keeps a ScanSnapshot so unchanged folders aren't read again.
+    walk_workers lists that many folders at once through a ParallelWalker, for
+    network and overlay filesystems; 0 walks on the calling thread.
+    """
+    
+    def __init__(self, follow_symlinks=False, one_filesystem=False, dedupe_inodes=False, expand_archives=False,
+                 reuse_listings=False, walk_workers=0):
+        self.follow_symlinks = follow_symlinks
+        self.one_filesystem = one_filesystem
+        self.dedupe_inodes = dedupe_inodes
+        self.expand_archives = expand_archives
+        self.reuse_listings = reuse_listings
+        self.walk_workers = walk_workers
+    
+    @classmethod
+    def from_dict(cls, data):
+        data = data or {}
+        return cls(bool(data.get('follow_symlinks')), bool(data.get('one_filesystem')),
+                   bool(data.get('dedupe_inodes')), bool(data.get('expand_archives')),
+                   bool(data.get('reuse_listings')), int(data.get('walk_workers') or 0))
+    
+    def to_dict(self):
+        return {
+            'follow_symlinks': self.follow_symlinks,
+            'one_filesystem': self.one_filesystem,
+            'dedupe_inodes': self.dedupe_inodes,
+            'expand_archives': self.expand_archives,
+            'reuse_listings': self.reuse_listings,
+            'walk_workers': self.walk_workers
+        }
+
+SNAPSHOT_VERSION = 1
+# A folder changed this recently could change again within the same mtime tick,
+# so its listing is read again next scan instead of being trusted
+SNAPSHOT_RACY_NS = 2 * 1000 ** 3
+
+def snapshot_dir():
+    """Folder holding the saved scan snapshots, inside the user's cache folder"""
+    base = (os.environ.get('XDG_CACHE_HOME') or os.environ.get('LOCALAPPDATA')
+            or os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(base, 'folder-mapper', 'snapshots')
+
+def list_folder(dir_path):
+    """Return (dirs, symlinked dirs, files) for a folder, or None if it can't be read"""
+    dirs, links, files = [], [], []
+    try:
+        with os.scandir(dir_path) as entries:
+            for dir_entry in entries:
+                try:
+                    is_dir = dir_entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    dirs.append(dir_entry.name)
+                    if dir_entry.is_symlink():
+                        links.append(dir_entry.name)
+                else:
+                    files.append(dir_entry.name)
+    except OSError:
+        return None
+    return dirs, links, files
+
+class ScanSnapshot:
+    """Folder listings from earlier scans of a root, reused while a folder is unchanged.
+    
+    Creating, deleting or renaming an entry bumps the mtime of the folder holding
+    it, so a folder whose inode and mtime still match its saved entry is not read
+    again. A change deep in the tree doesn't reach its parents' mtimes, so every
+    folder the walk enters is still stat'ed. Files edited in place don't touch
+    the folder at all; iter_selected_files stats each selected file, which is
+    where those edits are caught, while unselected files are never stat'ed.
+    """
+    
+    _loaded = {}
+    _lock = threading.Lock()
+    
+    def __init__(self, root, path=None):
+        self.root = os.path.abspath(root)
+        digest = hashlib.sha1(self.root.encode('utf-8', 'surrogateescape')).hexdigest()[:16]
+        self.path = path or os.path.join(snapshot_dir(), f'{digest}.json')
+        # Relative folder path -> [inode, mtime_ns, dirs, symlinked dirs, files]
+        self.dirs = {}
+        self.dirty = False
+    
+    @classmethod
+    def for_root(cls, root, path=None, reload=False):
+        """Return the snapshot for root, read from disk once per process unless reload is set"""
+        root = os.path.abspath(root)
+        with cls._lock:
+            snapshot = cls._loaded.get(root)
+            if snapshot is None or reload:
+                snapshot = cls._loaded[root] = cls(root, path)
+                snapshot.load()
+            return snapshot
+    
+    @classmethod
+    def forget(cls, root):
+        """Drop root's snapshot from the per-process cache; the saved file is kept for the next load"""
+        with cls._lock:
+            cls._loaded.pop(os.path.abspath(root), None)
+    
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable scan snapshot {self.path}: {e}")
+            return
+        if data.get('version') == SNAPSHOT_VERSION and data.get('root') == self.root:
+            self.dirs = data.get('dirs', {})
+    
+    def save(self):
+        if not self.dirty:
+            return
+        self.dirty = False
+        data = {'version': SNAPSHOT_VERSION, 'root': self.root, 'dirs': dict(self.dirs)}
+        temp_path = f'{self.path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                # dumps rather than dump, which would use the slower pure-Python encoder
+                f.write(json.dumps(data, separators=(',', ':')))
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logging.warning(f"Could not save scan snapshot {self.path}: {e}")
+    
+    def listing(self, dir_path, rel_dir, profiler):
+        """Return (dirs, symlinked dirs, files) for a folder, or None if it can't be read"""
+        try:
+            # Stat before listing, so a change made in between shows up as a newer mtime next scan
+            dir_stat = os.stat(dir_path)
+        except OSError:
+            return None
+        entry = self.dirs.get(rel_dir)
+        if entry is not None and entry[0] == dir_stat.st_ino and entry[1] == dir_stat.st_mtime_ns:
+            profiler.count('dirs_reused')
+            return entry[2], entry[3], entry[4]
+        
+        listing = list_folder(dir_path)
+        if listing is None:
+            return None
+        dirs, links, files = listing
+        profiler.count('dirs_listed')
+        if time.time_ns() - dir_stat.st_mtime_ns > SNAPSHOT_RACY_NS:
+            self.dirs[rel_dir] = [dir_stat.st_ino, dir_stat.st_mtime_ns, dirs, links, files]
+        else:
+            self.dirs.pop(rel_dir, None)
+        self.dirty = True
+        return dirs, links, files
+    
+    def walk(self, top, followlinks=False, profiler=None, walker=None):
+        """Walk top like os.walk, reading only changed folders, and save the snapshot after.
+        
+        top must be the snapshot's root. With a ParallelWalker the changed folders
+        are read on its threads. Entries for folders the finished walk no longer
+        reached are dropped before saving.
+        """
+        profiler = profiler or MapProfiler()
+        seen = set()
+        
+        def listing(dir_path, rel_dir, profiler):
+            result = self.listing(dir_path, rel_dir, profiler)
+            if result is not None:
+                seen.add(rel_dir)
+            return result
+        
+        try:
+            if walker is not None:
+                yield from walker.walk(top, profiler, listing)
+            else:
+                stack = [(top, '')]
+                while stack:
+                    dir_path, rel_dir = stack.pop()
+                    result = listing(dir_path, rel_dir, profiler)
+                    if result is None:
+                        continue
+                    dirs, links, files = result
+                    dirs = list(dirs)
+                    # The caller prunes dirs in place, as with os.walk
+                    yield dir_path, dirs, list(files)
+                    for name in reversed(dirs):
+                        if followlinks or name not in links:
+                            stack.append((os.path.join(dir_path, name), os.path.join(rel_dir, name)))
+            if len(seen) < len(self.dirs):
+                self.dirs = {rel_dir: entry for rel_dir, entry in self.dirs.items() if rel_dir in seen}
+                self.dirty = True
+        finally:
+            self.save()
+
+# Threads the GUI's parallel listing option walks with
+PARALLEL_WALK_WORKERS = 16
+# Finished listings a parallel walk may hold ahead of its caller, per worker
+PARALLEL_WALK_READ_AHEAD = 64
+
+class ParallelWalker:
+    """Walk a tree like os.walk, listing folders on a pool of threads.
+    
+    On NFS, SMB and overlay filesystems a walk spends most of its time waiting
+    for each folder listing, so up to workers folders are listed at once. The
+    queue hands out folders earliest in walk order first. The caller still gets
+    them in one fixed pre-order with dirs and files sorted, whichever thread
+    finished first. Workers never list ALWAYS_IGNORE_DIRS, symlinked folders
+    unless followlinks, links leading back to a folder on their own path, or
+    other devices with one_filesystem. A dir the caller prunes in place is
+    dropped with whatever of its subtree was already read ahead. At most
+    workers * PARALLEL_WALK_READ_AHEAD listings wait for the caller. One walk
+    at a time per walker.
+    """
+    
+    def __init__(self, workers=PARALLEL_WALK_WORKERS, followlinks=False, one_filesystem=False):
+        self.workers = max(1, workers)
+        self.followlinks = followlinks
+        self.one_filesystem = one_filesystem
+    
+    def walk(self, top, profiler=None, lister=None):
+        """Yield (dir_path, dirs, files) for top and every folder below it.
+        
+        lister(dir_path, rel_dir, profiler) returns (dirs, symlinked dirs, files)
+        or None for an unreadable folder, and defaults to list_folder. It runs on
+        the worker threads, each counting into its own profiler, whose counters
+        are added to profiler once the walk ends.
+        """
+        profiler = profiler or MapProfiler()
+        self._lister = lister or (lambda dir_path, rel_dir, profiler: list_folder(dir_path))
+        self._root_dev = os.stat(top).st_dev if self.one_filesystem else None
+        # Heap of (pre-order key, path, relative path, real paths of the folders on the way there)
+        self._queue = [((), top, '', (os.path.realpath(top),) if self.followlinks else None)]
+        self._results = {}
+        self._dropped = set()
+        self._awaited = ()
+        self._stopped = False
+        lock = threading.Lock()
+        # Workers wait for queued folders, the caller for the listing it needs next
+        self._work_ready = threading.Condition(lock)
+        self._result_ready = threading.Condition(lock)
+        worker_profilers = [MapProfiler() for _ in range(self.workers)]
+        threads = [threading.Thread(target=self._work, args=(worker_profiler,), daemon=True)
+                   for worker_profiler in worker_profilers]
+        for thread in threads:
+            thread.start()
+        try:
+            stack = [((), top)]
+            while stack:
+                key, dir_path = stack.pop()
+                with self._result_ready:
+                    self._awaited = key
+                    if self._queue:
+                        # The awaited folder may be queued behind a full read-ahead
+                        self._work_ready.notify()
+                    while key not in self._results:
+                        self._result_ready.wait()
+                    result = self._results.pop(key)
+                if isinstance(result, Exception):
+                    raise result
+                if result is None:
+                    continue
+                dirs, files, children = result
+                kept = list(dirs)
+                # The caller prunes dirs in place, as with os.walk
+                yield dir_path, kept, list(files)
+                kept = set(kept)
+                pruned = [key + (index,) for index, name in children if name not in kept]
+                if pruned:
+                    with self._result_ready:
+                        self._drop(pruned)
+                for index, name in reversed(children):
+                    if name in kept:
+                        stack.append((key + (index,), os.path.join(dir_path, name)))
+        finally:
+            with self._work_ready:
+                self._stopped = True
+                self._work_ready.notify_all()
+            for thread in threads:
+                thread.join()
+            for worker_profiler in worker_profilers:
+                for name, value in worker_profiler.counters.items():
+                    profiler.count(name, value)
+            self._results = {}
+    
+    def _work(self, profiler):
+        condition = self._work_ready
+        limit = self.workers * PARALLEL_WALK_READ_AHEAD
+        while True:
+            with condition:
+                # The folder the caller waits for is always taken, however far others read ahead
+                while not self._stopped and not (
+                        self._queue and (len(self._results) < limit or self._queue[0][0] == self._awaited
+                                         or self._is_dropped(self._queue[0][0]))):
+                    condition.wait()
+                if self._stopped:
+                    return
+                key, dir_path, rel_dir, real_path = heapq.heappop(self._queue)
+                if self._is_dropped(key):
+                    continue
+            try:
+                result, children = self._list(dir_path, rel_dir, real_path, profiler)
+            except Exception as e:
+                result, children = e, ()
+            with condition:
+                if not self._is_dropped(key):
+                    self._results[key] = result
+                    for child in children:
+                        heapq.heappush(self._queue, (key + (child[0],),) + child[1:])
+                    if key == self._awaited:
+                        self._result_ready.notify()
+                    # This worker goes on to the next folder itself
+                    if len(children) > 1:
+                        condition.notify(len(children) - 1)
+    
+    def _list(self, dir_path, rel_dir, real_path, profiler):
+        """List one folder, returning its result and the (index, path, rel_dir, real_path) to queue"""
+        listing = self._lister(dir_path, rel_dir, profiler)
+        if listing is None:
+            return None, ()
+        dirs, links, files = listing
+        dirs = sorted(dirs)
+        links = set(links)
+        children = []
+        queued = []
+        for index, name in enumerate(dirs):
+            if name in ALWAYS_IGNORE_DIRS or (name in links and not self.followlinks):
+                continue
+            child_path = os.path.join(dir_path, name)
+            child_real = None
+            if self.followlinks:
+                child_real = os.path.realpath(child_path) if name in links else os.path.join(real_path[-1], name)
+                if child_real in real_path:
+                    profiler.count('dirs_link_loops')
+                    continue
+                child_real = real_path + (child_real,)
+            if self.one_filesystem:
+                try:
+                    if os.stat(child_path).st_dev != self._root_dev:
+                        continue
+                except OSError:
+                    continue
+            children.append((index, name))
+            queued.append((index, child_path, os.path.join(rel_dir, name), child_real))
+        return (dirs, sorted(files), children), queued
+    
+    def _is_dropped(self, key):
+        dropped = self._dropped
+        return bool(dropped) and any(key[:n] in dropped for n in range(1, len(key) + 1))
+    
+    def _drop(self, keys):
+        """Forget pruned folders and any of their subtree listed or queued so far"""
+        self._dropped.update(keys)
+        for key in [key for key in self._results if self._is_dropped(key)]:
+            del self._results[key]
+
+def iter_folder_files(folder_path, profiler=None, cancel_event=None, backend='walk', walk_options=None):
+    """Yield (full_path, filename, ext) for every file that isn't ignored, in sorted order.
+    
+    backend is 'walk' for os.walk or 'git' to read the git index, which falls back
+    to the walk outside a checkout. walk_options only affect folders the walk
+    descends into; file-level checks happen in iter_selected_files. With
+    reuse_listings the walk goes through the root's ScanSnapshot, and with
+    walk_workers folders are listed by a ParallelWalker; the files come out in
+    the same order either way.
+    """
+    profiler = profiler or MapProfiler()
+    walk_options = walk_options or WalkOptions()
+    if resolve_scan_backend(folder_path, backend) == 'git':
+        yield from iter_git_files(folder_path, profiler, cancel_event)
+        return
+    
+    # Folder stats are only needed when links are followed or mounts are fenced off
+    check_dirs = walk_options.follow_symlinks or walk_options.one_filesystem
+    if check_dirs:
+        root_stat = os.stat(folder_path)
+        visited_dirs = {(root_stat.st_dev, root_stat.st_ino)}
+    
+    walker = None
+    if walk_options.walk_workers > 0:
+        walker = ParallelWalker(walk_options.walk_workers, walk_options.follow_symlinks, walk_options.one_filesystem)
+    if walk_options.reuse_listings:
+        walk = ScanSnapshot.for_root(folder_path).walk(folder_path, walk_options.follow_symlinks, profiler, walker)
+    elif walker is not None:
+        walk = walker.walk(folder_path, profiler)
+    else:
+        walk = os.walk(folder_path, followlinks=walk_options.follow_symlinks)
+    for root, dirs, filenames in walk:
+        if cancel_event is not None and cancel_event.is_set():
+            return
+        profiler.count('dirs_walked')
+        # Filter out directories we should ignore (modifies dirs in place)
+        kept_dirs = sorted(d for d in dirs if d not in ALWAYS_IGNORE_DIRS)
+        profiler.count('dirs_ignored', len(dirs) - len(kept_dirs))
+        if check_dirs:
+            # Checked in sorted order so the same copy of a linked folder wins every run
+            kept_dirs = [d for d in kept_dirs
+                         if _should_descend(os.path.join(root, d), root_stat.st_dev, visited_dirs,
+                                            walk_options, profiler)]
+        dirs[:] = kept_dirs
+        
+        # The folder's own parts are checked once here, so each file only checks its name
+        rel_parts = os.path.relpath(root, folder_path).split(os.sep) if root != folder_path else []
+        dir_ignored = any(part in ALWAYS_IGNORE_DIRS or part.endswith('.egg-info') for part in rel_parts)
+        profiler.count('files_walked', len(filenames))
+        for filename in sorted(filenames):
+            # Skip files that match ignore patterns
+            if dir_ignored or should_ignore_parts((filename,)):
+                profiler.count('files_ignored')
+                continue
+            yield os.path.join(root, filename), filename, os.path.splitext(filename)[1].lower()
+
+def _should_descend(dir_path, root_dev, visited_dirs, walk_options, profiler):
+    """Decide whether the walk enters a folder, recording it as visited"""
+    try:
+        dir_stat = os.stat(dir_path)
+    except OSError:
+        return False
+    if walk_options.one_filesystem and dir_stat.st_dev != root_dev:
+        profiler.count('dirs_other_filesystem')
+        return False
+    key = (dir_stat.st_dev, dir_stat.st_ino)
+    if key in visited_dirs:
+        profiler.count('dirs_already_visited')
+        return False
+    visited_dirs.add(key)
+    return True
+
+def iter_selected_files(folder_path, selected_extensions, profiler=None, cancel_event=None, backend='walk',
+                        walk_options=None):
+    """Yield (full_path, stat_result) for regular files matching the selected extensions.
+    
+    Passing None for selected_extensions selects every file that isn't ignored.
+    """
+    profiler = profiler or MapProfiler()
+    walk_options = walk_options or WalkOptions()
+    root_dev = os.stat(folder_path).st_dev if walk_options.one_filesystem else None
+    seen_inodes = set()
+    for full_path, filename, ext in iter_folder_files(folder_path, profiler, cancel_event, backend, walk_options):
+        if walk_options.expand_archives and is_archive_path(filename):
+            yield from _iter_archive_entries(full_path, selected_extensions, profiler)
+            continue
+        if selected_extensions is None or ext in selected_extensions or (ext == '' and filename.lower() in DOCKER_FILES):
+            try:
+                file_stat = os.stat(full_path)
+            except OSError:
+                continue
+            if not stat.S_ISREG(file_stat.st_mode):
+                continue
+            if root_dev is not None and file_stat.st_dev != root_dev:
+                profiler.count('files_other_filesystem')
+                continue
+            if walk_options.dedupe_inodes:
+                key = (file_stat.st_dev, file_stat.st_ino)
+                if key in seen_inodes:
+                    profiler.count('files_deduped')
+                    continue
+                seen_inodes.add(key)
+            yield full_path, file_stat
+
+def _iter_archive_entries(archive_path, selected_extensions, profiler):
+    """Yield (virtual_path, stat) for the members of an archive matching the selected extensions"""
+    try:
+        archive_stat = os.stat(archive_path)
+        members = list_archive_members(archive_path, archive_stat)
+    except (OSError, zipfile.BadZipFile, tarfile.TarError) as e:
+        logging.warning(f"Unable to list archive {archive_path}: {e}")
+        return
+    profiler.count('archives_listed')
+    for name, size in members.items():
+        if should_ignore_parts(name.split('/')):
+            profiler.count('archive_members_ignored')
+            continue
+        file_name = posixpath.basename(name)
+        ext = os.path.splitext(file_name)[1].lower()
+        if selected_extensions is None or ext in selected_extensions or (ext == '' and file_name.lower() in DOCKER_FILES):
+            profiler.count('archive_members')
+            yield archive_member_path(archive_path, name), ArchiveMemberStat(size, archive_stat)
+
+def iter_folder_extensions(folder_path, profiler=None, cancel_event=None, backend='walk', walk_options=None):
+    """Yield the extension of every file a scan would offer, looking inside archives when they're expanded"""
+    profiler = profiler or MapProfiler()
+    walk_options = walk_options or WalkOptions()
+    for full_path, filename, ext in iter_folder_files(folder_path, profiler, cancel_event, backend, walk_options):
+        if walk_options.expand_archives and is_archive_path(filename):
+            for member_path, _ in _iter_archive_entries(full_path, None, profiler):
+                yield os.path.splitext(member_path)[1].lower()
+        else:
+            yield ext
+
+def get_all_extensions(folder_path, profiler=None, backend='walk', walk_options=None):
+    profiler = profiler or MapProfiler()
+    with profiler.stage('walk_extensions'):
+        extensions = set(iter_folder_extensions(folder_path, profiler, backend=backend, walk_options=walk_options))
+    return sorted(extensions)
+
+def collect_files(folder_path, selected_extensions, profiler=None, backend='walk', walk_options=None):
+    """Walk the folder and return files matching the selected extensions"""
+    profiler = profiler or MapProfiler()
+    with profiler.stage('walk_files'):
+        return [path for path, _ in iter_selected_files(folder_path, selected_extensions, profiler,
+                                                        backend=backend, walk_options=walk_options)]
+
+def parse_extension_list(value):
+    """Parse a comma-separated extension list such as 'py,.js,ts'"""
+    extensions = []
+    for ext in value.split(','):
+        ext = ext.strip().lower()
+        if ext and not ext.startswith('.'):
+            ext = '.' + ext
+        extensions.append(ext)
+    return extensions
+
+def apply_selection_profile(folder_path, files, profile_name):
+    """Filter files through a saved or shared selection profile; None if the profile doesn't exist"""
+    _, profiles, _ = load_folder_preferences(folder_path)
+    profile = profiles.get(profile_name)
+    if profile is None:
+        return None
+    return [f for f in files if profile.is_selected(to_profile_path(os.path.relpath(f, folder_path)))]
+
+IDENTIFIER_RE = re.compile(r'[A-Za-z0-9_]+')
+WORD_PART_RE = re.compile(r'[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+')
+
+# Matches in paths count more than symbol names, which count more than plain content
+PATH_TERM_WEIGHT = 3
+SYMBOL_TERM_WEIGHT = 2
+
+# Rough size of a model token, for turning a token budget into bytes
+BYTES_PER_TOKEN = 4
+
+def tokenize(text):
+    """Yield lowercase search terms; identifiers also yield their snake_case and camelCase parts"""
+    for identifier in IDENTIFIER_RE.findall(text):
+        yield identifier.lower()
+        parts = WORD_PART_RE.findall(identifier)
+        if len(parts) > 1:
+            for part in parts:
+                yield part.lower()
+
+def count_terms(detail):
+    """Weighted term counts for a file's symbols and content, as (terms, counts).
+    
+    Terms are interned and counts packed into an array so the cached index stays
+    small; path terms are added at ranking time since they depend on the root.
+    """
+    terms = Counter(tokenize(detail.content))
+    for name in detail.functions + detail.classes + detail.ids:
+        for token in tokenize(name):
+            terms[token] += SYMBOL_TERM_WEIGHT
+    return tuple(sys.intern(term) for term in terms), array('I', terms.values())
+
+class RelevanceIndex:
+    """Okapi BM25 over the paths, symbols and contents of a set of files"""
+    
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.paths = []
+        self.lengths = []
+        self.postings = defaultdict(list)
+    
+    def add(self, path, terms, counts):
+        doc = len(self.paths)
+        self.paths.append(path)
+        self.lengths.append(sum(counts))
+        for term, count in zip(terms, counts):
+            self.postings[term].append((doc, count))
+    
+    def search(self, query, limit=None):
+        """Return [(path, score)] best first for files matching any query term"""
+        if not self.paths:
+            return []
+        average_length = (sum(self.lengths) / len(self.paths)) or 1
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (len(self.paths) - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc, count in postings:
+                norm = count + self.k1 * (1 - self.b + self.b * self.lengths[doc] / average_length)
+                scores[doc] += idf * count * (self.k1 + 1) / norm
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], self.paths[item[0]]))
+        return [(self.paths[doc], score) for doc, score in ranked[:limit]]
+
+def rank_files(folder_path, files, query, cache=None, profiler=None):
+    """Rank files by relevance to a query; returns [(path, score, size)] best first.
+    
+    Term counts come from the extraction cache, so ranking a warm root again only
+    reads the files that changed.
+    """
+    cache = cache if cache is not None else ExtractionCache()
+    profiler = profiler or MapProfiler()
+    index = RelevanceIndex()
+    sizes = {}
+    with profiler.stage('rank'):
+        for file_path in files:
+            try:
+                file_stat = stat_path(file_path)
+            except OSError:
+                continue
+            terms, counts = cache.terms(file_path, file_stat)
+            path_terms = Counter(tokenize(to_profile_path(os.path.relpath(file_path, folder_path))))
+            if path_terms:
+                weighted = Counter(dict(zip(terms, counts)))
+                for term, count in path_terms.items():
+                    weighted[term] += count * PATH_TERM_WEIGHT
+                terms, counts = tuple(weighted), array('I', weighted.values())
+            index.add(file_path, terms, counts)
+            sizes[file_path] = file_stat.st_size
+            profiler.count('files_ranked')
+        ranked = index.search(query)
+    return [(path, score, sizes[path]) for path, score in ranked]
+
+def select_relevant(folder_path, files, query, budget_bytes=None, budget_tokens=None, top_k=None, cache=None,
+                    profiler=None):
+    """Pick the files most relevant to a query that fit the budget, best first.
+    
+    Files are taken in rank order, skipping any that would overflow the byte budget
+    (a token budget is converted at BYTES_PER_TOKEN), until top_k are chosen.
+    """
+    if budget_tokens is not None:
+        token_bytes = budget_tokens * BYTES_PER_TOKEN
+        budget_bytes = token_bytes if budget_bytes is None else min(budget_bytes, token_bytes)
+    chosen = []
+    used = 0
+    for path, _, size in rank_files(folder_path, files, query, cache, profiler):
+        if top_k is not None and len(chosen) >= top_k:
+            break
+        if budget_bytes is not None and used + size > budget_bytes:
+            continue
+        chosen.append(path)
+        used += size
+    return chosen
+
+class FolderMap:
+    """Lazy map of a folder for programs that embed the mapper.
+    
+    Nothing is scanned or read until it's asked for: files walks the folder,
+    extensions only walks, and details, symbols and stats extract the selected
+    files once through the cache. render() streams the summary to any writable
+    text stream. Call refresh() to pick up changes on disk. outline=True renders
+    outlines instead of contents, except for files matching the pinned globs.
+    
+        folder = FolderMap('/path/to/repo', extensions='py,js')
+        print(folder.stats['lines'])
+        folder.render(sys.stdout, 'markdown')
+    """
+    
+    def __init__(self, folder_path, extensions=None, selection=None, backend='walk', walk_options=None,
+                 cache=None, profiler=None, redact=None, outline=False, pinned=None):
+        self.folder_path = os.path.abspath(folder_path)
+        if extensions is not None and not isinstance(extensions, str):
+            extensions = ','.join(extensions)
+        self.selected_extensions = parse_extension_list(extensions) if extensions else None
+        self.selection = selection
+        self.backend = backend
+        self.walk_options = walk_options
+        self.cache = cache if cache is not None else ExtractionCache()
+        self.profiler = profiler or MapProfiler()
+        self.redact = redact
+        self.outline = outline
+        self.pinned = pinned
+    
+    @functools.cached_property
+    def _entries(self):
+        """(path, stat) for every selected file"""
+        with self.profiler.stage('walk_files'):
+            entries = list(iter_selected_files(self.folder_path, self.selected_extensions, self.profiler,
+                                               backend=self.backend, walk_options=self.walk_options))
+        if self.selection is None:
+            return entries
+        profile = self.selection
+        if isinstance(profile, str):
+            profile = load_folder_preferences(self.folder_path)[1].get(profile)
+            if profile is None:
+                raise ValueError(f"No selection profile named {self.selection!r}")
+        return [(path, file_stat) for path, file_stat in entries
+                if profile.is_selected(to_profile_path(os.path.relpath(path, self.folder_path)))]
+    
+    @property
+    def files(self):
+        return [path for path, _ in self._entries]
+    
+    @functools.cached_property
+    def extensions(self):
+        """Every extension in the folder, whatever the extension filter"""
+        return get_all_extensions(self.folder_path, self.profiler, self.backend, self.walk_options)
+    
+    @functools.cached_property
+    def details(self):
+        """Extracted details of the selected files, in file order"""
+        with self.profiler.stage('extract'):
+            member_details = _extract_selected_members(self.files, self.cache, self.profiler,
+                                                       SummaryProgress(len(self._entries)))
+            details = []
+            for path, file_stat in self._entries:
+                detail = member_details.get(path)
+                if detail is None:
+                    detail, _ = self.cache.extract(path, file_stat)
+                details.append(detail)
+                self.profiler.count('extracted')
+        return details
+    
+    def detail(self, file_path):
+        """Extract a single file, given relative to the folder or as an absolute path"""
+        file_path = os.path.join(self.folder_path, file_path)
+        detail, _ = self.cache.extract(file_path, stat_path(file_path))
+        return detail
+    
+    @functools.cached_property
+    def symbols(self):
+        """{relative path: {'functions': [...], 'classes': [...], 'ids': [...]}} for files that define any"""
+        symbols = {}
+        for detail in self.details:
+            found = {kind: list(getattr(detail, kind)) for kind in ['functions', 'classes', 'ids']
+                     if getattr(detail, kind)}
+            if found:
+                symbols[to_profile_path(os.path.relpath(detail.file, self.folder_path))] = found
+        return symbols
+    
+    @functools.cached_property
+    def stats(self):
+        types = defaultdict(int)
+        for detail in self.details:
+            types[detail.type] += 1
+        return {
+            'files': len(self.details),
+            'bytes': sum(file_stat.st_size for _, file_stat in self._entries),
+            'lines': sum(detail.lines for detail in self.details),
+            'types': dict(types)
+        }
+    
+    def rank(self, query, limit=None):
+        """[(path, score, size)] for the selected files, most relevant to the query first"""
+        return rank_files(self.folder_path, self.files, query, self.cache, self.profiler)[:limit]
+    
+    def select_relevant(self, query, budget_bytes=None, budget_tokens=None, top_k=None):
+        return select_relevant(self.folder_path, self.files, query, budget_bytes, budget_tokens, top_k,
+                               self.cache, self.profiler)
+    
+    def iter_lines(self, format_type='text'):
+        return iter_summary_lines(self.details, self.folder_path, format_type, resolve_redactor(self.redact),
+                                  self.outline, self.pinned)
+    
+    def render(self, stream, format_type='text'):
+        """Write the summary to a text stream line by line; returns the characters written"""
+        written = 0
+        for index, line in enumerate(self.iter_lines(format_type)):
+            text = line if index == 0 else '\n' + line
+            stream.write(text)
+            written += len(text)
+        return written
+    
+    def write(self, output_format='text', output_dir=None):
+        """Write a map file the way the GUI and CLI do; returns its path, or None if nothing was mapped"""
+        output_path, _ = write_summary(self.folder_path, self.files, output_format, self.profiler,
+                                       cache=self.cache, output_dir=output_dir, redact=self.redact,
+                                       outline=self.outline, pinned=self.pinned)
+        return output_path
+    
+    def refresh(self):
+        """Forget everything computed so far; the cache still skips unchanged files"""
+        for name in ['_entries', 'extensions', 'details', 'symbols', 'stats']:
+            self.__dict__.pop(name, None)
+
+def load_batch_manifest(manifest_path):
+    """Read batch roots from a JSON manifest or a plain list of folders (one per line).
+    
+    JSON manifests are a list (or {"roots": [...]}) of paths or objects with "path"
+    and optional "extensions" and "format" keys. Relative paths are resolved against
+    the manifest's folder. Entries may also set "backend", "selection" and
+    "walk_options" (an object with follow_symlinks, one_filesystem,
+    dedupe_inodes, expand_archives and reuse_listings flags and walk_workers),
+    "redact" (true or false, overriding the saved preference), and "outline": true with
+    optional "pinned" globs for an outline map.
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    
+    if manifest_path.lower().endswith('.json'):
+        data = json.loads(text)
+        entries = data.get('roots', []) if isinstance(data, dict) else data
+    else:
+        entries = [line.strip() for line in text.splitlines()
+                   if line.strip() and not line.strip().startswith('#')]
+    
+    roots = []
+    for entry in entries:
+        spec = {'path': entry} if isinstance(entry, str) else dict(entry)
+        spec['path'] = os.path.abspath(os.path.join(base_dir, os.path.expanduser(spec['path'])))
+        if isinstance(spec.get('extensions'), str):
+            spec['extensions'] = parse_extension_list(spec['extensions'])
+        roots.append(spec)
+    return roots
+
+def map_root(spec, cache, output_dir=None, default_format='text', default_extensions=None, backend='walk',
+             walk_options=None, redact=None, outline=False, pinned=None):
+    """Map one batch root and return its entry for the combined index"""
+    folder_path = spec['path']
+    output_format = spec.get('format', default_format)
+    extensions = spec.get('extensions', default_extensions)
+    entry = {'path': folder_path, 'map': None, 'report': None, 'error': None}
+    redact = spec.get('redact', redact)
+    outline = spec.get('outline', outline)
+    pinned = spec.get('pinned', pinned)
+    
+    if not os.path.isdir(folder_path):
+        entry['error'] = "Not a folder"
+        return entry
+    
+    profiler = MapProfiler()
+    try:
+        if 'walk_options' in spec:
+            walk_options = WalkOptions.from_dict(spec['walk_options'])
+        files = collect_files(folder_path, extensions, profiler, spec.get('backend', backend), walk_options)
+        if spec.get('selection'):
+            files = apply_selection_profile(folder_path, files, spec['selection'])
+            if files is None:
+                entry['error'] = f"No selection profile named {spec['selection']!r}"
+                return entry
+        output_path, _ = write_summary(folder_path, files, output_format, profiler,
+                                       cache=cache, output_dir=output_dir, redact=redact, outline=outline,
+                                       pinned=pinned)
+    except Exception as e:
+        logging.error(f"Error mapping {folder_path}: {e}")
+        entry['error'] = str(e)
+        return entry
+    
+    if output_path is None:
+        entry['error'] = "No files to map"
+    else:
+        entry['map'] = output_path
+        entry['report'] = os.path.splitext(output_path)[0] + '.profile.json'
+    entry['files'] = profiler.counters['extracted']
+    entry['bytes_read'] = profiler.counters['bytes_read']
+    entry['bytes_written'] = profiler.counters['bytes_written']
+    entry['cache_hits'] = profiler.counters['cache_hits']
+    entry['secrets_redacted'] = profiler.counters['secrets_redacted']
+    entry['seconds'] = round(sum(stage['wall'] for stage in profiler.stages.values()), 3)
+    entry['summary'] = profiler.summary_line()
+    return entry
+
+def run_batch(roots, workers=4, output_dir=None, output_format='text', extensions=None, cache=None,
+              backend='walk', walk_options=None, redact=None, outline=False, pinned=None, on_entry=None):
+    """Map several roots concurrently, sharing one extraction cache, and return their index entries.
+    
+    on_entry, if given, is called with each root's entry as soon as it's done,
+    from the calling thread.
+    """
+    cache = cache if cache is not None else ExtractionCache()
+    
+    # Give each root its own folder under output_dir so same-second map names can't collide
+    root_output_dirs = {}
+    if output_dir:
+        used_names = set()
+        for spec in roots:
+            name = os.path.basename(spec['path'].rstrip(os.sep)) or 'root'
+            candidate, suffix = name, 2
+            while candidate in used_names:
+                candidate, suffix = f"{name}-{suffix}", suffix + 1
+            used_names.add(candidate)
+            root_output_dirs[spec['path']] = os.path.join(output_dir, candidate)
+            os.makedirs(root_output_dirs[spec['path']], exist_ok=True)
+    
+    entries = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {
+            executor.submit(map_root, spec, cache, root_output_dirs.get(spec['path']),
+                            output_format, extensions, backend, walk_options, redact, outline, pinned): spec['path']
+            for spec in roots
+        }
+        for future in as_completed(futures):
+            entry = future.result()
+            entries[futures[future]] = entry
+            if entry['error']:
+                logging.warning(f"Batch root {entry['path']} failed: {entry['error']}")
+            if on_entry is not None:
+                on_entry(entry)
+    
+    # Keep the index in the order the roots were given
+    return [entries[spec['path']] for spec in roots]
+
+def write_batch_index(entries, index_dir):
+    """Write the combined JSON index for a batch run and return its path"""
+    timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
+    index_path = os.path.join(index_dir, f'map-index-{timestamp}.json')
+    index = {
+        'generated': datetime.datetime.now().isoformat(timespec='seconds'),
+        'roots': entries,
+        'totals': {
+            'roots': len(entries),
+            'failed': sum(1 for e in entries if e['error']),
+            'files': sum(e.get('files', 0) for e in entries),
+            'bytes_read': sum(e.get('bytes_read', 0) for e in entries),
+            'bytes_written': sum(e.get('bytes_written', 0) for e in entries),
+            'cache_hits': sum(e.get('cache_hits', 0) for e in entries)
+        }
+    }
+    with open(index_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=4)
+    return index_path
+
+MAP_TEXT_TYPE_RE = re.compile(r'^=== (.+) Files ===$')
+MAP_MARKDOWN_TYPE_RE = re.compile(r'^## (.+) Files$')
+MAP_MARKDOWN_FILE_RE = re.compile(r'^### `(.+)`$')
+MAP_MARKDOWN_LINES_RE = re.compile(r'^\*Lines: (\d+)\*$')
+MAP_MARKDOWN_SYMBOLS_RE = re.compile(r'^\*\*(Functions|Classes):\*\* `(.*)`$')
+
+def parse_map_file(map_path):
+    """Index a generated map (text or markdown) by file section.
+    
+    Returns {rel_path: entry}, where each entry holds the file type, line count,
+    listed functions and classes, whether the section is an outline, the
+    section's content and a hash of it. Each full section's recorded line count
+    is skipped before looking for the next section, so maps of maps still parse.
+    """
+    with open(map_path, 'r', encoding='utf-8', errors='replace') as f:
+        lines = f.read().split('\n')
+    if lines and lines[0] == '# File Summary Report':
+        return _parse_map_sections(lines, _match_markdown_section, MAP_MARKDOWN_TYPE_RE)
+    return _parse_map_sections(lines, _match_text_section, MAP_TEXT_TYPE_RE)
+
+def _match_text_section(lines, i):
+    """Return (entry, content_start) when a text map section starts at line i"""
+    if not (lines[i] == '---' and i + 3 < len(lines) and lines[i + 1].startswith('File: ')
+            and lines[i + 2].startswith('Lines: ') and lines[i + 3] == '---'):
+        return None
+    entry = {'file': lines[i + 1][len('File: '):], 'lines': int(lines[i + 2][len('Lines: '):] or 0),
+             'functions': [], 'classes': [], 'outline': False}
+    i += 4
+    while i < len(lines) and lines[i] not in ['Contents:', 'Outline:']:
+        label, _, value = lines[i].partition(': ')
+        if label in ['Functions', 'Classes'] and value != 'None':
+            entry[label.lower()] = value.split(', ')
+        i += 1
+    entry['outline'] = i < len(lines) and lines[i] == 'Outline:'
+    return entry, i + 1
+
+def _match_markdown_section(lines, i):
+    """Return (entry, content_start) when a markdown map section starts at line i"""
+    file_match = MAP_MARKDOWN_FILE_RE.match(lines[i])
+    lines_match = MAP_MARKDOWN_LINES_RE.match(lines[i + 1]) if file_match and i + 1 < len(lines) else None
+    if not lines_match:
+        return None
+    entry = {'file': file_match.group(1), 'lines': int(lines_match.group(1)), 'functions': [], 'classes': [],
+             'outline': False}
+    i += 2
+    while i < len(lines) and not lines[i].startswith('```'):
+        symbols_match = MAP_MARKDOWN_SYMBOLS_RE.match(lines[i])
+        if symbols_match:
+            entry[symbols_match.group(1).lower()] = symbols_match.group(2).split(', ')
+        elif lines[i] == '*Outline*':
+            entry['outline'] = True
+        i += 1
+    return entry, i + 1
+
+def _parse_map_sections(lines, match_section, type_re):
+    entries = {}
+    file_type = None
+    current = None
+    body_start = 0
+    i = 0
+    
+    def finish(end):
+        if current is None:
+            return
+        body = lines[body_start:end]
+        # Drop the blank separator lines (text) or closing fence (markdown) the renderer adds
+        while body and body[-1] == '':
+            body.pop()
+        if match_section is _match_markdown_section and body and body[-1] == '```':
+            body.pop()
+            # The file's own trailing newline leaves a blank line before the fence
+            while body and body[-1] == '':
+                body.pop()
+        current['content'] = '\n'.join(body)
+        current['hash'] = hashlib.sha1(current['content'].encode('utf-8')).hexdigest()
+        entries[current['file']] = current
+    
+    while i < len(lines):
+        type_match = type_re.match(lines[i])
+        section = None if type_match else match_section(lines, i)
+        if type_match or section:
+            finish(i)
+            current = None
+        if type_match:
+            file_type = type_match.group(1)
+            i += 1
+        elif section:
+            current, body_start = section
+            current['type'] = file_type
+            # The recorded line count is all content, whatever it looks like; outlines are shorter
+            i = body_start + (0 if current['outline'] else current['lines'])
+        else:
+            i += 1
+    finish(len(lines))
+    return entries
+
+def compare_maps(old_entries, new_entries):
+    """Report added, removed and changed files between two parsed maps.
+    
+    Sections are compared by hash first, so unchanged files cost nothing however
+    large they are. Changed files list the functions and classes added or removed.
+    """
+    changed = []
+    unchanged = 0
+    for path in sorted(old_entries.keys() & new_entries.keys()):
+        before, after = old_entries[path], new_entries[path]
+        if (before['hash'] == after['hash'] and before['functions'] == after['functions']
+                and before['classes'] == after['classes']):
+            unchanged += 1
+            continue
+        change = {'file': path, 'type': after['type'], 'lines': [before['lines'], after['lines']]}
+        for kind in ['functions', 'classes']:
+            old_names, new_names = set(before[kind]), set(after[kind])
+            change[kind] = {'added': sorted(new_names - old_names), 'removed': sorted(old_names - new_names)}
+        changed.append(change)
+    return {
+        'added': sorted(new_entries.keys() - old_entries.keys()),
+        'removed': sorted(old_entries.keys() - new_entries.keys()),
+        'changed': changed,
+        'unchanged': unchanged
+    }
+
+def iter_map_diff(old_entries, new_entries, changes, context=3):
+    """Yield unified diff lines for the changed files only"""
+    for change in changes['changed']:
+        path = change['file']
+        yield from difflib.unified_diff(old_entries[path]['content'].splitlines(),
+                                        new_entries[path]['content'].splitlines(),
+                                        f'a/{path}', f'b/{path}', n=context, lineterm='')
+
+def default_socket_path():
+    """Per-user socket path for the mapper daemon, in $XDG_RUNTIME_DIR when there is one"""
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir and os.path.isdir(runtime_dir):
+        return os.path.join(runtime_dir, 'folder-mapper.sock')
+    user_id = os.getuid() if hasattr(os, 'getuid') else os.environ.get('USERNAME', 'user')
+    return os.path.join(tempfile.gettempdir(), f'folder-mapper-{user_id}.sock')
+
+def check_socket_owner(socket_path):
+    """Raise PermissionError unless socket_path is a socket owned by the current user.
+    
+    The fallback path sits in the shared temp folder, where another user could
+    create it first and collect whatever the client sends.
+    """
+    path_stat = os.lstat(socket_path)
+    if not stat.S_ISSOCK(path_stat.st_mode):
+        raise PermissionError(f"{socket_path} is not a socket")
+    if hasattr(os, 'getuid') and path_stat.st_uid != os.getuid():
+        raise PermissionError(f"{socket_path} is owned by another user")
+
+class RootIndex:
+    """The daemon's warm scan of one root: file signatures from the last scan.
+    
+    Rescans walk through the root's ScanSnapshot, so folders that haven't
+    changed since the last request aren't listed again; files are still stat'ed.
+    """
+    
+    def __init__(self, folder_path):
+        self.folder_path = folder_path
+        self.files = {}
+        self.scanned_at = None
+        self.last_used = time.monotonic()
+        # Held while the root is scanned or a map of it is written, so requests for
+        # the same root take turns while other roots carry on
+        self.lock = threading.Lock()
+
+class MapperService:
+    """Keeps scan indexes and extracted details warm between requests.
+    
+    Requests and responses are plain dicts (the JSON protocol spoken over the
+    socket). Supported ops are map, delta, search, status and shutdown; roots that
+    haven't been used for idle_timeout seconds are evicted along with their cached
+    extractions and scan snapshots. Requests run concurrently: the service lock
+    only guards the table of roots, and each root's RootIndex.lock serialises its
+    scans. map and search redact secrets as resolve_redactor(request's redact) says;
+    map renders outlines when outline is true, keeping the pinned globs in full.
+    """
+    
+    def __init__(self, idle_timeout=900):
+        self.idle_timeout = idle_timeout
+        self.cache = ExtractionCache()
+        self.roots = {}
+        self.started = time.monotonic()
+        self.last_request = time.monotonic()
+        self.shutdown_requested = False
+        self._lock = threading.Lock()
+    
+    def handle(self, request):
+        """Dispatch one request and return its response"""
+        try:
+            op = request.get('op')
+            handler = getattr(self, f'op_{op}', None) if isinstance(op, str) else None
+            if handler is None:
+                return {'ok': False, 'error': f"Unknown op: {op!r}"}
+            self.last_request = time.monotonic()
+            response = handler(request)
+            response['ok'] = True
+            return response
+        except Exception as e:
+            logging.error(f"Daemon request failed: {e}", exc_info=True)
+            return {'ok': False, 'error': str(e)}
+    
+    def root_index(self, folder_path, create=False):
+        """Return a root's index, or None if it isn't known and create isn't set, marking it used"""
+        with self._lock:
+            index = self.roots.get(folder_path)
+            if index is None and create:
+                index = self.roots[folder_path] = RootIndex(folder_path)
+            if index is not None:
+                index.last_used = time.monotonic()
+            return index
+    
+    def scan(self, request):
+        """Rescan a root and return (index, previous file signatures, None on its first scan)"""
+        folder_path = os.path.abspath(request['root'])
+        if not os.path.isdir(folder_path):
+            raise ValueError(f"Not a folder: {folder_path}")
+        index = self.root_index(folder_path, create=True)
+        walk_options = WalkOptions.from_dict(request.get('walk_options'))
+        walk_options.reuse_listings = True
+        with index.lock:
+            previous = index.files if index.scanned_at is not None else None
+            # Swapped in whole, so requests reading the last scan never see a half-built one
+            index.files = {
+                path: (file_stat.st_size, file_stat.st_mtime_ns)
+                for path, file_stat in iter_selected_files(folder_path, None, backend=request.get('backend', 'walk'),
+                                                           walk_options=walk_options)
+            }
+            index.scanned_at = datetime.datetime.now().isoformat(timespec='seconds')
+        index.last_used = time.monotonic()
+        return index, previous
+    
+    def select_files(self, index, request):
+        """Apply a map request's file list, extensions and selection profile to a scanned root"""
+        if request.get('files'):
+            return [os.path.abspath(f) for f in request['files']]
+        files = sorted(index.files)
+        extensions = request.get('extensions')
+        if extensions:
+            extensions = parse_extension_list(','.join(extensions))
+            files = [f for f in files if os.path.splitext(f)[1].lower() in extensions
+                     or (os.path.splitext(f)[1] == '' and os.path.basename(f).lower() in DOCKER_FILES)]
+        if request.get('selection'):
+            files = apply_selection_profile(index.folder_path, files, request['selection'])
+            if files is None:
+                raise ValueError(f"No selection profile named {request['selection']!r}")
+        if request.get('query'):
+            files = select_relevant(index.folder_path, files, request['query'], request.get('budget'),
+                                    request.get('token_budget'), request.get('top'), self.cache)
+        return files
+    
+    def extract(self, files, profiler):
+        details = []
+        for file_path in files:
+            try:
+                file_stat = stat_path(file_path)
+            except OSError:
+                continue
+            detail, cached = self.cache.extract(file_path, file_stat)
+            details.append(detail)
+            profiler.count('extracted')
+            profiler.count('bytes_read', file_stat.st_size)
+            if cached:
+                profiler.count('cache_hits')
+        return details
+    
+    def op_map(self, request):
+        profiler = MapProfiler()
+        with profiler.stage('walk_files'):
+            index, _ = self.scan(request)
+        files = self.select_files(index, request)
+        output_format = request.get('format', 'text')
+        
+        if request.get('write', True):
+            # Maps are named by the second, so two written at once into the same root would collide
+            with index.lock:
+                output_path, _ = write_summary(index.folder_path, files, output_format, profiler, cache=self.cache,
+                                               redact=request.get('redact'), outline=request.get('outline', False),
+                                               pinned=request.get('pinned'))
+            return {'path': output_path, 'summary': profiler.summary_line(), 'counters': dict(profiler.counters)}
+        
+        with profiler.stage('extract'):
+            details = self.extract(files, profiler)
+        with profiler.stage('render'):
+            content = (create_summary_text(details, index.folder_path, output_format, request.get('redact'),
+                                           request.get('outline', False), request.get('pinned'))
+                       if details else '')
+        return {'content': content, 'summary': profiler.summary_line(), 'counters': dict(profiler.counters)}
+    
+    def op_delta(self, request):
+        """Report files added, removed and modified since the root was last scanned"""
+        index, previous = self.scan(request)
+        initial = previous is None
+        previous = previous or {}
+        current = index.files
+        rel = lambda paths: sorted(to_profile_path(os.path.relpath(p, index.folder_path)) for p in paths)
+        return {
+            'initial': initial,
+            'added': rel(p for p in current if p not in previous),
+            'removed': rel(p for p in previous if p not in current),
+            'modified': rel(p for p in current if p in previous and current[p] != previous[p])
+        }
+    
+    def op_search(self, request):
+        """Find a query in paths, extracted symbols and file contents of a root"""
+        query = request['query'].lower()
+        limit = request.get('limit', 100)
+        redactor = resolve_redactor(request.get('redact'))
+        index = self.root_index(os.path.abspath(request['root']))
+        if index is None or index.scanned_at is None or request.get('rescan'):
+            index, _ = self.scan(request)
+        
+        matches = []
+        for file_path in sorted(index.files):
+            rel_path = to_profile_path(os.path.relpath(file_path, index.folder_path))
+            if query in rel_path.lower():
+                matches.append({'file': rel_path, 'kind': 'path'})
+            try:
+                detail, _ = self.cache.extract(file_path, stat_path(file_path))
+            except OSError:
+                continue
+            for key, kind in [('functions', 'function'), ('classes', 'class'), ('ids', 'id')]:
+                for name in getattr(detail, key):
+                    if query in name.lower():
+                        matches.append({'file': rel_path, 'kind': kind, 'name': name})
+            for line_number, line in enumerate(detail.content.splitlines(), 1):
+                if query in line.lower():
+                    text = redactor.redact(line.strip()) if redactor is not None else line.strip()
+                    matches.append({'file': rel_path, 'kind': 'line', 'line': line_number, 'text': text})
+            if len(matches) >= limit:
+                break
+        return {'matches': matches[:limit], 'truncated': len(matches) > limit}
+    
+    def op_status(self, request):
+        with self._lock:
+            roots = list(self.roots.items())
+        return {
+            'uptime': round(time.monotonic() - self.started, 1),
+            'roots': {path: {'files': len(index.files), 'scanned_at': index.scanned_at,
+                             'idle': round(time.monotonic() - index.last_used, 1)}
+                      for path, index in roots},
+            'cache_entries': len(self.cache),
+            'cache_hits': self.cache.hits,
+            'cache_misses': self.cache.misses
+        }
+    
+    def op_shutdown(self, request):
+        self.shutdown_requested = True
+        return {}
+    
+    def evict_idle(self):
+        """Forget roots that haven't been used within the idle timeout; returns the evicted roots"""
+        cutoff = time.monotonic() - self.idle_timeout
+        with self._lock:
+            # A root still being scanned or written stays, however long that has taken
+            evicted = [path for path, index in self.roots.items()
+                       if index.last_used < cutoff and not index.lock.locked()]
+            for path in evicted:
+                del self.roots[path]
+        for path in evicted:
+            self.cache.discard_under(path)
+            ScanSnapshot.forget(path)
+            logging.info(f"Evicted idle root {path}")
+        return evicted
+
+class MapperRequestHandler(socketserver.StreamRequestHandler):
+    """Newline-delimited JSON: one request per line, one response line each"""
+    
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                response = self.server.service.handle(request) if isinstance(request, dict) else \
+                    {'ok': False, 'error': "Request must be a JSON object"}
+            except ValueError as e:
+                response = {'ok': False, 'error': f"Invalid JSON: {e}"}
+            self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+            self.wfile.flush()
+            if self.server.service.shutdown_requested:
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                return
+
+class MapperClient:
+    """Client for the mapper daemon's JSON protocol"""
+    
+    def __init__(self, socket_path=None, timeout=300):
+        self.socket_path = socket_path or default_socket_path()
+        self.timeout = timeout
+    
+    def request(self, payload):
+        check_socket_owner(self.socket_path)
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            sock.sendall(json.dumps(payload).encode('utf-8') + b'\n')
+            with sock.makefile('rb') as response:
+                line = response.readline()
+        if not line:
+            raise ConnectionError("Mapper daemon closed the connection without replying")
+        return json.loads(line)
+    
+    def is_running(self):
+        try:
+            return self.request({'op': 'status'}).get('ok', False)
+        except (OSError, ValueError):
+            return False
+    
+    def map(self, root, **options):
+        return self.request(dict(options, op='map', root=root))
+    
+    def delta(self, root, **options):
+        return self.request(dict(options, op='delta', root=root))
+    
+    def search(self, root, query, **options):
+        return self.request(dict(options, op='search', root=root, query=query))
+    
+    def status(self):
+        return self.request({'op': 'status'})
+    
+    def shutdown(self):
+        return self.request({'op': 'shutdown'})
+
+class LocalMapperClient(MapperClient):
+    """In-process stand-in for MapperClient that talks to a MapperService directly.
+    
+    Requests and responses still go through JSON encoding so behaviour matches the
+    socket transport.
+    """
+    
+    def __init__(self, service=None):
+        self.service = service or MapperService()
+    
+    def request(self, payload):
+        response = self.service.handle(json.loads(json.dumps(payload)))
+        return json.loads(json.dumps(response))
+
+def run_daemon(socket_path=None, idle_timeout=900, exit_after_idle=0, check_interval=30, on_ready=None):
+    """Serve mapper requests on a Unix socket until shut down, calling on_ready(socket_path) once listening"""
+    if not hasattr(socket, 'AF_UNIX'):
+        raise RuntimeError("The mapper daemon needs Unix domain sockets, which this platform lacks")
+    socket_path = socket_path or default_socket_path()
+    if os.path.lexists(socket_path):
+        # Refuses paths another user planted rather than removing or talking to them
+        check_socket_owner(socket_path)
+        if MapperClient(socket_path, timeout=2).is_running():
+            raise RuntimeError(f"A mapper daemon is already listening on {socket_path}")
+        os.remove(socket_path)
+    
+    service = MapperService(idle_timeout)
+    # Bound under a private umask so the socket is never reachable by others, even briefly
+    old_umask = os.umask(0o177)
+    try:
+        server = socketserver.ThreadingUnixStreamServer(socket_path, MapperRequestHandler)
+    finally:
+        os.umask(old_umask)
+    server.daemon_threads = True
+    server.service = service
+    
+    def housekeeping():
+        while not service.shutdown_requested:
+            time.sleep(check_interval)
+            service.evict_idle()
+            if exit_after_idle and time.monotonic() - service.last_request > exit_after_idle:
+                logging.info("Mapper daemon idle, exiting")
+                service.shutdown_requested = True
+                server.shutdown()
+    
+    threading.Thread(target=housekeeping, daemon=True).start()
+    logging.info(f"Mapper daemon listening on {socket_path}")
+    if on_ready is not None:
+        on_ready(socket_path)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+    return 0